@@ -36,4 +36,5 @@ assert process.returncode == 0, f'Вы забыли сделать миграц
 pytest_plugins = [
     'tests.fixtures.fixture_user',
     'tests.fixtures.fixture_data',
+    'tests.fixtures.fixture_queries',
 ]
@@ -0,0 +1,13 @@
+import pytest
+from django.core.cache import cache
+
+from posts.tests.query_budget import assert_url_budget
+
+
+@pytest.fixture
+def url_query_budget(db):
+    """Проверяет, что страница укладывается в бюджет SQL-запросов."""
+    def check(client, url, max_queries):
+        cache.clear()
+        return assert_url_budget(client, url, max_queries)
+    return check
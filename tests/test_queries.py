@@ -0,0 +1,46 @@
+import pytest
+from mixer.backend.django import mixer
+
+from posts.models import Comment, Follow, Group, Post
+
+
+@pytest.fixture
+def busy_site(user, another_user):
+    group = Group.objects.create(title='Группа', slug='busy',
+                                 description='Описание')
+    authors = [another_user] + mixer.cycle(3).blend('auth.User')
+    Follow.objects.create(user=user, author=another_user)
+    for number in range(30):
+        post = Post.objects.create(text=f'Запись {number}',
+                                   author=authors[number % 4],
+                                   group=group if number % 2 else None)
+        Comment.objects.create(post=post, author=user, text='Комментарий')
+    return Post.objects.filter(author=another_user).first()
+
+
+class TestQueryBudget:
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('url, max_queries', [
+        ('/', 1),
+        ('/group/busy/', 2),
+        ('/AnotherUser/', 3),
+        ('/AnotherUser/{post_id}/', 2),
+    ])
+    def test_anonymous_pages(self, client, busy_site, url_query_budget,
+                             url, max_queries):
+        url = url.format(post_id=busy_site.id)
+        url_query_budget(client, url, max_queries)
+
+    @pytest.mark.django_db
+    @pytest.mark.parametrize('url, max_queries', [
+        ('/', 3),
+        ('/group/busy/', 4),
+        ('/AnotherUser/', 5),
+        ('/AnotherUser/{post_id}/', 4),
+        ('/follow/', 4),
+    ])
+    def test_authorized_pages(self, user_client, busy_site,
+                              url_query_budget, url, max_queries):
+        url = url.format(post_id=busy_site.id)
+        url_query_budget(user_client, url, max_queries)
@@ -0,0 +1,44 @@
+"""Компактные представления записей и комментариев для API."""
+from posts import links, threads
+
+
+def post(instance):
+    return {
+        'id': instance.pk,
+        'author': instance.author.username,
+        'group': instance.group.slug if instance.group_id else None,
+        'text': instance.text,
+        'pub_date': instance.pub_date.isoformat(),
+        'image': instance.image.url if instance.image else None,
+        'thumbnails': instance.thumbnail_urls,
+        'comments': instance.comment_count,
+        'url': instance.get_absolute_url(),
+    }
+
+
+def post_detail(instance, comments):
+    data = post(instance)
+    data.update(
+        group_title=instance.group.title if instance.group_id else None,
+        comment_list=[threads.serialize(comment) for comment in comments],
+        comments_next=comments.next_cursor,
+        comments_url=instance.get_comments_url(),
+    )
+    return data
+
+
+def page(posts):
+    paginator = posts.paginator
+    return {
+        'results': [post(instance) for instance in posts],
+        'next': paginator.next_cursor,
+        'previous': paginator.previous_cursor,
+    }
+
+
+def suggestion(username, common):
+    return {
+        'username': username,
+        'common': common,
+        'url': links.profile_url(username),
+    }
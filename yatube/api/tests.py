@@ -0,0 +1,104 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+@override_settings(POSTS_PER_PAGE=2)
+class ApiTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        cls.posts = [Post.objects.create(author=cls.author, group=cls.group,
+                                         text=f'Запись {number}')
+                     for number in range(3)]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_feeds(self):
+        self.client.force_login(self.reader)
+        for url in ('/api/v1/posts/', '/api/v1/groups/group/posts/',
+                    '/api/v1/users/author/posts/', '/api/v1/follow/'):
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual([item['id'] for item in data['results']],
+                                 [self.posts[2].pk, self.posts[1].pk])
+                self.assertEqual(data['results'][0]['group'], 'group')
+                data = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual([item['id'] for item in data['results']],
+                                 [self.posts[0].pk])
+                self.assertIsNone(data['next'])
+
+    def test_post(self):
+        post = self.posts[0]
+        Comment.objects.create(post=post, author=self.reader, text='Ого')
+        data = self.client.get(
+            f'/api/v1/users/author/posts/{post.pk}/').json()
+        self.assertEqual(data['text'], post.text)
+        self.assertEqual(data['url'], post.get_absolute_url())
+        self.assertEqual([item['text'] for item in data['comment_list']],
+                         ['Ого'])
+
+    def test_not_modified(self):
+        url = '/api/v1/posts/'
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        # Только дата самой новой записи.
+        self.assertEqual(len(context.captured_queries), 1)
+
+    def test_etag_changes(self):
+        url = f'/api/v1/users/author/posts/{self.posts[0].pk}/'
+        etag = self.client.get(url)['ETag']
+        Comment.objects.create(post=self.posts[0], author=self.reader,
+                               text='Новый')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        url = '/api/v1/posts/'
+        etag = self.client.get(url)['ETag']
+        self.posts[1].text = 'Правка'
+        self.posts[1].save()
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_follow_requires_login(self):
+        for url in ('/api/v1/follow/', '/api/v1/follow/suggestions/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 403)
+
+    def test_user_graph(self):
+        self.client.force_login(self.reader)
+        data = self.client.get('/api/v1/users/author/').json()
+        self.assertEqual((data['followers'], data['following']), (1, 0))
+        self.assertTrue(data['is_following'])
+        self.assertFalse(data['follows_you'])
+        self.assertEqual(data['url'], '/author/')
+
+    def test_follow_suggestions(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.author, author=other)
+        self.client.force_login(self.reader)
+        data = self.client.get('/api/v1/follow/suggestions/').json()
+        self.assertEqual(data['results'], [
+            {'username': 'other', 'common': 1, 'url': '/other/'}])
+
+    def test_missing(self):
+        for url in ('/api/v1/groups/none/posts/',
+                    '/api/v1/users/author/posts/999999/'):
+            with self.subTest(url=url):
+                self.assertEqual(self.client.get(url).status_code, 404)
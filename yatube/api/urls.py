@@ -0,0 +1,18 @@
+from django.urls import path
+
+from . import views
+
+app_name = 'api'
+
+urlpatterns = [
+    path('posts/', views.index, name='index'),
+    path('follow/', views.follow, name='follow_index'),
+    path('follow/suggestions/', views.follow_suggestions,
+         name='follow_suggestions'),
+    path('groups/<slug:slug>/posts/', views.group_posts,
+         name='group_posts'),
+    path('users/<str:username>/', views.user, name='user'),
+    path('users/<str:username>/posts/', views.profile, name='profile'),
+    path('users/<str:username>/posts/<int:post_id>/', views.post,
+         name='post'),
+]
@@ -0,0 +1,186 @@
+"""
+JSON-версии лент и страницы записи только для чтения.
+
+Выборки те же, что у HTML-страниц (posts/views.py), страницы — только
+курсором. Перед выборкой страницы считается ETag: поколения областей
+кэша, от которых зависит лента (posts/caching.py), и дата самой новой
+записи ленты. Если клиент прислал тот же ETag в If-None-Match, ответ —
+304 без выборки записей и без сериализации.
+"""
+import hashlib
+from functools import wraps
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from posts import caching, feed, graph, threads
+from posts.models import FeedEntry, Group, Post
+from posts.paginators import CursorPaginator
+from posts.views import post_cards
+
+from . import serializers
+
+User = get_user_model()
+
+# Меняется вместе с форматом ответов, чтобы старые ETag не совпали.
+FORMAT_VERSION = 1
+
+
+def newest(queryset):
+    """Дата самой новой записи выборки по индексу или None."""
+    return queryset.order_by('-pub_date').values_list(
+        'pub_date', flat=True).first()
+
+
+def make_etag(request, scopes, last_modified, *extra):
+    parts = [FORMAT_VERSION, request.get_full_path(),
+             *caching.generations(scopes), last_modified, *extra]
+    digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional(version):
+    """
+    Отвечает 304, если ETag не изменился.
+
+    ``version`` получает аргументы представления и возвращает
+    (области кэша, дату самой новой записи, объект для представления).
+    Last-Modified только сообщается клиенту: правка записи или новый
+    комментарий не меняют даты, поэтому If-Modified-Since без
+    If-None-Match не проверяется.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            scopes, last_modified, instance = version(
+                request, *args, **kwargs)
+            etag = make_etag(request, scopes, last_modified,
+                             request.user.pk)
+            response = get_conditional_response(request, etag=etag)
+            if response is None:
+                response = view(request, instance)
+            response['ETag'] = etag
+            response['Cache-Control'] = 'private, no-cache'
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(
+                    last_modified.timestamp())
+            return response
+        return wrapper
+    return decorator
+
+
+def cursor_page(request, posts):
+    paginator = CursorPaginator(post_cards(posts), settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+@conditional(lambda request: (
+    [caching.GLOBAL], newest(Post.objects.all()), None))
+def index(request, instance):
+    page = cursor_page(request, Post.objects.all())
+    return JsonResponse(serializers.page(page))
+
+
+def _group(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    return [caching.group_scope(slug)], newest(group.posts.all()), group
+
+
+@conditional(_group)
+def group_posts(request, group):
+    page = cursor_page(request, group.posts.all())
+    return JsonResponse(serializers.page(page))
+
+
+def _author(request, username):
+    author = get_object_or_404(User, username=username)
+    return ([caching.author_scope(author.pk)], newest(author.posts.all()),
+            author)
+
+
+@conditional(_author)
+def profile(request, author):
+    page = cursor_page(request, author.posts.all())
+    return JsonResponse(serializers.page(page))
+
+
+def _post(request, username, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author', 'group'),
+        author__username=username, id=post_id)
+    return ([caching.author_scope(post.author_id),
+             caching.post_scope(post_id)],
+            post.pub_date, post)
+
+
+@conditional(_post)
+def post(request, post):
+    comments = threads.CommentPage(post.comments.all(),
+                                   request.GET.get('comments'))
+    return JsonResponse(serializers.post_detail(post, comments))
+
+
+def _follow(request):
+    user = request.user
+    # Записи знаменитостей в FeedEntry не попадают, но любая новая
+    # запись меняет поколение GLOBAL.
+    return ([caching.GLOBAL, caching.author_scope(user.pk)],
+            newest(FeedEntry.objects.filter(user=user)), user)
+
+
+def _login_required(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'detail': 'Нужно войти на сайт.'},
+                                status=403)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+@_login_required
+@conditional(_follow)
+def follow(request, user):
+    paginator = feed.FeedPaginator(
+        user, post_cards(Post.objects.all()), settings.POSTS_PER_PAGE)
+    page = paginator.get_page(request.GET.get('cursor'))
+    return JsonResponse(serializers.page(page))
+
+
+def _private(response):
+    # Подписки меняются без смены поколений страниц, ETag не считаем.
+    response['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+def user(request, username):
+    """Подписки пользователя и его связь с тем, кто спрашивает."""
+    author = get_object_or_404(User, username=username)
+    followers_count, following_count = graph.counts(author.pk)
+    viewer = request.user.pk
+    return _private(JsonResponse({
+        'username': author.username,
+        'followers': followers_count,
+        'following': following_count,
+        'mutuals': len(graph.mutuals(author.pk)),
+        'is_following': graph.is_following(viewer, author.pk),
+        'follows_you': (viewer is not None
+                        and graph.is_following(author.pk, viewer)),
+        'url': author.get_absolute_url(),
+    }))
+
+
+@_login_required
+def follow_suggestions(request):
+    suggested = graph.suggestions(request.user.pk)
+    usernames = dict(User.objects.filter(
+        pk__in=[author_id for author_id, _ in suggested]
+    ).values_list('pk', 'username'))
+    return _private(JsonResponse({'results': [
+        serializers.suggestion(usernames[author_id], common)
+        for author_id, common in suggested if author_id in usernames
+    ]}))
@@ -0,0 +1,11 @@
+"""
+Нагрузочные замеры приложения posts.
+
+``manage.py benchmark`` создаёт отдельную базу, заполняет её
+синтетическими данными (datagen.py), прогоняет страницы через
+WSGI-приложение внутри процесса (driver.py) последовательно и из
+нескольких потоков и печатает для каждой страницы p50/p95/p99,
+пропускную способность, число запросов к базе и выделенную память
+(suite.py). Результаты сохраняются в JSON и сравниваются с прошлым
+прогоном, чтобы ловить регрессии.
+"""
@@ -0,0 +1,50 @@
+"""Отдельная база SQLite на время замера."""
+import copy
+import os
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.test.utils import override_settings
+
+# Настройки SQLite по умолчанию, с которыми сравнивается yatube/sqlite.
+PLAIN_OPTIONS = {'pragmas': {'journal_mode': 'DELETE',
+                             'synchronous': 'FULL'}}
+
+
+@contextmanager
+def scratch_database(workdir, plain=False):
+    """
+    Создаёт базу в ``workdir`` и направляет в неё все соединения.
+
+    С ``plain`` соединения открываются без настроек из DATABASES:
+    обычный журнал, без очереди писателей, реплики и долгих соединений.
+    """
+    saved = {alias: copy.deepcopy(connections[alias].settings_dict)
+             for alias in connections}
+    connections.close_all()
+    if plain:
+        for alias in connections:
+            connections[alias].settings_dict.update(
+                OPTIONS=copy.deepcopy(PLAIN_OPTIONS), CONN_MAX_AGE=0)
+    connection = connections[DEFAULT_DB_ALIAS]
+    connection.settings_dict['TEST']['NAME'] = os.path.join(
+        workdir, 'bench.sqlite3')
+    old_name = connection.creation.create_test_db(
+        verbosity=0, autoclobber=True, serialize=False)
+    for alias in connections:
+        if connections[alias].settings_dict['TEST'].get('MIRROR'):
+            connections[alias].creation.set_as_test_mirror(
+                connection.settings_dict)
+    try:
+        # Лимиты записи (posts/limits.py) не дали бы нагрузить базу.
+        with override_settings(
+                READ_ONLY_VIEWS=[] if plain else settings.READ_ONLY_VIEWS,
+                RATE_LIMITS={}):
+            yield
+    finally:
+        connections.close_all()
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        for alias, settings_dict in saved.items():
+            connections[alias].settings_dict.clear()
+            connections[alias].settings_dict.update(settings_dict)
@@ -0,0 +1,90 @@
+"""
+Синтетические данные для замеров.
+
+Популярность авторов подчиняется закону Ципфа: на немногих авторов
+подписано большинство, и пишут они больше остальных. Данные
+загружаются тем же путём, что и ``manage.py yatube_import``.
+"""
+import random
+from collections import namedtuple
+from datetime import timedelta
+from io import BytesIO
+
+from django.core.files.base import ContentFile
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from posts import bulk
+from posts.models import Post
+
+Dataset = namedtuple('Dataset', 'usernames groups posts')
+
+
+def _weights(count, alpha):
+    return [1 / (rank + 1) ** alpha for rank in range(count)]
+
+
+def _images(count, rng):
+    """Несколько маленьких картинок разных цветов в хранилище записей."""
+    storage = Post._meta.get_field('image').storage
+    names = []
+    for _ in range(count):
+        buffer = BytesIO()
+        color = tuple(rng.randrange(256) for _ in range(3))
+        Image.new('RGB', (320, 240), color).save(buffer, 'JPEG')
+        names.append(storage.save('posts/bench.jpg',
+                                  ContentFile(buffer.getvalue())))
+    return names
+
+
+def records(users, posts, comments, groups, images, follows_per_user,
+            alpha, rng):
+    usernames = [f'user{number}' for number in range(users)]
+    slugs = [f'group{number}' for number in range(groups)]
+    weights = _weights(users, alpha)
+    now = timezone.now()
+    first_id = (Post.objects.aggregate(last=Max('pk'))['last'] or 0) + 1
+
+    for number in range(posts):
+        author = rng.choices(usernames, weights)[0]
+        yield {
+            'model': 'post',
+            'id': first_id + number,
+            'author': author,
+            'group': rng.choice(slugs) if slugs and rng.random() < 0.7
+            else None,
+            'text': f'Запись {number} автора {author}. ' * rng.randint(1, 8),
+            'pub_date': (now - timedelta(minutes=posts - number)).isoformat(),
+            'image': rng.choice(images) if images and rng.random() < 0.2
+            else '',
+        }
+    for number in range(comments):
+        yield {
+            'model': 'comment',
+            'post': first_id + rng.randrange(posts),
+            'author': rng.choice(usernames),
+            'text': f'Комментарий {number}',
+        }
+    for username in usernames:
+        count = min(users - 1, int(rng.paretovariate(1.2) * follows_per_user))
+        authors = set(rng.choices(usernames, weights, k=count))
+        authors.discard(username)
+        for author in authors:
+            yield {'model': 'follow', 'user': username, 'author': author}
+
+
+def generate(users=200, posts=2000, comments=6000, groups=10, images=10,
+             follows_per_user=5, alpha=1.1, seed=0, batch_size=1000):
+    """Заполняет базу и возвращает то, из чего строятся адреса страниц."""
+    rng = random.Random(seed)
+    importer = bulk.Importer(batch_size=batch_size)
+    importer.run(records(users, posts, comments, groups,
+                         _images(images, rng), follows_per_user, alpha, rng))
+    importer.finish()
+    return Dataset(
+        usernames=[f'user{number}' for number in range(users)],
+        groups=[f'group{number}' for number in range(groups)],
+        posts=list(Post.objects.order_by('-pk')
+                   .values_list('author__username', 'pk')[:10000]),
+    )
@@ -0,0 +1,156 @@
+"""Запросы к WSGI- и ASGI-приложениям проекта без сети."""
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import urlencode, urlsplit
+
+from django.conf import settings
+from django.core.wsgi import get_wsgi_application
+from django.middleware.csrf import _get_new_csrf_token
+from django.test import Client
+
+
+class Response:
+    def __init__(self, status, headers, body):
+        self.status_code = int(status.split()[0])
+        self.headers = dict(headers)
+        self.content = body
+
+
+class WSGIDriver:
+    """
+    Вызывает WSGI-приложение напрямую, как это делал бы сервер.
+
+    В отличие от django.test.Client, проходит весь стек обработчика
+    со всеми middleware и проверкой CSRF.
+    """
+
+    def __init__(self, workers=None):
+        self.app = get_wsgi_application()
+        self.csrf_token = _get_new_csrf_token()
+        # Как у сервера с ``workers`` потоками: лишние запросы ждут.
+        self.slots = threading.BoundedSemaphore(workers) if workers else None
+
+    def session_cookie(self, user):
+        client = Client()
+        client.force_login(user)
+        return client.cookies[settings.SESSION_COOKIE_NAME].value
+
+    def cookies(self, session):
+        cookies = {settings.CSRF_COOKIE_NAME: self.csrf_token}
+        if session:
+            cookies[settings.SESSION_COOKIE_NAME] = session
+        return '; '.join(f'{key}={value}' for key, value in cookies.items())
+
+    def request(self, method, path, data=None, session=None):
+        if self.slots is None:
+            return self._request(method, path, data, session)
+        with self.slots:
+            return self._request(method, path, data, session)
+
+    def _request(self, method, path, data, session):
+        url = urlsplit(path)
+        body = urlencode(data or {}).encode()
+        environ = {
+            'REQUEST_METHOD': method,
+            'PATH_INFO': url.path,
+            'QUERY_STRING': url.query,
+            'SERVER_NAME': 'testserver',
+            'SERVER_PORT': '80',
+            'SERVER_PROTOCOL': 'HTTP/1.1',
+            'REMOTE_ADDR': '192.0.2.1',
+            'HTTP_HOST': 'testserver',
+            'HTTP_COOKIE': self.cookies(session),
+            'HTTP_X_CSRFTOKEN': self.csrf_token,
+            'CONTENT_TYPE': 'application/x-www-form-urlencoded',
+            'CONTENT_LENGTH': str(len(body)),
+            'wsgi.version': (1, 0),
+            'wsgi.url_scheme': 'http',
+            'wsgi.input': BytesIO(body),
+            'wsgi.errors': sys.stderr,
+            'wsgi.multithread': True,
+            'wsgi.multiprocess': False,
+            'wsgi.run_once': False,
+        }
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started.append((status, headers))
+
+        result = self.app(environ, start_response)
+        try:
+            body = b''.join(result)
+        finally:
+            if hasattr(result, 'close'):
+                result.close()
+        status, headers = started[0]
+        return Response(status, headers, body)
+
+
+class ASGIDriver(WSGIDriver):
+    """
+    Вызывает yatube.asgi.application в цикле событий отдельного потока.
+
+    Синхронный ``request`` ждёт ответа, поэтому драйвер подходит для
+    того же Runner, что и WSGIDriver; параллельность на стороне
+    сервера ограничена пулом ASGI_THREADS, а не числом клиентов.
+    """
+
+    def __init__(self, threads=None):
+        from yatube import asgi, streaming
+        super().__init__()
+        self.app = asgi.application
+        if threads:
+            streaming._executor = ThreadPoolExecutor(
+                threads, thread_name_prefix='asgi')
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.loop.run_forever,
+                                       daemon=True)
+        self.thread.start()
+
+    def close(self):
+        self.loop.call_soon_threadsafe(self.loop.stop)
+        self.thread.join()
+        self.loop.close()
+
+    async def _call(self, scope, body):
+        messages = [{'type': 'http.request', 'body': body}]
+        sent = []
+
+        async def receive():
+            if messages:
+                return messages.pop()
+            await asyncio.Future()
+
+        async def send(message):
+            sent.append(message)
+
+        await self.app(scope, receive, send)
+        return sent
+
+    def _request(self, method, path, data, session):
+        url = urlsplit(path)
+        body = urlencode(data or {}).encode()
+        scope = {
+            'type': 'http', 'http_version': '1.1', 'method': method,
+            'scheme': 'http', 'path': url.path, 'root_path': '',
+            'query_string': url.query.encode(),
+            'server': ('testserver', 80), 'client': ('192.0.2.1', 5000),
+            'headers': [
+                (b'host', b'testserver'),
+                (b'cookie', self.cookies(session).encode()),
+                (b'x-csrftoken', self.csrf_token.encode()),
+                (b'content-type', b'application/x-www-form-urlencoded'),
+                (b'content-length', str(len(body)).encode()),
+            ],
+        }
+        sent = asyncio.run_coroutine_threadsafe(
+            self._call(scope, body), self.loop).result()
+        start = sent[0]
+        headers = [(name.decode('latin-1'), value.decode('latin-1'))
+                   for name, value in start['headers']]
+        return Response(str(start['status']), headers,
+                        b''.join(message.get('body', b'')
+                                 for message in sent[1:]))
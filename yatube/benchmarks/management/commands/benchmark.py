@@ -0,0 +1,89 @@
+import platform
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from benchmarks import datagen, suite
+from benchmarks.database import scratch_database
+from benchmarks.driver import WSGIDriver
+
+
+class Command(BaseCommand):
+    help = ('Замеряет задержки, запросы к базе и память страниц posts '
+            'на синтетических данных в отдельной базе.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--comments', type=int, default=6000)
+        parser.add_argument('--groups', type=int, default=10)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--requests', type=int, default=200,
+            help='Запросов на страницу в каждом прогоне.')
+        parser.add_argument(
+            '--concurrency', type=int, default=8,
+            help='Потоков в прогоне под нагрузкой; 1 — без него.')
+        parser.add_argument(
+            '--endpoint', action='append',
+            choices=[endpoint.name for endpoint in suite.ENDPOINTS],
+            help='Какие страницы замерять; по умолчанию все.')
+        parser.add_argument(
+            '--no-cache', action='store_true',
+            help='Замерять без кэша страниц и фрагментов.')
+        parser.add_argument('--save', help='Сохранить результаты в JSON.')
+        parser.add_argument(
+            '--compare', help='Сравнить с результатами из JSON.')
+        parser.add_argument(
+            '--tolerance', type=float, default=0.2,
+            help='Допустимый рост метрик при сравнении (доля).')
+
+    def handle(self, *args, **options):
+        endpoints = [endpoint for endpoint in suite.ENDPOINTS
+                     if endpoint.name in (options['endpoint']
+                                          or [endpoint.name])]
+        workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+        overrides = {'DEBUG': False, 'MEDIA_ROOT': workdir}
+        if options['no_cache']:
+            dummy = {'BACKEND':
+                     'django.core.cache.backends.dummy.DummyCache'}
+            overrides['CACHES'] = {'default': dummy, 'shared': dummy}
+        try:
+            with scratch_database(workdir), override_settings(**overrides):
+                caches['default'].clear()
+                results = self.measure(endpoints, options)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self.stdout.write(suite.format_table(results))
+        if options['save']:
+            suite.save(results, options['save'], self.meta(options))
+        if options['compare']:
+            regressions = suite.compare(
+                results, suite.load(options['compare']),
+                options['tolerance'])
+            for name, metric, before, after in regressions:
+                self.stderr.write(f'{name}.{metric}: {before} -> {after}')
+            if regressions:
+                raise CommandError(f'Регрессий: {len(regressions)}')
+
+    def measure(self, endpoints, options):
+        self.stderr.write('Генерация данных...')
+        dataset = datagen.generate(
+            users=options['users'], posts=options['posts'],
+            comments=options['comments'], groups=options['groups'],
+            seed=options['seed'])
+        runner = suite.Runner(WSGIDriver(), dataset, seed=options['seed'])
+        return runner.run(endpoints, options['requests'],
+                          options['concurrency'])
+
+    @staticmethod
+    def meta(options):
+        keys = ('users', 'posts', 'comments', 'groups', 'seed', 'requests',
+                'concurrency', 'no_cache')
+        meta = {key: options[key] for key in keys}
+        meta['python'] = platform.python_version()
+        return meta
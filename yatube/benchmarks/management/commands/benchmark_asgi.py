@@ -0,0 +1,112 @@
+import shutil
+import tempfile
+import time
+from contextlib import contextmanager
+from unittest import mock
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db.backends.utils import CursorWrapper
+from django.test.utils import override_settings
+
+from benchmarks import datagen, suite
+from benchmarks.database import scratch_database
+from benchmarks.driver import ASGIDriver, WSGIDriver
+
+MODES = ('wsgi', 'asgi')
+
+COLUMNS = ('rps', 'concurrent_p50_ms', 'concurrent_p95_ms',
+           'concurrent_p99_ms')
+
+
+@contextmanager
+def query_delay(seconds):
+    """Каждый запрос к базе дольше на ``seconds``, как у сетевой базы."""
+    if not seconds:
+        yield
+        return
+    execute = CursorWrapper.execute
+
+    def slow_execute(self, *args, **kwargs):
+        time.sleep(seconds)
+        return execute(self, *args, **kwargs)
+
+    with mock.patch.object(CursorWrapper, 'execute', slow_execute):
+        yield
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность и хвост задержек страниц '
+            'чтения при WSGI и ASGI с одинаковым числом рабочих потоков.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=300)
+        parser.add_argument(
+            '--clients', type=int, default=32,
+            help='Одновременных клиентов.')
+        parser.add_argument(
+            '--workers', type=int, default=8,
+            help='Потоков сервера: WSGI-воркеров или ASGI_THREADS.')
+        parser.add_argument(
+            '--query-delay-ms', type=float, default=0,
+            help='Добавочная задержка каждого запроса к базе.')
+        parser.add_argument(
+            '--mode', action='append', choices=MODES,
+            help='По умолчанию оба.')
+        parser.add_argument('--save', help='Сохранить результаты в JSON.')
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+        # Кэш страниц отключён: иначе чтения почти не доходят до базы.
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        results = {}
+        try:
+            with scratch_database(workdir), \
+                    override_settings(DEBUG=False, MEDIA_ROOT=workdir,
+                                      CACHES={'default': dummy,
+                                              'shared': dummy}):
+                caches['default'].clear()
+                dataset = datagen.generate(
+                    users=options['users'], posts=options['posts'],
+                    comments=options['comments'], images=0,
+                    seed=options['seed'])
+                with query_delay(options['query_delay_ms'] / 1000):
+                    for mode in options['mode'] or MODES:
+                        self.stderr.write(f'Режим {mode}...')
+                        results[mode] = self.measure(mode, dataset, options)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self.stdout.write('{:<14}{:<6}'.format('endpoint', 'mode') + ''.join(
+            f'{column:>19}' for column in COLUMNS))
+        for endpoint in suite.READS:
+            for mode, endpoints in results.items():
+                metrics = endpoints[endpoint.name]
+                self.stdout.write(
+                    f'{endpoint.name:<14}{mode:<6}' + ''.join(
+                        f'{metrics[column]:>19}' for column in COLUMNS))
+        if options['save']:
+            keys = ('users', 'posts', 'comments', 'seed', 'requests',
+                    'clients', 'workers', 'query_delay_ms')
+            suite.save(results, options['save'],
+                       {key: options[key] for key in keys})
+
+    def measure(self, mode, dataset, options):
+        if mode == 'asgi':
+            driver = ASGIDriver(threads=options['workers'])
+        else:
+            driver = WSGIDriver(workers=options['workers'])
+        runner = suite.Runner(driver, dataset, seed=options['seed'])
+        try:
+            return {
+                endpoint.name: runner.concurrent(
+                    endpoint, options['requests'], options['clients'])
+                for endpoint in suite.READS
+            }
+        finally:
+            if mode == 'asgi':
+                driver.close()
@@ -0,0 +1,113 @@
+import copy
+import random
+import shutil
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from benchmarks import datagen, suite
+from benchmarks.database import scratch_database
+from benchmarks.driver import WSGIDriver
+from yatube import template_cache
+
+PLAIN_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# Режим: загрузчики, прогрев до первого запроса.
+MODES = {
+    'plain': (PLAIN_LOADERS, False),
+    'cached': ([('django.template.loaders.cached.Loader', PLAIN_LOADERS)],
+               False),
+    'preloaded': ([('django.template.loaders.cached.Loader',
+                    PLAIN_LOADERS)], True),
+}
+
+ENDPOINTS = [endpoint for endpoint in suite.READS
+             if endpoint.name in ('index', 'post_view', 'profile')]
+
+COLUMNS = ('warmup_ms', 'first_ms', 'p50_ms', 'p95_ms')
+
+
+def _templates(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    # Отладочные сведения шаблонов одинаковы во всех режимах:
+    # сравниваются только загрузчики.
+    templates[0]['OPTIONS'].update(loaders=loaders, debug=False)
+    return templates
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает время запуска и отрисовки страниц без кэша '
+            'шаблонов, с кэшем и с прогревом при запуске.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--requests', type=int, default=100)
+        parser.add_argument('--mode', action='append', choices=MODES)
+
+    def handle(self, *args, **options):
+        workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+        # Кэш страниц и фрагментов отключён: иначе шаблоны почти не
+        # отрисовываются.
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        try:
+            with scratch_database(workdir), \
+                    override_settings(DEBUG=False, MEDIA_ROOT=workdir,
+                                      CACHES={'default': dummy,
+                                              'shared': dummy}):
+                dataset = datagen.generate(
+                    users=options['users'], posts=options['posts'],
+                    comments=options['posts'], images=0,
+                    seed=options['seed'])
+                runner = suite.Runner(WSGIDriver(), dataset,
+                                      seed=options['seed'])
+                # Импорты и соединения прогреваются вне замера, чтобы
+                # первый режим не платил за них.
+                for endpoint in ENDPOINTS:
+                    runner._call(endpoint, random.Random(options['seed']))
+                rows = []
+                for mode in options['mode'] or MODES:
+                    self.stderr.write(f'Режим {mode}...')
+                    rows += self.measure(runner, mode, options)
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+        self.stdout.write('{:<12}{:<12}'.format('mode', 'endpoint') + ''.join(
+            f'{column:>12}' for column in COLUMNS))
+        for mode, name, metrics in rows:
+            self.stdout.write(f'{mode:<12}{name:<12}' + ''.join(
+                f'{metrics[column]:>12}' for column in COLUMNS))
+
+    def measure(self, runner, mode, options):
+        loaders, preload = MODES[mode]
+        rows = []
+        for endpoint in ENDPOINTS:
+            # Новые настройки TEMPLATES — новый движок с пустым кэшем,
+            # как в только что запущенном процессе.
+            with override_settings(TEMPLATES=_templates(loaders)):
+                started = time.perf_counter()
+                if preload:
+                    template_cache.warm_up()
+                warmup = time.perf_counter() - started
+                rng = random.Random(options['seed'])
+                started = time.perf_counter()
+                runner._call(endpoint, rng)
+                first = time.perf_counter() - started
+                latencies = []
+                for _ in range(options['requests']):
+                    started = time.perf_counter()
+                    runner._call(endpoint, rng)
+                    latencies.append(time.perf_counter() - started)
+            metrics = suite.summarize(latencies)
+            metrics['warmup_ms'] = round(warmup * 1000, 3)
+            metrics['first_ms'] = round(first * 1000, 3)
+            rows.append((mode, endpoint.name, metrics))
+        return rows
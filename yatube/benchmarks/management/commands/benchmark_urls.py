@@ -0,0 +1,59 @@
+import timeit
+
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.urls import reverse
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+def _page(size):
+    """Несохранённые записи: база в замере не участвует."""
+    group = Group(title='Группа', slug='group')
+    return [Post(pk=number, text='Текст', group=group,
+                 author=User(username=f'user{number % 7}'))
+            for number in range(1, size + 1)]
+
+
+def reversed_urls(posts):
+    """Адреса карточки так, как их строил {% url %}."""
+    for post in posts:
+        username = post.author.username
+        reverse('posts:profile', args=[username])
+        reverse('posts:group_posts', args=[post.group.slug])
+        reverse('posts:post', args=[username, post.pk])
+        reverse('posts:post_edit', args=[username, post.pk])
+
+
+def cached_urls(posts):
+    for post in posts:
+        post.author.get_absolute_url()
+        post.group.get_absolute_url()
+        post.get_absolute_url()
+        post.get_edit_url()
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает построение адресов карточек через reverse() и '
+            'через posts/links.py.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--page-size', type=int, default=10)
+        parser.add_argument('--repeat', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        posts = _page(options['page_size'])
+        results = {}
+        for name, build in (('reverse', reversed_urls),
+                            ('links', cached_urls)):
+            build(posts)
+            seconds = min(timeit.repeat(lambda: build(posts), repeat=5,
+                                        number=options['repeat']))
+            results[name] = seconds / options['repeat'] * 1e6
+            self.stdout.write(f'{name:<8} {results[name]:10.1f} мкс/страница')
+        saving = results['reverse'] - results['links']
+        self.stdout.write(
+            f'экономия {saving:10.1f} мкс/страница '
+            f'({saving / results["reverse"]:.0%})')
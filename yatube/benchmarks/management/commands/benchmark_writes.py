@@ -0,0 +1,82 @@
+import logging
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+
+from benchmarks import datagen, suite
+from benchmarks.database import scratch_database
+from benchmarks.driver import WSGIDriver
+
+MODES = ('plain', 'tuned')
+
+COLUMNS = ('writes_per_s', 'write_p95_ms', 'write_errors', 'reads_per_s',
+           'read_p95_ms', 'read_errors')
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает пропускную способность записи под смешанной '
+            'нагрузкой с обычными настройками SQLite и с yatube/sqlite.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=100)
+        parser.add_argument('--posts', type=int, default=1000)
+        parser.add_argument('--comments', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--readers', type=int, default=8)
+        parser.add_argument('--writers', type=int, default=4)
+        parser.add_argument(
+            '--seconds', type=float, default=10,
+            help='Длительность прогона в каждом режиме.')
+        parser.add_argument(
+            '--mode', action='append', choices=MODES,
+            help='plain — настройки SQLite по умолчанию, tuned — из '
+                 'DATABASES; по умолчанию оба.')
+        parser.add_argument('--save', help='Сохранить результаты в JSON.')
+
+    def handle(self, *args, **options):
+        results = {}
+        # Ошибки записи считаются в результатах, трассировки не нужны.
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        try:
+            for mode in options['mode'] or MODES:
+                self.stderr.write(f'Режим {mode}...')
+                results[mode] = self.measure(mode, options)
+        finally:
+            request_logger.setLevel(level)
+
+        self.stdout.write('{:<8}'.format('mode') + ''.join(
+            f'{column:>15}' for column in COLUMNS))
+        for mode, metrics in results.items():
+            self.stdout.write(f'{mode:<8}' + ''.join(
+                f'{metrics[column]:>15}' for column in COLUMNS))
+        if options['save']:
+            keys = ('users', 'posts', 'comments', 'seed', 'readers',
+                    'writers', 'seconds')
+            suite.save(results, options['save'],
+                       {key: options[key] for key in keys})
+
+    def measure(self, mode, options):
+        workdir = tempfile.mkdtemp(prefix='yatube-bench-')
+        # Кэш страниц отключён: иначе чтения почти не доходят до базы.
+        dummy = {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        try:
+            with scratch_database(workdir, plain=mode == 'plain'), \
+                    override_settings(DEBUG=False, MEDIA_ROOT=workdir,
+                                      CACHES={'default': dummy,
+                                              'shared': dummy}):
+                caches['default'].clear()
+                dataset = datagen.generate(
+                    users=options['users'], posts=options['posts'],
+                    comments=options['comments'], images=0,
+                    seed=options['seed'])
+                runner = suite.Runner(WSGIDriver(), dataset,
+                                      seed=options['seed'])
+                return runner.mixed(options['readers'], options['writers'],
+                                    options['seconds'])
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,269 @@
+"""
+Замеры страниц posts и сравнение с базовым прогоном.
+
+Каждая страница прогоняется дважды: последовательно (задержки, число
+запросов к базе, выделенная память по tracemalloc) и из нескольких
+потоков одновременно (пропускная способность и задержки под
+нагрузкой).
+"""
+import json
+import random
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+
+Endpoint = namedtuple('Endpoint', 'name method authorized url')
+
+User = get_user_model()
+
+
+def _post(rng, data):
+    return rng.choice(data.posts)
+
+
+ENDPOINTS = [
+    Endpoint('index', 'GET', False, lambda rng, data: ('/', None)),
+    Endpoint('group_posts', 'GET', False, lambda rng, data: (
+        f'/group/{rng.choice(data.groups)}/', None)),
+    Endpoint('profile', 'GET', False, lambda rng, data: (
+        f'/{rng.choice(data.usernames)}/', None)),
+    Endpoint('post_view', 'GET', False, lambda rng, data: (
+        '/{}/{}/'.format(*_post(rng, data)), None)),
+    Endpoint('follow_index', 'GET', True, lambda rng, data: (
+        '/follow/', None)),
+    Endpoint('add_comment', 'POST', True, lambda rng, data: (
+        '/{}/{}/comment/'.format(*_post(rng, data)),
+        {'text': 'Комментарий из замера'})),
+    Endpoint('new_post', 'POST', True, lambda rng, data: (
+        '/new/', {'text': 'Запись из замера'})),
+]
+
+READS = [endpoint for endpoint in ENDPOINTS if endpoint.method == 'GET']
+
+WRITES = [endpoint for endpoint in ENDPOINTS if endpoint.method == 'POST']
+
+# Метрики, рост которых считается регрессией.
+TRACKED = ('p50_ms', 'p95_ms', 'p99_ms', 'queries', 'alloc_kib')
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+def percentile(values, share):
+    """Значение по методу ближайшего ранга."""
+    ordered = sorted(values)
+    if not ordered:
+        return 0.0
+    rank = max(int(round(share * len(ordered) + 0.5)) - 1, 0)
+    return ordered[min(rank, len(ordered) - 1)]
+
+
+def summarize(latencies):
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+    }
+
+
+class Runner:
+    def __init__(self, driver, dataset, seed=0, sessions=10):
+        self.driver = driver
+        self.dataset = dataset
+        self.seed = seed
+        readers = (User.objects.filter(username__in=dataset.usernames)
+                   .order_by('-stats__following_count')[:sessions])
+        self.sessions = [driver.session_cookie(user) for user in readers]
+
+    def _call(self, endpoint, rng):
+        path, data = endpoint.url(rng, self.dataset)
+        if data is not None:
+            # Как форма сайта: у каждой отправки свой ключ, иначе
+            # одинаковые записи замера гасились бы как повторы.
+            data = dict(data, idempotency_key=uuid.uuid4().hex)
+        session = rng.choice(self.sessions) if endpoint.authorized else None
+        response = self.driver.request(endpoint.method, path, data, session)
+        if response.status_code >= 400:
+            raise RuntimeError(
+                f'{endpoint.name}: {path} вернул {response.status_code}')
+        return response
+
+    def sequential(self, endpoint, requests, warmup=5):
+        rng = random.Random(self.seed)
+        for _ in range(warmup):
+            self._call(endpoint, rng)
+        latencies, queries = [], []
+        for _ in range(requests):
+            counter = QueryCounter()
+            started = time.perf_counter()
+            with connection.execute_wrapper(counter):
+                self._call(endpoint, rng)
+            latencies.append(time.perf_counter() - started)
+            queries.append(counter.count)
+        result = summarize(latencies)
+        result['queries'] = round(sum(queries) / len(queries), 2)
+        result['alloc_kib'] = self.allocations(endpoint, rng,
+                                               min(requests, 50))
+        return result
+
+    def allocations(self, endpoint, rng, requests):
+        """
+        Средний пик памяти на запрос, КиБ. Считается отдельным проходом:
+        tracemalloc в разы замедляет код и испортил бы задержки.
+        """
+        allocated = []
+        reset_peak = getattr(tracemalloc, 'reset_peak', None)
+        tracemalloc.start()
+        try:
+            for _ in range(requests):
+                before, _ = tracemalloc.get_traced_memory()
+                if reset_peak:
+                    reset_peak()
+                self._call(endpoint, rng)
+                current, peak = tracemalloc.get_traced_memory()
+                allocated.append((peak if reset_peak else current) - before)
+        finally:
+            tracemalloc.stop()
+        return round(sum(allocated) / len(allocated) / 1024, 1)
+
+    def concurrent(self, endpoint, requests, workers):
+        """Задержки и запросов в секунду при ``workers`` потоках."""
+        latencies = []
+        lock = threading.Lock()
+        numbers = count()
+
+        def work(worker):
+            rng = random.Random(self.seed * 1000 + worker)
+            try:
+                while next(numbers) < requests:
+                    started = time.perf_counter()
+                    self._call(endpoint, rng)
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies.append(elapsed)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(workers) as pool:
+            list(pool.map(work, range(workers)))
+        elapsed = time.perf_counter() - started
+        result = {f'concurrent_{key}': value
+                  for key, value in summarize(latencies).items()}
+        result['rps'] = round(len(latencies) / elapsed, 1)
+        return result
+
+    def mixed(self, readers, writers, seconds, reads=READS, writes=WRITES):
+        """
+        Читатели и писатели одновременно в течение ``seconds`` секунд.
+
+        Ответы с ошибкой (например, «database is locked») не прерывают
+        замер, а считаются отдельно.
+        """
+        latencies = {'read': [], 'write': []}
+        errors = {'read': 0, 'write': 0}
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def work(kind, endpoints, worker):
+            rng = random.Random(self.seed * 1000 + worker)
+            try:
+                while time.perf_counter() < deadline:
+                    endpoint = rng.choice(endpoints)
+                    started = time.perf_counter()
+                    try:
+                        self._call(endpoint, rng)
+                    except RuntimeError:
+                        with lock:
+                            errors[kind] += 1
+                        continue
+                    elapsed = time.perf_counter() - started
+                    with lock:
+                        latencies[kind].append(elapsed)
+            finally:
+                connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(readers + writers) as pool:
+            futures = [pool.submit(work, 'read', reads, worker)
+                       for worker in range(readers)]
+            futures += [pool.submit(work, 'write', writes, readers + worker)
+                        for worker in range(writers)]
+            for future in futures:
+                future.result()
+        elapsed = time.perf_counter() - started
+        result = {}
+        for kind in ('read', 'write'):
+            result.update({f'{kind}_{key}': value for key, value
+                           in summarize(latencies[kind]).items()})
+            result[f'{kind}s_per_s'] = round(
+                len(latencies[kind]) / elapsed, 1)
+            result[f'{kind}_errors'] = errors[kind]
+        return result
+
+    def run(self, endpoints, requests, workers):
+        results = {}
+        for endpoint in endpoints:
+            result = self.sequential(endpoint, requests)
+            if workers > 1:
+                result.update(self.concurrent(endpoint, requests, workers))
+            results[endpoint.name] = result
+        return results
+
+
+def save(results, path, meta):
+    with open(path, 'w') as file:
+        json.dump({'meta': meta, 'results': results}, file,
+                  indent=2, ensure_ascii=False, sort_keys=True)
+
+
+def load(path):
+    with open(path) as file:
+        return json.load(file)['results']
+
+
+def compare(results, baseline, tolerance):
+    """
+    Регрессии относительно базового прогона.
+
+    Метрика регрессирует, если выросла больше чем на ``tolerance``
+    (доля); для задержек есть ещё запас в 0.5 мс на шум таймера.
+    """
+    regressions = []
+    for name, metrics in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for metric in TRACKED:
+            if metric not in metrics or metric not in base:
+                continue
+            slack = 0.5 if metric.endswith('_ms') else 0
+            limit = base[metric] * (1 + tolerance) + slack
+            if metrics[metric] > limit:
+                regressions.append((name, metric, base[metric],
+                                    metrics[metric]))
+    return regressions
+
+
+def format_table(results):
+    columns = ['p50_ms', 'p95_ms', 'p99_ms', 'queries', 'alloc_kib',
+               'concurrent_p95_ms', 'rps']
+    lines = ['{:<14}'.format('endpoint')
+             + ''.join(f'{column:>19}' for column in columns)]
+    for name, metrics in results.items():
+        lines.append(f'{name:<14}' + ''.join(
+            f'{metrics.get(column, "-"):>19}' for column in columns))
+    return '\n'.join(lines)
@@ -0,0 +1,42 @@
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.test import TestCase, override_settings
+
+from benchmarks import datagen, suite
+from benchmarks.driver import WSGIDriver
+from posts.models import Comment, Follow, Post
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class BenchmarkSmokeTests(TestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def test_datagen_and_runner(self):
+        """Генератор заполняет базу, прогон возвращает метрики страниц."""
+        dataset = datagen.generate(users=20, posts=50, comments=40,
+                                   groups=3, images=2)
+        self.assertEqual(Post.objects.count(), 50)
+        self.assertEqual(Comment.objects.count(), 40)
+        self.assertTrue(Follow.objects.exists())
+
+        runner = suite.Runner(WSGIDriver(), dataset)
+        results = runner.run(suite.ENDPOINTS, requests=3, workers=1)
+        self.assertEqual(list(results),
+                         [endpoint.name for endpoint in suite.ENDPOINTS])
+        for metrics in results.values():
+            self.assertLessEqual(metrics['p50_ms'], metrics['p99_ms'])
+        self.assertEqual(Comment.objects.count(), 40 + 3 + 5 + 3)
+
+    def test_compare(self):
+        """Сравнение находит выросшие метрики."""
+        baseline = {'index': {'p95_ms': 10.0, 'queries': 2}}
+        results = {'index': {'p95_ms': 10.4, 'queries': 3}}
+        self.assertEqual(suite.compare(results, baseline, 0.2),
+                         [('index', 'queries', 2, 3)])
@@ -1,13 +1,27 @@
 from django.contrib import admin
 
+from . import search
 from .models import Group, Post, Comment, Follow
 
 
-class PostAdmin(admin.ModelAdmin):
+class FullTextSearchMixin:
+    """Поиск по тексту через индекс FTS5 вместо LIKE по всей таблице."""
+    matching_ids = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not (search.enabled() and search.match_expression(search_term)):
+            return super().get_search_results(
+                request, queryset, search_term)
+        ids = self.matching_ids(search_term)
+        return queryset.filter(pk__in=ids), False
+
+
+class PostAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('text', 'pub_date', 'author')
     search_fields = ('text',)
     list_filter = ('pub_date',)
     empty_value_display = '-пусто-'
+    matching_ids = staticmethod(search.matching_post_ids)
 
 
 class GroupAdmin(admin.ModelAdmin):
@@ -17,12 +31,15 @@ class GroupAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
 
 
-class CommentAdmin(admin.ModelAdmin):
+class CommentAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ('text', 'created', 'post',
                     'author')
     search_fields = ('text',)
     list_filter = ('created',)
+    # Путь задаётся при первом сохранении и от parent больше не зависит.
+    readonly_fields = ('parent',)
     empty_value_display = '-пусто-'
+    matching_ids = staticmethod(search.matching_comment_ids)
 
 
 class FollowAdmin(admin.ModelAdmin):
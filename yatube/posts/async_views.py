@@ -0,0 +1,91 @@
+"""
+Асинхронные версии страниц для чтения (см. yatube/asgi.py).
+
+Страницы те же, что в posts/views.py, и собираются из тех же частей
+(index_page, profile_context и т. д.), но работа с базой и отрисовка
+выполняются в ограниченном пуле потоков (ASGI_THREADS), а независимые
+части страницы — записи, счётчики автора, подписка — запрашиваются
+одновременно. Медленный запрос держит поток пула только пока ждёт
+базу, а не всё время ответа.
+"""
+import asyncio
+
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import get_object_or_404
+from django.shortcuts import render as render_sync
+
+from yatube.sqlite.replica import read_only
+from yatube.streaming import run_sync
+
+from . import caching, counters, graph, views
+from .models import Group
+
+
+def _read(func, *args, **kwargs):
+    with read_only():
+        return func(*args, **kwargs)
+
+
+async def read(func, *args, **kwargs):
+    """Только чтение в пуле потоков, с репликой, как у READ_ONLY_VIEWS."""
+    return await run_sync(_read, func, *args, **kwargs)
+
+
+async def render(request, template_name, context):
+    # Шаблоны дочитывают ленивые выборки, поэтому тоже в пуле.
+    return await read(render_sync, request, template_name, context)
+
+
+@caching.cache_page_by_generation(lambda request: [caching.GLOBAL])
+async def index(request):
+    page = await read(views.index_page, request)
+    return await render(request, 'index.html', {'page': page})
+
+
+@caching.cache_page_by_generation(views.group_scopes)
+async def group_posts(request, slug):
+    group = await read(get_object_or_404, Group, slug=slug)
+    page = await read(views.group_page, request, group)
+    return await render(request, 'group.html',
+                        {'group': group, 'page': page})
+
+
+@caching.cache_page_by_generation(views.profile_scopes)
+async def profile(request, username):
+    author = await read(views.profile_author, username)
+    page, following, stats = await asyncio.gather(
+        read(views.author_page, request, author),
+        read(graph.is_following, request.user.pk, author.pk),
+        read(counters.stats_for, author),
+    )
+    return await render(request, 'profile.html', views.profile_context(
+        author, page, following, stats))
+
+
+@caching.cache_page_by_generation(views.post_page_scopes)
+async def post_view(request, username, post_id):
+    post = await read(views.page_post, username, post_id)
+    stats, comments = await asyncio.gather(
+        read(counters.stats_for, post.author),
+        read(views.post_comment_page, request, post),
+    )
+    return await render(request, 'post.html', views.post_context(
+        request, post, stats, comments))
+
+
+async def follow_index(request):
+    if not request.user.is_authenticated:
+        return redirect_to_login(request.get_full_path())
+    page = await read(views.follow_page, request)
+    return await render(request, 'follow.html',
+                        {'page': page, 'paginator': page.paginator})
+
+
+# Имя маршрута — асинхронная версия страницы.
+VIEWS = {
+    'posts:index': index,
+    'posts:group_posts': group_posts,
+    'posts:profile': profile,
+    'posts:post': post_view,
+    'posts:follow_index': follow_index,
+}
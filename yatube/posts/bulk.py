@@ -0,0 +1,312 @@
+"""
+Массовый импорт и экспорт записей, комментариев и подписок.
+
+Данные идут потоком в NDJSON (по объекту на строку, тип в поле
+``model``) или CSV (один тип на файл). Пользователи, группы и записи
+ссылаются друг на друга по username, slug и id, поэтому выгрузку можно
+загрузить в другую базу. Записи и комментарии сохраняют свои id (на
+них ссылаются адреса страниц), и если такой id в базе уже занят,
+импорт останавливается с ImportConflict, а не пропускает объект:
+иначе комментарии пропущенной записи достались бы чужой.
+
+Импорт читает вход пачками по ``batch_size`` объектов и сохраняет
+каждую пачку в одной транзакции через ``bulk_create``, минуя сигналы.
+После каждой пачки номер последнего загруженного объекта пишется в
+файл контрольной точки, и прерванный импорт продолжается с него.
+Производные данные (счётчики, ленты, поисковый индекс, учёт
+медиафайлов, поколения кэша) пересчитываются один раз в конце.
+"""
+import csv
+import json
+import os
+from contextlib import contextmanager
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import caching, counters, feed, graph, media, search, threads
+from .models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+FORMATS = ('ndjson', 'csv')
+
+# Сколько id проверять одним запросом (у SQLite до 999 параметров).
+ID_CHUNK_SIZE = 500
+
+FIELDS = {
+    'post': ('id', 'author', 'group', 'text', 'pub_date', 'image'),
+    'comment': ('id', 'post', 'author', 'text', 'created', 'parent'),
+    'follow': ('user', 'author'),
+}
+
+EXPORT_QUERIES = {
+    'post': lambda: Post.objects.order_by('pk').values_list(
+        'id', 'author__username', 'group__slug', 'text', 'pub_date',
+        'image'),
+    'comment': lambda: Comment.objects.order_by('pk').values_list(
+        'id', 'post_id', 'author__username', 'text', 'created',
+        'parent_id'),
+    'follow': lambda: Follow.objects.order_by('pk').values_list(
+        'user__username', 'author__username'),
+}
+
+
+class ImportConflict(Exception):
+    """Id записи или комментария из выгрузки уже занят в базе."""
+
+
+def guess_format(path):
+    return 'csv' if path.lower().endswith('.csv') else 'ndjson'
+
+
+def _to_json(value):
+    return value.isoformat() if hasattr(value, 'isoformat') else value
+
+
+def export_records(model, chunk_size):
+    """Объекты модели словарями; база читается кусками."""
+    fields = FIELDS[model]
+    for row in EXPORT_QUERIES[model]().iterator(chunk_size=chunk_size):
+        yield dict(zip(fields, map(_to_json, row)))
+
+
+def write_ndjson(stream, models, chunk_size):
+    written = 0
+    for model in models:
+        for record in export_records(model, chunk_size):
+            record['model'] = model
+            stream.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written += 1
+    return written
+
+
+def write_csv(stream, model, chunk_size):
+    writer = csv.DictWriter(stream, FIELDS[model])
+    writer.writeheader()
+    written = 0
+    for record in export_records(model, chunk_size):
+        writer.writerow({key: '' if value is None else value
+                         for key, value in record.items()})
+        written += 1
+    return written
+
+
+def read_ndjson(stream):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv(stream, model):
+    for row in csv.DictReader(stream):
+        row['model'] = model
+        yield row
+
+
+class Checkpoint:
+    """Число уже загруженных объектов, сохранённое в файле."""
+
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        with open(self.path) as file:
+            return json.load(file)['done']
+
+    def save(self, done):
+        if not self.path:
+            return
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'done': done}, file)
+        os.replace(temporary, self.path)
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            os.remove(self.path)
+
+
+@contextmanager
+def deferred_indexes(models):
+    """Снимает индексы Meta.indexes на время загрузки и строит заново."""
+    # SQL берём у schema_editor, но выполняем сами: в SQLite его нельзя
+    # открыть при включённой проверке внешних ключей.
+    editor = connection.schema_editor()
+    indexes = [(model, index) for model in models
+               for index in model._meta.indexes]
+    with connection.cursor() as cursor:
+        for model, index in indexes:
+            cursor.execute(str(index.remove_sql(model, editor)))
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            for model, index in indexes:
+                cursor.execute(str(index.create_sql(model, editor)))
+
+
+class Importer:
+    def __init__(self, batch_size=500):
+        self.batch_size = batch_size
+        self.users = {}
+        self.groups = {}
+        self.authors = set()
+        self.group_slugs = set()
+        self.loaded = 0
+
+    def _user_ids(self, usernames):
+        missing = set(usernames) - set(self.users)
+        if not missing:
+            return
+        self.users.update(User.objects.filter(username__in=missing)
+                          .values_list('username', 'pk'))
+        missing -= set(self.users)
+        if missing:
+            # Новые пользователи без пароля: войти они смогут после сброса.
+            User.objects.bulk_create(
+                [User(username=name, password=make_password(None))
+                 for name in missing],
+                batch_size=self.batch_size)
+            self.users.update(User.objects.filter(username__in=missing)
+                              .values_list('username', 'pk'))
+
+    def _group_ids(self, slugs):
+        missing = set(slugs) - set(self.groups)
+        if missing:
+            Group.objects.bulk_create(
+                [Group(title=slug, slug=slug, description='')
+                 for slug in missing],
+                batch_size=self.batch_size, ignore_conflicts=True)
+            self.groups.update(Group.objects.filter(slug__in=missing)
+                               .values_list('slug', 'pk'))
+
+    def _check_ids(self, model, records, label):
+        ids = [int(record['id']) for record in records if record.get('id')]
+        for start in range(0, len(ids), ID_CHUNK_SIZE):
+            taken = sorted(model.objects.filter(
+                pk__in=ids[start:start + ID_CHUNK_SIZE],
+            ).values_list('pk', flat=True))
+            if taken:
+                raise ImportConflict(
+                    f'{label} с id {", ".join(map(str, taken[:10]))} '
+                    'уже есть в базе.')
+
+    def _posts(self, records):
+        self._check_ids(Post, records, 'Записи')
+        posts = []
+        for record in records:
+            group = record.get('group') or None
+            posts.append(Post(
+                id=record.get('id') or None,
+                author_id=self.users[record['author']],
+                group_id=self.groups[group] if group else None,
+                text=record['text'],
+                image=record.get('image') or '',
+                pub_date=_date(record.get('pub_date')),
+            ))
+        with keep_dates(Post, 'pub_date'):
+            Post.objects.bulk_create(posts)
+
+    def _comments(self, records):
+        self._check_ids(Comment, records, 'Комментарии')
+        comments = []
+        for record in records:
+            comments.append(Comment(
+                id=record.get('id') or None,
+                post_id=int(record['post']),
+                author_id=self.users[record['author']],
+                text=record['text'],
+                created=_date(record.get('created')),
+                parent_id=int(record['parent']) if record.get('parent')
+                else None,
+            ))
+        with keep_dates(Comment, 'created'):
+            Comment.objects.bulk_create(comments)
+
+    def _follows(self, records):
+        Follow.objects.bulk_create(
+            [Follow(user_id=self.users[record['user']],
+                    author_id=self.users[record['author']])
+             for record in records
+             if record['user'] != record['author']],
+            ignore_conflicts=True)
+
+    def note(self, record):
+        """Запоминает авторов и группы, чьи ленты и кэш нужно обновить."""
+        if record['model'] in ('post', 'follow'):
+            self.authors.add(record['author'])
+        if record['model'] == 'post' and record.get('group'):
+            self.group_slugs.add(record['group'])
+
+    def load_batch(self, records):
+        by_model = {model: [] for model in FIELDS}
+        for record in records:
+            by_model[record['model']].append(record)
+            self.note(record)
+        with transaction.atomic():
+            self._user_ids(
+                {record[key] for record in records
+                 for key in ('author', 'user') if record.get(key)})
+            self._group_ids({record['group'] for record in by_model['post']
+                             if record.get('group')})
+            self._posts(by_model['post'])
+            self._comments(by_model['comment'])
+            self._follows(by_model['follow'])
+        self.loaded += len(records)
+
+    def run(self, records, checkpoint=None):
+        """Загружает объекты; возвращает число загруженных за этот запуск."""
+        checkpoint = checkpoint or Checkpoint(None)
+        done = checkpoint.load()
+        records = iter(records)
+        # Загруженное в прошлый раз пропускаем, но учитываем в finish().
+        for record in islice(records, done):
+            self.note(record)
+        while True:
+            batch = list(islice(records, self.batch_size))
+            if not batch:
+                break
+            self.load_batch(batch)
+            done += len(batch)
+            checkpoint.save(done)
+        return self.loaded
+
+    def finish(self):
+        """Пересчитывает то, что при обычном сохранении делают сигналы."""
+        # bulk_create не вызывает Comment.save(), где задаётся путь.
+        threads.fill_paths(Comment.objects.all())
+        counters.rebuild(batch_size=self.batch_size)
+        search.rebuild(batch_size=self.batch_size)
+        media.rebuild_references(batch_size=self.batch_size)
+        author_ids = list(User.objects.filter(
+            username__in=self.authors).values_list('pk', flat=True))
+        for author_id in author_ids:
+            feed.backfill_followers(author_id)
+        graph.reset()
+        caching.bump(
+            caching.GLOBAL,
+            *(caching.author_scope(pk) for pk in author_ids),
+            *(caching.group_scope(slug) for slug in self.group_slugs))
+
+
+def _date(value):
+    return parse_datetime(value) if value else timezone.now()
+
+
+@contextmanager
+def keep_dates(model, field_name):
+    """Отключает auto_now_add, чтобы сохранить даты из выгрузки."""
+    field = model._meta.get_field(field_name)
+    auto_now_add = field.auto_now_add
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = auto_now_add
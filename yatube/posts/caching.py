@@ -0,0 +1,174 @@
+"""
+Кэш страниц с инвалидацией по поколениям.
+
+У каждой области (вся лента, группа, автор, запись) есть счётчик
+поколения. Ключ закэшированной страницы включает поколения всех
+областей, от которых она зависит, поэтому сохранение или удаление
+Post, Comment и Follow сразу делает старые копии недостижимыми, а
+неизменившиеся страницы можно хранить часами.
+"""
+import asyncio
+import hashlib
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+
+from yatube.streaming import run_sync
+
+GLOBAL = 'global'
+
+
+def group_scope(slug):
+    return f'group:{slug}'
+
+
+def author_scope(user_id):
+    return f'author:{user_id}'
+
+
+def _author_id_key(username):
+    # В имени бывают пробелы и не-ASCII символы, недопустимые в ключах
+    # memcached.
+    digest = hashlib.md5(username.encode()).hexdigest()
+    return f'author_id:{digest}'
+
+
+def remember_author(user):
+    """Запоминает id автора по имени для author_scope_by_name."""
+    cache.set(_author_id_key(user.username), user.pk, None)
+
+
+def author_scope_by_name(username):
+    """
+    Область автора по имени из адреса страницы. Пока id не запомнен
+    (remember_author), возвращает None, и страница не кэшируется:
+    лишний запрос к базе ради ключа стоил бы дороже.
+    """
+    user_id = cache.get(_author_id_key(username))
+    return None if user_id is None else author_scope(user_id)
+
+
+def post_scope(post_id):
+    return f'post:{post_id}'
+
+
+def generation_key(scope):
+    return f'gen:{scope}'
+
+
+def _initial_generation():
+    # Пропавший из кэша счётчик начинаем не с единицы, а с текущего
+    # времени, чтобы не совпасть со страницами прежних поколений.
+    return int(time.time() * 1000)
+
+
+def generations(scopes):
+    """Текущие поколения областей в том же порядке, что и ``scopes``."""
+    keys = [generation_key(scope) for scope in scopes]
+    found = cache.get_many(keys)
+    result = []
+    for key in keys:
+        if key not in found:
+            cache.add(key, _initial_generation(), None)
+            found[key] = cache.get(key)
+        result.append(found[key])
+    return result
+
+
+def bump(*scopes):
+    """Переводит области на новое поколение."""
+    for scope in scopes:
+        key = generation_key(scope)
+        try:
+            cache.incr(key)
+        except ValueError:
+            if not cache.add(key, _initial_generation(), None):
+                cache.incr(key)
+
+
+def post_scopes(post, group_slug=None):
+    """Области, в которых показывается запись."""
+    scopes = [GLOBAL, post_scope(post.pk), author_scope(post.author_id)]
+    if post.group_id:
+        scopes.append(group_scope(post.group.slug))
+    if group_slug:
+        scopes.append(group_scope(group_slug))
+    return scopes
+
+
+def _viewer(request):
+    if not request.user.is_authenticated:
+        return 'anon'
+    csrf = request.COOKIES.get(settings.CSRF_COOKIE_NAME, '')
+    return f'user:{request.user.pk}:{csrf}'
+
+
+def page_key(request, scopes):
+    path = hashlib.md5(request.get_full_path().encode()).hexdigest()
+    versions = '.'.join(str(value) for value in generations(scopes))
+    return f'page:{_viewer(request)}:{path}:{versions}'
+
+
+def _cacheable(request, response):
+    if response.status_code != 200 or response.streaming:
+        return False
+    if response.cookies:
+        return False
+    # Страница с CSRF-токеном без cookie в запросе содержит токен,
+    # который для другого клиента будет чужим.
+    return not (request.META.get('CSRF_COOKIE_USED')
+                and settings.CSRF_COOKIE_NAME not in request.COOKIES)
+
+
+def cache_page_by_generation(scopes):
+    """
+    Кэширует ответ представления до смены поколения любой из областей.
+
+    ``scopes`` получает те же аргументы, что и представление, и
+    возвращает список областей, от которых зависит страница; если в
+    нём есть None, ответ не кэшируется.
+    Асинхронное представление обращается к кэшу через пул потоков.
+    """
+    def decorator(view):
+        if asyncio.iscoroutinefunction(view):
+            return _async_cache_page(view, scopes)
+
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return view(request, *args, **kwargs)
+            page_scopes = scopes(request, *args, **kwargs)
+            if None in page_scopes:
+                return view(request, *args, **kwargs)
+            key = page_key(request, page_scopes)
+            response = cache.get(key)
+            if response is not None:
+                return response
+            response = view(request, *args, **kwargs)
+            if _cacheable(request, response):
+                cache.set(key, response, settings.PAGE_CACHE_TIMEOUT)
+            return response
+        return wrapper
+    return decorator
+
+
+def _async_cache_page(view, scopes):
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method not in ('GET', 'HEAD'):
+            return await view(request, *args, **kwargs)
+        page_scopes = await run_sync(scopes, request, *args, **kwargs)
+        if None in page_scopes:
+            return await view(request, *args, **kwargs)
+        key = await run_sync(page_key, request, page_scopes)
+        response = await run_sync(cache.get, key)
+        if response is not None:
+            return response
+        response = await view(request, *args, **kwargs)
+        if _cacheable(request, response):
+            await run_sync(cache.set, key, response,
+                           settings.PAGE_CACHE_TIMEOUT)
+        return response
+    return wrapper
@@ -0,0 +1,114 @@
+"""
+Денормализованные счётчики записей, комментариев и подписок.
+
+Счётчики меняются атомарно (через F-выражения) сигналами создания и
+удаления Post, Comment и Follow. Разошедшиеся значения пересчитывает
+команда ``manage.py rebuild_counters``.
+"""
+from django.contrib.auth import get_user_model
+from django.db.models import Count, F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+def _change(queryset, field, delta):
+    if delta < 0:
+        queryset = queryset.filter(**{f'{field}__gte': -delta})
+    return queryset.update(**{field: F(field) + delta})
+
+
+def change_user_stats(user_id, field, delta):
+    updated = _change(UserStats.objects.filter(user_id=user_id),
+                      field, delta)
+    if not updated and delta > 0 and not UserStats.objects.filter(
+            user_id=user_id).exists():
+        rebuild_user_stats(user_id)
+
+
+def change_comment_count(post_id, delta):
+    _change(Post.objects.filter(pk=post_id), 'comment_count', delta)
+
+
+def _related_count(model, field, outer='pk'):
+    counts = (model.objects.filter(**{field: OuterRef(outer)})
+              .order_by().values(field)
+              .annotate(total=Count('pk')).values('total'))
+    return Coalesce(Subquery(counts), 0)
+
+
+def user_stats_expressions():
+    return {
+        'posts_count': _related_count(Post, 'author'),
+        'followers_count': _related_count(Follow, 'author'),
+        'following_count': _related_count(Follow, 'user'),
+    }
+
+
+def comment_count_expression():
+    return _related_count(Comment, 'post')
+
+
+def rebuild_user_stats(user_id):
+    """Пересчитывает счётчики одного пользователя."""
+    UserStats.objects.get_or_create(user_id=user_id)
+    UserStats.objects.filter(user_id=user_id).update(
+        **user_stats_expressions())
+
+
+def stats_for(user):
+    """Строка счётчиков пользователя; создаётся при первом обращении."""
+    try:
+        return user.stats
+    except UserStats.DoesNotExist:
+        rebuild_user_stats(user.pk)
+        return UserStats.objects.get(user_id=user.pk)
+
+
+def _drifted(queryset, expressions):
+    actual = {f'actual_{name}': expression
+              for name, expression in expressions.items()}
+    condition = Q()
+    for name in expressions:
+        condition |= ~Q(**{name: F(f'actual_{name}')})
+    return (queryset.annotate(**actual).filter(condition)
+            .values_list('pk', flat=True))
+
+
+def _update_in_batches(model, pks, expressions, batch_size):
+    pks = list(pks)
+    for start in range(0, len(pks), batch_size):
+        model.objects.filter(pk__in=pks[start:start + batch_size]).update(
+            **expressions)
+    return len(pks)
+
+
+def rebuild(dry_run=False, batch_size=1000):
+    """
+    Сверяет счётчики с таблицами и исправляет разошедшиеся.
+
+    Возвращает число исправленных (или найденных при dry_run) строк.
+    """
+    missing = list(User.objects.filter(stats__isnull=True)
+                   .values_list('pk', flat=True))
+    report = {'missing_stats': len(missing)}
+    if not dry_run:
+        UserStats.objects.bulk_create(
+            [UserStats(user_id=pk) for pk in missing],
+            batch_size=batch_size, ignore_conflicts=True)
+        # Новые строки заполняются пересчётом ниже.
+    stats = user_stats_expressions()
+    comments = {'comment_count': comment_count_expression()}
+    drifted_stats = _drifted(UserStats.objects.all(), stats)
+    drifted_posts = _drifted(Post.objects.all(), comments)
+    if dry_run:
+        report['user_stats'] = drifted_stats.count()
+        report['posts'] = drifted_posts.count()
+        return report
+    report['user_stats'] = _update_in_batches(
+        UserStats, drifted_stats, stats, batch_size)
+    report['posts'] = _update_in_batches(
+        Post, drifted_posts, comments, batch_size)
+    return report
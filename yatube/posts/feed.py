@@ -0,0 +1,183 @@
+"""
+Материализованная лента подписок (fan-out on write).
+
+Новая запись автора сразу раскладывается в ленты его подписчиков,
+поэтому страница «Избранные авторы» читает готовый диапазон строк
+FeedEntry по индексу, а не соединяет Follow и Post на каждом запросе.
+Авторов с очень большим числом подписчиков в ленты не раскладываем:
+их записи подмешиваются при чтении (fan-out on read). Когда автор
+переходит этот порог, список знаменитостей сбрасывается, а при
+переходе вниз его последние записи раскладываются по лентам.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+from . import graph
+from .models import FeedEntry, Follow, Post, UserStats
+from .paginators import NEXT, CursorPaginator, approximate_count
+
+CELEBRITIES_CACHE_KEY = 'feed:celebrities:{limit}'
+
+
+def fanout_limit():
+    return settings.FEED_FANOUT_MAX_FOLLOWERS
+
+
+def celebrity_ids():
+    """Авторы, чьи записи не раскладываются по лентам подписчиков."""
+    limit = fanout_limit()
+    key = CELEBRITIES_CACHE_KEY.format(limit=limit)
+    ids = cache.get(key)
+    if ids is None:
+        ids = frozenset(
+            UserStats.objects.filter(followers_count__gt=limit)
+            .values_list('user_id', flat=True)
+        )
+        cache.set(key, ids, settings.FEED_CELEBRITIES_CACHE_TIMEOUT)
+    return ids
+
+
+def forget_celebrities():
+    cache.delete(CELEBRITIES_CACHE_KEY.format(limit=fanout_limit()))
+
+
+def followers_changed(author_id, delta):
+    """
+    Вызывается после изменения счётчика подписчиков автора на
+    ``delta``: следит за переходом через FEED_FANOUT_MAX_FOLLOWERS.
+    """
+    limit = fanout_limit()
+    count = (UserStats.objects.filter(user_id=author_id)
+             .values_list('followers_count', flat=True).first())
+    if count is None:
+        return
+    before = count - delta
+    if before <= limit < count:
+        # Новые записи уже не раскладываются: их надо подмешивать.
+        forget_celebrities()
+    elif count <= limit < before:
+        # Записи, написанные знаменитостью, в ленты не попали.
+        forget_celebrities()
+        backfill_followers(author_id)
+
+
+def fan_out_post(post):
+    """Раскладывает новую запись по лентам подписчиков автора."""
+    limit = fanout_limit()
+    if post.author_id in celebrity_ids():
+        return
+    follower_ids = list(
+        Follow.objects.filter(author_id=post.author_id)
+        .values_list('user_id', flat=True)[:limit + 1]
+    )
+    if len(follower_ids) > limit:
+        return
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post.id,
+                   author_id=post.author_id, pub_date=post.pub_date)
+         for user_id in follower_ids],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill(user_id, author_id):
+    """Добавляет в ленту последние записи автора после подписки."""
+    if author_id in celebrity_ids():
+        return
+    posts = (Post.objects.filter(author_id=author_id)
+             .values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+    FeedEntry.objects.bulk_create(
+        [FeedEntry(user_id=user_id, post_id=post_id, author_id=author_id,
+                   pub_date=pub_date)
+         for post_id, pub_date in posts],
+        batch_size=settings.FEED_BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+
+
+def backfill_followers(author_id):
+    """Раскладывает последние записи автора по лентам всех подписчиков."""
+    if author_id in celebrity_ids():
+        return
+    posts = list(
+        Post.objects.filter(author_id=author_id)
+        .values_list('id', 'pub_date')[:settings.FEED_BACKFILL_SIZE])
+    follower_ids = (Follow.objects.filter(author_id=author_id)
+                    .values_list('user_id', flat=True).iterator())
+    for user_id in follower_ids:
+        FeedEntry.objects.bulk_create(
+            [FeedEntry(user_id=user_id, post_id=post_id,
+                       author_id=author_id, pub_date=pub_date)
+             for post_id, pub_date in posts],
+            batch_size=settings.FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+
+def trim(user_id, author_id):
+    """Убирает из ленты записи автора после отписки."""
+    FeedEntry.objects.filter(user_id=user_id, author_id=author_id).delete()
+
+
+def followed_celebrities(user):
+    celebrities = celebrity_ids()
+    if not celebrities:
+        return []
+    return [author_id for author_id in graph.following(user.pk)
+            if author_id in celebrities]
+
+
+def follow_feed(user):
+    """Записи авторов, на которых подписан пользователь."""
+    celebrities = followed_celebrities(user)
+    if not celebrities:
+        # Сортировка по копии даты в FeedEntry идёт по индексу ленты.
+        return Post.objects.filter(feed_entries__user=user).order_by(
+            '-feed_entries__pub_date')
+    # Два источника сливаются сортировкой; страницы курсором
+    # (FeedPaginator) обходятся без неё.
+    return Post.objects.filter(
+        Q(id__in=FeedEntry.objects.filter(user=user).values('post_id'))
+        | Q(author_id__in=celebrities)
+    )
+
+
+class FeedPaginator(CursorPaginator):
+    """
+    Курсорные страницы ленты подписок.
+
+    Кандидаты на страницу выбираются подзапросами отдельно из FeedEntry
+    пользователя и из записей каждой знаменитости, на которую он
+    подписан: каждый идёт по своему индексу без сортировки. Записи
+    ``posts`` загружаются одним запросом по первичному ключу и
+    сливаются по (pub_date, id) уже в Python.
+    """
+
+    def __init__(self, user, posts, per_page):
+        super().__init__(posts, per_page)
+        self.user = user
+
+    def sources(self):
+        entries = FeedEntry.objects.filter(user=self.user)
+        yield entries, ('pub_date', 'post_id')
+        for author_id in followed_celebrities(self.user):
+            yield Post.objects.filter(author_id=author_id), ('pub_date', 'id')
+
+    def rows(self, direction, values, limit):
+        candidates = Q(pk__in=[])
+        for queryset, keys in self.sources():
+            candidates |= Q(pk__in=self.keyset(
+                queryset, keys, direction, values).values(keys[1])[:limit])
+        posts = list(self.object_list.filter(candidates).order_by())
+        posts.sort(key=lambda post: (post.pub_date, post.id),
+                   reverse=direction == NEXT)
+        return posts[:limit]
+
+    @cached_property
+    def count(self):
+        if self._exact_count is not None:
+            return self._exact_count
+        return approximate_count(FeedEntry.objects.filter(user=self.user))
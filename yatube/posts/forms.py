@@ -1,6 +1,10 @@
 from django import forms
+from django.conf import settings
+from django.core.files.uploadedfile import UploadedFile
 from django.forms.widgets import Textarea
+from django.template.defaultfilters import filesizeformat
 
+from . import images
 from .models import Post, Comment
 
 
@@ -21,6 +25,34 @@ class PostForm(forms.ModelForm):
             }
         }
 
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        # Слишком большой файл записан не целиком (см. posts/images.py),
+        # поэтому даже не пытаемся его читать.
+        image = self.files.get('image')
+        self.image_too_large = (
+            image is not None
+            and image.size > settings.IMAGE_UPLOAD_MAX_SIZE)
+        if self.image_too_large:
+            self.files = self.files.copy()
+            del self.files['image']
+
+    def clean_image(self):
+        image = self.cleaned_data['image']
+        if not isinstance(image, UploadedFile):
+            if not image:
+                self.instance.image_hash = ''
+            return image
+        master, self.instance.image_hash = images.normalize(image)
+        return master
+
+    def clean(self):
+        cleaned_data = super().clean()
+        if self.image_too_large:
+            self.add_error('image', 'Файл больше {}.'.format(
+                filesizeformat(settings.IMAGE_UPLOAD_MAX_SIZE)))
+        return cleaned_data
+
 
 class CommentForm(forms.ModelForm):
     class Meta:
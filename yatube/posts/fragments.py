@@ -0,0 +1,59 @@
+"""
+Кэш отрисованных карточек записей.
+
+Карточка (includes/post_item.html) не зависит от того, кто её
+смотрит, поэтому хранится в кэше под ключом из id записи и отпечатка
+показываемых в ней полей: правка записи, новый комментарий или
+переименование группы дают новый ключ. Все карточки страницы читаются
+одним ``get_many``, отрисовываются только промахи, и они записываются
+обратно одним ``set_many``. Кнопка редактирования зависит от
+пользователя и подставляется в готовую карточку вместо метки.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from django.template.loader import render_to_string
+from django.utils.safestring import mark_safe
+
+ACTIONS_MARKER = '<!-- post-actions -->'
+
+
+def card_version(post):
+    """Отпечаток всех полей записи, которые видны в карточке."""
+    group = post.group
+    parts = (
+        post.text, post.pub_date.isoformat(), post.image.name or '',
+        post.thumbnails,
+        post.comment_count, post.author.username,
+        group.slug if group else '', group.title if group else '',
+    )
+    return hashlib.md5(repr(parts).encode()).hexdigest()
+
+
+def card_key(post, show_comment_link):
+    return (f'post_card:{post.pk}:{card_version(post)}:'
+            f'{int(show_comment_link)}')
+
+
+def render_post_cards(posts, user=None, show_comment_link=True):
+    posts = list(posts)
+    keys = [card_key(post, show_comment_link) for post in posts]
+    cards = cache.get_many(keys)
+    rendered = {
+        key: render_to_string('includes/post_item.html', {
+            'post': post, 'show_comment_link': show_comment_link})
+        for key, post in zip(keys, posts) if key not in cards
+    }
+    if rendered:
+        cache.set_many(rendered, settings.POST_CARD_CACHE_TIMEOUT)
+        cards.update(rendered)
+    user_id = getattr(user, 'pk', None)
+    html = []
+    for key, post in zip(keys, posts):
+        actions = ''
+        if user_id is not None and user_id == post.author_id:
+            actions = render_to_string('includes/post_actions.html',
+                                       {'post': post})
+        html.append(cards[key].replace(ACTIONS_MARKER, actions))
+    return mark_safe(''.join(html))
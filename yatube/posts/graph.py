@@ -0,0 +1,153 @@
+"""
+Граф подписок в кэше.
+
+Для каждого пользователя в кэше лежат два отсортированных массива id:
+на кого он подписан и кто подписан на него (``array('i')`` в байтах,
+4 байта на связь — как у AutoField). Проверка подписки — двоичный
+поиск, счётчики — длина массива, взаимные подписки — слияние двух
+массивов, подсказки «на кого подписаться» — подсчёт авторов, на
+которых подписаны те, на кого подписан пользователь. Промах кэша
+читается одним запросом по индексу Follow, сразу для всех нужных
+пользователей.
+
+Сигналы подписки и отписки (signals.py) после фиксации транзакции
+удаляют массивы подписчика и автора, а не правят их на месте: две
+правки одного массива из разных процессов затирали бы друг друга, а
+перечитанный из Follow массив всегда верен. Срок жизни массивов
+FOLLOW_GRAPH_TIMEOUT остаётся страховкой, а ``reset()`` (например,
+после импорта) переводит весь граф на новое поколение.
+"""
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.core.cache import cache
+
+from . import caching
+from .models import Follow
+
+FOLLOWING = 'following'
+FOLLOWERS = 'followers'
+
+GRAPH_SCOPE = 'graph'
+
+# Поле Follow с id пользователя и поле с id его соседей.
+_COLUMNS = {
+    FOLLOWING: ('user_id', 'author_id'),
+    FOLLOWERS: ('author_id', 'user_id'),
+}
+
+
+def _key(generation, kind, user_id):
+    return f'graph:{generation}:{kind}:{user_id}'
+
+
+def _decode(data):
+    ids = array('i')
+    ids.frombytes(data)
+    return ids
+
+
+def _load(kind, user_ids):
+    owner, neighbour = _COLUMNS[kind]
+    neighbours = defaultdict(list)
+    rows = (Follow.objects.filter(**{f'{owner}__in': user_ids})
+            .order_by().values_list(owner, neighbour))
+    for user_id, neighbour_id in rows.iterator():
+        neighbours[user_id].append(neighbour_id)
+    return {user_id: array('i', sorted(neighbours[user_id]))
+            for user_id in user_ids}
+
+
+def _arrays(kind, user_ids):
+    """Массивы соседей ``user_ids``: {id: array}."""
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        return {}
+    generation, = caching.generations([GRAPH_SCOPE])
+    keys = {user_id: _key(generation, kind, user_id)
+            for user_id in user_ids}
+    found = cache.get_many(keys.values())
+    result = {user_id: _decode(found[key])
+              for user_id, key in keys.items() if key in found}
+    missing = [user_id for user_id in user_ids if user_id not in result]
+    if missing:
+        loaded = _load(kind, missing)
+        cache.set_many({keys[user_id]: ids.tobytes()
+                        for user_id, ids in loaded.items()},
+                       settings.FOLLOW_GRAPH_TIMEOUT)
+        result.update(loaded)
+    return result
+
+
+def following(user_id):
+    """Отсортированные id авторов, на которых подписан пользователь."""
+    return _arrays(FOLLOWING, [user_id])[user_id]
+
+
+def followers(user_id):
+    """Отсортированные id подписчиков пользователя."""
+    return _arrays(FOLLOWERS, [user_id])[user_id]
+
+
+def _contains(ids, value):
+    index = bisect_left(ids, value)
+    return index < len(ids) and ids[index] == value
+
+
+def is_following(user_id, author_id):
+    """Подписан ли ``user_id`` на ``author_id``; аноним (None) — нет."""
+    if user_id is None:
+        return False
+    return _contains(following(user_id), author_id)
+
+
+def counts(user_id):
+    """(подписчиков, подписок) пользователя."""
+    return len(followers(user_id)), len(following(user_id))
+
+
+def mutuals(user_id):
+    """Те, с кем подписка взаимная, по возрастанию id."""
+    left, right = following(user_id), followers(user_id)
+    result, i, j = [], 0, 0
+    while i < len(left) and j < len(right):
+        if left[i] == right[j]:
+            result.append(left[i])
+            i += 1
+            j += 1
+        elif left[i] < right[j]:
+            i += 1
+        else:
+            j += 1
+    return result
+
+
+def suggestions(user_id, limit=10):
+    """
+    На кого подписаться: [(id автора, сколько ваших авторов на него
+    подписано)] по убыванию. Смотрит подписки не больше чем
+    FOLLOW_SUGGESTION_SOURCES авторов пользователя.
+    """
+    authors = following(user_id)
+    sources = authors[:settings.FOLLOW_SUGGESTION_SOURCES]
+    common = Counter()
+    for ids in _arrays(FOLLOWING, sources).values():
+        common.update(ids)
+    ranked = sorted(
+        ((-number, candidate) for candidate, number in common.items()
+         if candidate != user_id and not _contains(authors, candidate)))
+    return [(candidate, -number) for number, candidate in ranked[:limit]]
+
+
+def forget(user_id, author_id):
+    """Подписка изменилась: массивы обоих перечитаются из Follow."""
+    generation, = caching.generations([GRAPH_SCOPE])
+    cache.delete_many([_key(generation, FOLLOWING, user_id),
+                       _key(generation, FOLLOWERS, author_id)])
+
+
+def reset():
+    """Забывает весь граф: массивы перечитаются при обращении."""
+    caching.bump(GRAPH_SCOPE)
@@ -0,0 +1,101 @@
+"""
+Приём картинок записей.
+
+Загрузка пишется на диск кусками (BoundedUploadHandler), сверх
+IMAGE_UPLOAD_MAX_SIZE байт ничего не сохраняется. Размеры картинки
+проверяются по заголовку до декодирования. Декодируется она один раз и
+сразу в уменьшенном виде: для JPEG через ``draft()``, для остальных
+форматов через ``reduce`` внутри ``thumbnail()``. В хранилище попадает
+нормализованный мастер не больше IMAGE_MASTER_MAX_SIDE по длинной
+стороне в первом доступном формате из IMAGE_MASTER_FORMATS.
+Одинаковые мастера хранятся одним файлом: имя в хранилище — SHA-256
+содержимого (posts/storage.py). Перцептивный хэш лишь сохраняется в
+Post.image_hash: похожие картинки не обязательно одинаковы.
+"""
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import TemporaryFileUploadHandler
+from PIL import Image, ImageOps, features
+
+EXTENSIONS = {'WEBP': 'webp', 'AVIF': 'avif', 'JPEG': 'jpg'}
+# Форматы, которые умеют хранить прозрачность.
+ALPHA_FORMATS = {'WEBP', 'AVIF'}
+
+
+class BoundedUploadHandler(TemporaryFileUploadHandler):
+    """
+    Пишет загрузку во временный файл и перестаёт писать после лимита.
+
+    Размер файла при этом считается полностью, чтобы форма могла
+    сообщить, что картинка слишком велика.
+    """
+
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received <= settings.IMAGE_UPLOAD_MAX_SIZE:
+            self.file.write(raw_data)
+
+
+def master_format():
+    for name in settings.IMAGE_MASTER_FORMATS:
+        if name == 'JPEG' or features.check(name.lower()):
+            return name
+    return 'JPEG'
+
+
+def perceptual_hash(image):
+    """Разностный хэш (dHash) картинки: 16 шестнадцатеричных знаков."""
+    pixels = image.convert('L').resize((9, 8), Image.LANCZOS).tobytes()
+    bits = 0
+    for row in range(8):
+        for column in range(8):
+            left = pixels[row * 9 + column]
+            bits = bits << 1 | (left > pixels[row * 9 + column + 1])
+    return f'{bits:016x}'
+
+
+def normalize(uploaded):
+    """
+    Мастер картинки и её перцептивный хэш.
+
+    Возвращает ContentFile с именем ``<хэш>.<расширение>``; на
+    слишком большую или нечитаемую картинку бросает ValidationError.
+    """
+    uploaded.seek(0)
+    try:
+        image = Image.open(uploaded)
+        width, height = image.size
+    except (OSError, ValueError):
+        raise ValidationError('Не удалось прочитать картинку.')
+    if width * height > settings.IMAGE_MAX_PIXELS:
+        raise ValidationError(
+            'Картинка слишком большая: не больше %(pixels)s пикселей.',
+            params={'pixels': settings.IMAGE_MAX_PIXELS})
+
+    side = settings.IMAGE_MASTER_MAX_SIDE
+    image_format = master_format()
+    try:
+        image.draft('RGB', (side, side))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((side, side), Image.LANCZOS, reducing_gap=3.0)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        raise ValidationError('Не удалось прочитать картинку.')
+    has_alpha = (image.mode in ('RGBA', 'LA', 'PA')
+                 or 'transparency' in image.info)
+    if has_alpha and image_format in ALPHA_FORMATS:
+        image = image.convert('RGBA')
+    else:
+        image = image.convert('RGB')
+
+    image_hash = perceptual_hash(image)
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=settings.IMAGE_MASTER_QUALITY)
+    name = f'{image_hash}.{EXTENSIONS[image_format]}'
+    return ContentFile(buffer.getvalue(), name=name), image_hash
@@ -0,0 +1,149 @@
+"""
+Защита путей записи от повторов и потока запросов.
+
+``idempotent`` гасит повторную отправку формы и повторы клиента после
+обрыва связи. Отпечаток запроса — пользователь, адрес, поля формы и
+ключ ``Idempotency-Key`` (заголовок или скрытое поле формы, см.
+``{% idempotency_field %}``). Первый запрос занимает отпечаток через
+cache.add, остальные с тем же отпечатком получают ответ первого
+(перенаправление) или 409, пока первый ещё выполняется. Без ключа
+отпечаток живёт IDEMPOTENCY_WINDOW секунд, с ключом —
+IDEMPOTENCY_KEY_TTL.
+
+``rate_limit`` — ведро маркеров на пользователя. Состояние ведра —
+одно число в кэше, момент, когда ведро снова станет полным (GCRA),
+поэтому проверка — это get и set. Без атомарной операции
+чтения-записи параллельные запросы одного пользователя могут
+пройти на пару маркеров больше лимита; для защиты от потока этого
+достаточно.
+
+Оба декоратора пропускают GET и HEAD без обращений к кэшу.
+"""
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+
+IDEMPOTENCY_PREFIX = 'idem:'
+
+THROTTLE_PREFIX = 'throttle:'
+
+KEY_FIELD = 'idempotency_key'
+
+# Поля формы, которые не описывают содержимое записи.
+IGNORED_FIELDS = ('csrfmiddlewaretoken', KEY_FIELD)
+
+_PENDING = 'pending'
+
+
+def _client(request):
+    if request.user.is_authenticated:
+        return f'user:{request.user.pk}'
+    return 'ip:{}'.format(request.META.get('REMOTE_ADDR', ''))
+
+
+def request_key(request):
+    """Ключ от клиента: заголовок Idempotency-Key или поле формы."""
+    return (request.META.get('HTTP_IDEMPOTENCY_KEY')
+            or request.POST.get(KEY_FIELD, ''))
+
+
+def fingerprint(request, key):
+    digest = hashlib.sha256()
+    for part in (_client(request), request.path, key):
+        digest.update(part.encode() + b'\0')
+    for name, values in sorted(request.POST.lists()):
+        if name not in IGNORED_FIELDS:
+            digest.update(repr((name, values)).encode())
+    for name, files in sorted(request.FILES.lists()):
+        digest.update(repr(
+            (name, [(file.name, file.size) for file in files])).encode())
+    return IDEMPOTENCY_PREFIX + digest.hexdigest()
+
+
+def retry_later(message, status, retry_after):
+    response = HttpResponse(message, status=status,
+                            content_type='text/plain; charset=utf-8')
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+def idempotent(view):
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method != 'POST':
+            return view(request, *args, **kwargs)
+        key = request_key(request)
+        timeout = (settings.IDEMPOTENCY_KEY_TTL if key
+                   else settings.IDEMPOTENCY_WINDOW)
+        cache_key = fingerprint(request, key)
+        if not cache.add(cache_key, _PENDING, timeout):
+            location = cache.get(cache_key)
+            if location is None or location == _PENDING:
+                return retry_later('Такой запрос уже выполняется.', 409, 1)
+            response = HttpResponseRedirect(location)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+        try:
+            response = view(request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        # Запоминаются только успешные записи: форму с ошибками можно
+        # исправить и отправить снова.
+        if response.status_code in (301, 302, 303):
+            cache.set(cache_key, response['Location'], timeout)
+        else:
+            cache.delete(cache_key)
+        return response
+    return wrapper
+
+
+def throttle_key(scope, request):
+    return f'{THROTTLE_PREFIX}{scope}:{_client(request)}'
+
+
+def take_token(key, limit, period, now=None):
+    """
+    Берёт маркер из ведра ``key`` на ``limit`` маркеров, которые
+    полностью восстанавливаются за ``period`` секунд.
+
+    Возвращает 0, если маркер взят, иначе через сколько секунд
+    появится следующий.
+    """
+    now = time.time() if now is None else now
+    interval = period / limit
+    full_at = max(cache.get(key) or now, now)
+    allowed_at = full_at + interval - period
+    if allowed_at > now:
+        return allowed_at - now
+    full_at += interval
+    cache.set(key, full_at, math.ceil(full_at - now))
+    return 0
+
+
+def rate_limit(scope):
+    """
+    Лимит RATE_LIMITS[scope] = (маркеров, секунд) на пользователя;
+    области, которой нет в RATE_LIMITS, лимит не нужен.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            rule = settings.RATE_LIMITS.get(scope)
+            if request.method != 'POST' or rule is None:
+                return view(request, *args, **kwargs)
+            limit, period = rule
+            retry_after = take_token(throttle_key(scope, request),
+                                     limit, period)
+            if retry_after:
+                return retry_later(
+                    'Слишком много запросов, попробуйте позже.', 429,
+                    retry_after)
+            return view(request, *args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,82 @@
+"""
+Живые обновления лент по SSE (см. yatube/asgi.py).
+
+Сохранение записи и комментария после фиксации транзакции публикует
+событие: ``post`` с id, автором и группой новой записи и ``comments``
+с новым числом комментариев. ``/events/`` отдаёт все события,
+``/events/follow/`` — только о записях авторов, на которых подписан
+вошедший пользователь (подписки читаются при подключении). На эти
+адреса подписываются главная страница и «Избранные авторы»
+(templates/base.html) и предлагают показать новые записи.
+
+Брокер (yatube/events.py) живёт в памяти процесса: событие получают
+только клиенты, подключённые к тому же процессу, что сохранил запись.
+При нескольких процессах остальные клиенты его не увидят.
+"""
+from http.cookies import SimpleCookie
+from importlib import import_module
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.auth import get_user
+
+from yatube import streaming
+from yatube.events import broker
+
+from .models import Follow, Post
+
+
+def publish_post(post):
+    broker.publish('post', {
+        'id': post.pk,
+        'author': post.author.username,
+        'group': post.group.slug if post.group_id else None,
+    })
+
+
+def publish_comments(post_id):
+    # Без подписчиков незачем читать счётчик.
+    if not broker.subscribers:
+        return
+    post = (Post.objects.filter(pk=post_id)
+            .values_list('author__username', 'comment_count').first())
+    if post is not None:
+        broker.publish('comments', {'post': post_id, 'author': post[0],
+                                    'comments': post[1]})
+
+
+def _last_event_id(scope):
+    value = streaming.header(scope, b'last-event-id')
+    return int(value) if value and value.isdigit() else None
+
+
+def _followed(cookie_header):
+    """Имена авторов, на которых подписан владелец сессии, или None."""
+    cookies = SimpleCookie(cookie_header or '')
+    morsel = cookies.get(settings.SESSION_COOKIE_NAME)
+    if morsel is None:
+        return None
+    engine = import_module(settings.SESSION_ENGINE)
+    user = get_user(SimpleNamespace(
+        session=engine.SessionStore(morsel.value)))
+    if not user.is_authenticated:
+        return None
+    return set(Follow.objects.filter(user=user)
+               .values_list('author__username', flat=True))
+
+
+async def index_stream(scope, receive, send):
+    subscription = broker.subscribe(last_id=_last_event_id(scope))
+    await streaming.stream_events(receive, send, subscription)
+
+
+async def follow_stream(scope, receive, send):
+    authors = await streaming.run_sync(
+        _followed, streaming.header(scope, b'cookie'))
+    if authors is None:
+        await streaming.respond(send, 403, 'Нужно войти на сайт.'.encode())
+        return
+    subscription = broker.subscribe(
+        lambda event: event.data['author'] in authors,
+        last_id=_last_event_id(scope))
+    await streaming.stream_events(receive, send, subscription)
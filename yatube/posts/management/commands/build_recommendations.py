@@ -0,0 +1,26 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import recommendations
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает подсказки «на кого подписаться».'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--no-numpy', action='store_true',
+            help='Считать без NumPy, даже если он установлен.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько подсказок записывать одним запросом.')
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        report = recommendations.build(
+            use_numpy=False if options['no_numpy'] else None,
+            batch_size=options['batch_size'])
+        for name, value in report.items():
+            self.stdout.write(f'{name}: {value}')
+        self.stdout.write(f'seconds: {time.perf_counter() - started:.1f}')
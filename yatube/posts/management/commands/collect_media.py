@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import media
+
+
+class Command(BaseCommand):
+    help = 'Удаляет картинки, на которые не ссылается ни одна запись.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace', type=int, default=3600,
+            help='Не трогать файлы моложе стольких секунд.')
+
+    def handle(self, *args, **options):
+        removed = media.collect_orphans(grace=options['grace'])
+        self.stdout.write(f'Удалено файлов: {removed}')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from posts import thumbnails
+
+
+class Command(BaseCommand):
+    help = 'Разбирает очередь подготовки миниатюр.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Обработать готовые задания и завершиться.')
+        parser.add_argument(
+            '--poll-interval', type=float, default=5,
+            help='Пауза в секундах, когда очередь пуста.')
+
+    def handle(self, *args, **options):
+        while True:
+            done = thumbnails.run_pending()
+            if done:
+                self.stdout.write(f'Обработано заданий: {done}')
+            if options['once']:
+                break
+            if not done:
+                time.sleep(options['poll_interval'])
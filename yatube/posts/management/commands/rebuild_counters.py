@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+
+from posts import counters
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает счётчики записей, комментариев и подписок.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help='Только показать число разошедшихся счётчиков.')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк обновлять одним запросом.')
+
+    def handle(self, *args, **options):
+        report = counters.rebuild(dry_run=options['dry_run'],
+                                  batch_size=options['batch_size'])
+        for name, value in report.items():
+            self.stdout.write(f'{name}: {value}')
@@ -0,0 +1,16 @@
+from django.core.management.base import BaseCommand
+
+from posts import search
+
+
+class Command(BaseCommand):
+    help = 'Заново строит поисковый индекс записей и комментариев.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Сколько строк читать из базы за один раз.')
+
+    def handle(self, *args, **options):
+        search.rebuild(batch_size=options['batch_size'])
+        self.stdout.write('Поисковый индекс перестроен.')
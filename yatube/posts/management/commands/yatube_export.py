@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk
+
+
+class Command(BaseCommand):
+    help = 'Выгружает записи, комментарии и подписки в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output', nargs='?', default='-',
+            help='Файл выгрузки; «-» — стандартный вывод.')
+        parser.add_argument(
+            '--format', choices=bulk.FORMATS,
+            help='Формат; по умолчанию определяется по расширению файла.')
+        parser.add_argument(
+            '--model', action='append', choices=list(bulk.FIELDS),
+            help='Что выгружать; для CSV ровно одна модель.')
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help='Сколько строк читать из базы за один раз.')
+
+    def handle(self, *args, **options):
+        output = options['output']
+        file_format = options['format'] or bulk.guess_format(output)
+        models = options['model'] or list(bulk.FIELDS)
+        if file_format == 'csv' and len(models) != 1:
+            raise CommandError('Для CSV укажите одну модель: --model.')
+        stream = (sys.stdout if output == '-'
+                  else open(output, 'w', encoding='utf-8', newline=''))
+        try:
+            if file_format == 'csv':
+                written = bulk.write_csv(stream, models[0],
+                                         options['chunk_size'])
+            else:
+                written = bulk.write_ndjson(stream, models,
+                                            options['chunk_size'])
+        finally:
+            if stream is not sys.stdout:
+                stream.close()
+        self.stderr.write(f'Выгружено объектов: {written}')
@@ -0,0 +1,56 @@
+import sys
+from contextlib import ExitStack
+
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import bulk
+from posts.models import Comment, Follow, Post
+
+
+class Command(BaseCommand):
+    help = 'Загружает записи, комментарии и подписки из NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'input', help='Файл выгрузки; «-» — стандартный ввод.')
+        parser.add_argument(
+            '--format', choices=bulk.FORMATS,
+            help='Формат; по умолчанию определяется по расширению файла.')
+        parser.add_argument(
+            '--model', choices=list(bulk.FIELDS),
+            help='Модель строк CSV-файла.')
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Сколько объектов сохранять одной транзакцией.')
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки для продолжения импорта.')
+        parser.add_argument(
+            '--defer-indexes', action='store_true',
+            help='Снять индексы на время загрузки и построить их в конце.')
+
+    def handle(self, *args, **options):
+        source = options['input']
+        file_format = options['format'] or bulk.guess_format(source)
+        if file_format == 'csv' and not options['model']:
+            raise CommandError('Для CSV укажите модель строк: --model.')
+        importer = bulk.Importer(batch_size=options['batch_size'])
+        checkpoint = bulk.Checkpoint(options['checkpoint'])
+        with ExitStack() as stack:
+            stream = (sys.stdin if source == '-' else stack.enter_context(
+                open(source, encoding='utf-8', newline='')))
+            if file_format == 'csv':
+                records = bulk.read_csv(stream, options['model'])
+            else:
+                records = bulk.read_ndjson(stream)
+            if options['defer_indexes']:
+                stack.enter_context(
+                    bulk.deferred_indexes([Post, Comment, Follow]))
+            try:
+                loaded = importer.run(records, checkpoint)
+            except bulk.ImportConflict as error:
+                raise CommandError(
+                    f'{error} Загружено объектов: {importer.loaded}.')
+        importer.finish()
+        checkpoint.clear()
+        self.stdout.write(f'Загружено объектов: {loaded}')
@@ -0,0 +1,218 @@
+"""
+Медиафайлы записей, адресуемые содержимым.
+
+Файлы картинок называются по SHA-256 содержимого (см.
+posts/storage.py), поэтому одинаковые файлы хранятся один раз.
+Сколько записей ссылается на файл, хранит MediaFile: сигналы Post
+увеличивают и уменьшают счётчик, а файл без ссылок удаляется вместе
+с миниатюрами после фиксации транзакции. Потерянные файлы подбирает
+команда ``manage.py collect_media``.
+
+Содержимое файла по такому имени не меняется, поэтому ``serve`` отдаёт
+его с вечным ``Cache-Control: immutable``, ETag и поддержкой Range.
+"""
+import mimetypes
+import os
+import re
+import time
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from django.http import (FileResponse, Http404, HttpResponse,
+                         HttpResponseNotModified, StreamingHttpResponse)
+from django.utils._os import safe_join
+from django.utils.http import http_date, parse_etags, quote_etag
+
+from .models import MediaFile, Post
+
+HASHED_NAME_RE = re.compile(r'[0-9a-f]{2}/[0-9a-f]{2}/([0-9a-f]{64})\.')
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+def retain(name):
+    """Ещё одна запись ссылается на файл ``name``."""
+    if not name:
+        return
+    updated = MediaFile.objects.filter(name=name).update(
+        refcount=F('refcount') + 1)
+    if not updated:
+        try:
+            with transaction.atomic():
+                MediaFile.objects.create(name=name, refcount=1)
+        except IntegrityError:
+            retain(name)
+
+
+def release(name):
+    """Запись больше не ссылается на файл; файл без ссылок удаляется."""
+    if not name:
+        return
+    MediaFile.objects.filter(name=name, refcount__gt=0).update(
+        refcount=F('refcount') - 1)
+    transaction.on_commit(lambda: collect(name))
+
+
+def collect(name):
+    """
+    Удаляет файл и его миниатюры, если на него никто не ссылается.
+
+    Ссылки считает только MediaFile: у Post.image нет индекса, и поиск
+    записей с этим файлом читал бы всю таблицу при каждом удалении.
+    Проверка и удаление файла идут в одной транзакции, под блокировкой
+    записи: запись с тем же файлом (Post.save) сохраняется тоже под
+    ней и не может найти файл в хранилище между ними.
+    """
+    from sorl.thumbnail import delete as delete_thumbnails
+
+    storage = Post._meta.get_field('image').storage
+    with transaction.atomic():
+        MediaFile.objects.filter(name=name, refcount=0).delete()
+        if MediaFile.objects.filter(name=name).exists():
+            return False
+        try:
+            storage.delete(name)
+        except SuspiciousFileOperation:
+            # Имя вне MEDIA_ROOT: такой файл хранилищу не принадлежит.
+            return False
+    delete_thumbnails(name, delete_file=False)
+    return True
+
+
+def rebuild_references(batch_size=1000):
+    """Пересчитывает MediaFile по ссылкам записей."""
+    counts = (Post.objects.exclude(image='').exclude(image=None)
+              .order_by().values_list('image')
+              .annotate(total=Count('pk')).iterator())
+    with transaction.atomic():
+        MediaFile.objects.all().delete()
+        while True:
+            batch = [MediaFile(name=name, refcount=total)
+                     for name, total in islice(counts, batch_size)]
+            if not batch:
+                break
+            MediaFile.objects.bulk_create(batch)
+
+
+def collect_orphans(grace=3600):
+    """
+    Удаляет файлы без ссылок: нулевые счётчики и файлы, не попавшие
+    в MediaFile. Файлы моложе ``grace`` секунд не трогаются, их запись
+    может ещё сохраняться.
+    """
+    storage = Post._meta.get_field('image').storage
+    upload_to = Post._meta.get_field('image').upload_to
+    removed = 0
+    for name in MediaFile.objects.filter(refcount=0).values_list(
+            'name', flat=True).iterator():
+        removed += collect(name)
+    known = set(MediaFile.objects.values_list('name', flat=True))
+    root = storage.path(upload_to)
+    deadline = time.time() - grace
+    unknown = []
+    for directory, _, files in os.walk(root):
+        for filename in files:
+            path = os.path.join(directory, filename)
+            name = os.path.relpath(path, storage.location).replace(
+                os.sep, '/')
+            if name not in known and os.path.getmtime(path) <= deadline:
+                unknown.append(name)
+    # Записи, сохранённые без сигналов (loaddata), могут ссылаться на
+    # файл без MediaFile. Проверяем их пачками, а не по одному файлу.
+    names = iter(unknown)
+    while True:
+        batch = list(islice(names, 500))
+        if not batch:
+            break
+        used = set(Post.objects.filter(image__in=batch)
+                   .values_list('image', flat=True))
+        removed += sum(collect(name) for name in batch if name not in used)
+    return removed
+
+
+def _etag(name, stat):
+    match = HASHED_NAME_RE.search(name)
+    if match:
+        return quote_etag(match.group(1))
+    return quote_etag(f'{int(stat.st_mtime):x}-{stat.st_size:x}')
+
+
+def _byte_range(header, size):
+    """
+    Диапазон байтов (начало, конец) из заголовка Range.
+
+    None, если заголовка нет или он не разобран (отдаётся весь файл);
+    False, если диапазон за пределами файла.
+    """
+    match = RANGE_RE.match(header.strip())
+    if not match or match.group(1) == match.group(2) == '':
+        return None
+    first, last = match.groups()
+    if first == '':
+        length = int(last)
+        if length == 0:
+            return False
+        return max(size - length, 0), size - 1
+    first = int(first)
+    last = size - 1 if last == '' else min(int(last), size - 1)
+    if first > last or first >= size:
+        return False
+    return first, last
+
+
+def _read(path, start, length):
+    with open(path, 'rb') as file:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+
+def serve(request, path):
+    """Отдаёт файл из MEDIA_ROOT с ETag, Range и вечным кэшированием."""
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+    except ValueError:
+        raise Http404
+    if not os.path.isfile(full_path):
+        raise Http404
+    stat = os.stat(full_path)
+    etag = _etag(path, stat)
+    content_type = (mimetypes.guess_type(full_path)[0]
+                    or 'application/octet-stream')
+
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = HttpResponseNotModified()
+    else:
+        byte_range = None
+        if request.META.get('HTTP_IF_RANGE', etag) == etag:
+            byte_range = _byte_range(request.META.get('HTTP_RANGE', ''),
+                                     stat.st_size)
+        if byte_range is False:
+            response = HttpResponse(status=416)
+            response['Content-Range'] = f'bytes */{stat.st_size}'
+        elif byte_range:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                _read(full_path, start, end - start + 1),
+                status=206, content_type=content_type)
+            response['Content-Range'] = (
+                f'bytes {start}-{end}/{stat.st_size}')
+            response['Content-Length'] = end - start + 1
+        else:
+            response = FileResponse(open(full_path, 'rb'),
+                                    content_type=content_type)
+            response['Content-Length'] = stat.st_size
+    response['ETag'] = etag
+    response['Accept-Ranges'] = 'bytes'
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    if HASHED_NAME_RE.search(path):
+        response['Cache-Control'] = IMMUTABLE
+    return response
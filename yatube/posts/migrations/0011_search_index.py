@@ -0,0 +1,42 @@
+from django.db import migrations
+
+CREATE_TABLES = [
+    "CREATE VIRTUAL TABLE posts_post_fts USING fts5("
+    "body, pub_date UNINDEXED, tokenize='unicode61 remove_diacritics 0')",
+    "CREATE VIRTUAL TABLE posts_comment_fts USING fts5("
+    "body, post_id UNINDEXED, created UNINDEXED, "
+    "tokenize='unicode61 remove_diacritics 0')",
+]
+
+DROP_TABLES = [
+    'DROP TABLE IF EXISTS posts_post_fts',
+    'DROP TABLE IF EXISTS posts_comment_fts',
+]
+
+
+def create_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    from posts import search
+
+    for statement in CREATE_TABLES:
+        schema_editor.execute(statement)
+    search.rebuild()
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    for statement in DROP_TABLES:
+        schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0010_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
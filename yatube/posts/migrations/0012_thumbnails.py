@@ -0,0 +1,43 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:01
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+def queue_existing_images(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    ThumbnailJob = apps.get_model('posts', 'ThumbnailJob')
+    images = (Post.objects.exclude(image='').exclude(image=None)
+              .values_list('pk', 'image').iterator())
+    ThumbnailJob.objects.bulk_create(
+        (ThumbnailJob(post_id=pk, image=image) for pk, image in images),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_search_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThumbnailJob',
+            fields=[
+                ('post', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='+', serialize=False, to='posts.Post')),
+                ('image', models.CharField(max_length=100)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('available_at', models.DateTimeField(db_index=True, default=django.utils.timezone.now)),
+                ('last_error', models.TextField(blank=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='thumbnails',
+            field=models.TextField(default='', editable=False, help_text='JSON: имя размера из THUMBNAIL_GEOMETRIES и адрес', verbose_name='Готовые миниатюры'),
+        ),
+        migrations.RunPython(queue_existing_images,
+                             migrations.RunPython.noop),
+    ]
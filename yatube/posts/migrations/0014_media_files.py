@@ -0,0 +1,40 @@
+# Generated by Django 2.2.6 on 2026-10-18 03:06
+
+from django.db import migrations, models
+from django.db.models import Count
+import posts.storage
+
+
+def count_references(apps, schema_editor):
+    Post = apps.get_model('posts', 'Post')
+    MediaFile = apps.get_model('posts', 'MediaFile')
+    counts = (Post.objects.exclude(image='').exclude(image=None)
+              .order_by().values_list('image')
+              .annotate(total=Count('pk')).iterator())
+    MediaFile.objects.bulk_create(
+        (MediaFile(name=name, refcount=total) for name, total in counts),
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_image_hash'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaFile',
+            fields=[
+                ('name', models.CharField(max_length=255, primary_key=True, serialize=False)),
+                ('refcount', models.PositiveIntegerField(default=0)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name='post',
+            name='image',
+            field=models.ImageField(blank=True, help_text='Загрузите картинку или фото', null=True, storage=posts.storage.ContentAddressedStorage(), upload_to='posts/', verbose_name='Картинка'),
+        ),
+        migrations.RunPython(count_references, migrations.RunPython.noop),
+    ]
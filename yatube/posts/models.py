@@ -1,5 +1,11 @@
+import json
+
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.db import models, transaction
+from django.utils import timezone
+
+from . import links, threads
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -18,6 +24,9 @@ class Group(models.Model):
     def __str__(self):
         return self.title
 
+    def get_absolute_url(self):
+        return links.group_url(self.slug)
+
 
 class Post(models.Model):
     text = models.TextField(
@@ -31,29 +40,83 @@ class Post(models.Model):
     )
     author = models.ForeignKey(
         User, on_delete=models.CASCADE, related_name='posts',
-        verbose_name='Автор', help_text='Укажите автора публикации'
+        verbose_name='Автор', help_text='Укажите автора публикации',
+        db_index=False,
     )
     group = models.ForeignKey(
         Group,
         verbose_name='Группа',
         blank=True,
         null=True,
+        db_index=False,
         on_delete=models.SET_NULL,
         related_name='posts',
         help_text='Укажите группу для публикации'
     )
     image = models.ImageField(
         upload_to='posts/', blank=True, null=True,
+        storage=ContentAddressedStorage(),
         verbose_name='Картинка',
         help_text='Загрузите картинку или фото'
     )
+    comment_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Количество комментариев',
+    )
+    image_hash = models.CharField(
+        max_length=16,
+        blank=True,
+        editable=False,
+        db_index=True,
+        verbose_name='Перцептивный хэш картинки',
+    )
+    thumbnails = models.TextField(
+        default='',
+        editable=False,
+        verbose_name='Готовые миниатюры',
+        help_text='JSON: имя размера из THUMBNAIL_GEOMETRIES и адрес',
+    )
 
     class Meta:
         ordering = ['-pub_date']
+        # Ленты читаются по этим индексам без сортировки; индексы
+        # внешних ключей заменены составными с тем же началом.
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='post_pub_date_id_idx'),
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self):
         return self.text[:15]
 
+    def save(self, *args, **kwargs):
+        # Файл картинки и его учёт в MediaFile (сигналы, posts/media.py)
+        # сохраняются под блокировкой записи, иначе media.collect мог
+        # бы удалить уже найденный хранилищем файл.
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+
+    @property
+    def thumbnail_urls(self):
+        return json.loads(self.thumbnails) if self.thumbnails else {}
+
+    def get_absolute_url(self):
+        return links.post_url(self.author.username, self.pk)
+
+    def get_edit_url(self):
+        return links.post_edit_url(self.author.username, self.pk)
+
+    def get_comment_url(self):
+        return links.comment_url(self.author.username, self.pk)
+
+    def get_comments_url(self):
+        return links.comments_url(self.author.username, self.pk)
+
 
 class Comment(models.Model):
     text = models.TextField(
@@ -70,6 +133,7 @@ class Comment(models.Model):
         verbose_name='Запись',
         related_name='comments',
         on_delete=models.CASCADE,
+        db_index=False,
     )
     author = models.ForeignKey(
         User,
@@ -77,6 +141,45 @@ class Comment(models.Model):
         related_name='comments',
         on_delete=models.CASCADE,
     )
+    parent = models.ForeignKey(
+        'self',
+        verbose_name='Ответ на',
+        related_name='replies',
+        on_delete=models.CASCADE,
+        null=True,
+        blank=True,
+        db_index=False,
+    )
+    # Id предков и свой id по threads.SEGMENT цифр, см. posts/threads.py.
+    path = models.CharField(
+        max_length=threads.SEGMENT * threads.MAX_DEPTH,
+        blank=True,
+        editable=False,
+    )
+
+    class Meta:
+        ordering = ['created', 'id']
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+            models.Index(fields=['post', 'path'],
+                         name='comment_post_path_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        if self.parent_id and not self.path:
+            parent_id = threads.reply_parent_id(self.parent.path)
+            if parent_id != self.parent_id:
+                self.parent = Comment.objects.get(pk=parent_id)
+        super().save(*args, **kwargs)
+        if not self.path:
+            prefix = self.parent.path if self.parent_id else ''
+            self.path = prefix + threads.segment(self.pk)
+            Comment.objects.filter(pk=self.pk).update(path=self.path)
+
+    @property
+    def depth(self):
+        return threads.depth(self.path)
 
 
 class Follow(models.Model):
@@ -89,6 +192,7 @@ class Follow(models.Model):
         User,
         related_name='following',
         on_delete=models.CASCADE,
+        db_index=False,
     )
 
     class Meta:
@@ -97,3 +201,115 @@ class Follow(models.Model):
                 fields=["user", "author"],
                 name="unique_author_user_following")
         ]
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class UserStats(models.Model):
+    """Счётчики пользователя, поддерживаемые сигналами."""
+    user = models.OneToOneField(
+        User,
+        primary_key=True,
+        related_name='stats',
+        on_delete=models.CASCADE,
+    )
+    posts_count = models.PositiveIntegerField(
+        default=0, verbose_name='Записей')
+    followers_count = models.PositiveIntegerField(
+        default=0, db_index=True, verbose_name='Подписчиков')
+    following_count = models.PositiveIntegerField(
+        default=0, verbose_name='Подписок')
+
+    def __str__(self):
+        return f'Счётчики {self.user_id}'
+
+
+class FeedEntry(models.Model):
+    """Запись материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    post = models.ForeignKey(
+        Post,
+        related_name='feed_entries',
+        on_delete=models.CASCADE,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    # Копия Post.pub_date: лента сортируется по индексу FeedEntry.
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'post'],
+                name='unique_feed_entry_user_post')
+        ]
+        indexes = [
+            models.Index(fields=['user', 'author'],
+                         name='feed_entry_user_author_idx'),
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_entry_user_pub_date_idx'),
+        ]
+
+
+class ThumbnailJob(models.Model):
+    """Задание на подготовку миниатюр картинки записи."""
+    post = models.OneToOneField(
+        Post,
+        primary_key=True,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    image = models.CharField(max_length=100)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now, db_index=True)
+    last_error = models.TextField(blank=True)
+
+    def __str__(self):
+        return f'Миниатюры {self.image}'
+
+
+class MediaFile(models.Model):
+    """Число записей, ссылающихся на файл картинки."""
+    name = models.CharField(max_length=255, primary_key=True)
+    refcount = models.PositiveIntegerField(default=0)
+
+    def __str__(self):
+        return self.name
+
+
+class Recommendation(models.Model):
+    """Подсказка «на кого подписаться» (см. posts/recommendations.py)."""
+    user = models.ForeignKey(
+        User,
+        related_name='recommendations',
+        on_delete=models.CASCADE,
+        db_index=False,
+    )
+    author = models.ForeignKey(
+        User,
+        related_name='+',
+        on_delete=models.CASCADE,
+    )
+    # Место в подсказках пользователя, с нуля.
+    rank = models.PositiveSmallIntegerField()
+    score = models.FloatField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'rank'],
+                name='unique_recommendation_user_rank')
+        ]
+
+    def __str__(self):
+        return f'Подсказка {self.author_id} для {self.user_id}'
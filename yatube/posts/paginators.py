@@ -0,0 +1,163 @@
+"""
+Постраничная навигация без OFFSET и COUNT(*).
+
+CursorPaginator выбирает страницу по ключу (pub_date, id) последней
+показанной записи, поэтому глубокие страницы читаются так же быстро,
+как первая. Номерные страницы оставлены для старых ссылок ``?page=``
+и настройки POSTS_PAGINATION = 'numbered'; общее число записей для них
+берётся из кэша.
+"""
+import base64
+import hashlib
+import json
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.paginator import EmptyPage, Page, Paginator
+from django.db.models import Q
+from django.utils.functional import cached_property
+
+NEXT = 'n'
+PREVIOUS = 'p'
+
+COUNT_CACHE_KEY = 'paginator:count:{}'
+
+
+def encode_token(values):
+    """Непрозрачный курсор из списка значений, пригодных для JSON."""
+    raw = json.dumps(values).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_token(token):
+    """Значения курсора; ValueError, если курсор пуст или испорчен."""
+    if not token:
+        raise ValueError('Пустой курсор')
+    padded = token + '=' * (-len(token) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode()))
+
+
+def approximate_count(queryset):
+    """Число записей выборки, закэшированное на короткое время."""
+    digest = hashlib.md5(str(queryset.query).encode()).hexdigest()
+    key = COUNT_CACHE_KEY.format(digest)
+    count = cache.get(key)
+    if count is None:
+        count = queryset.count()
+        cache.set(key, count, settings.PAGINATOR_COUNT_CACHE_TIMEOUT)
+    return count
+
+
+class CachedCountPaginator(Paginator):
+    """Номерные страницы с приблизительным числом записей из кэша."""
+
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+    _count_is_exact = False
+
+    def validate_number(self, number):
+        try:
+            return super().validate_number(number)
+        except EmptyPage:
+            if self._count_is_exact:
+                raise
+            # Закэшированное число могло устареть: уточняем его,
+            # прежде чем отдавать последнюю страницу вместо запрошенной.
+            self.__dict__['count'] = self.object_list.count()
+            self.__dict__.pop('num_pages', None)
+            self._count_is_exact = True
+            return super().validate_number(number)
+
+
+class CursorPaginator(Paginator):
+    """
+    Keyset-пагинация по паре полей (по умолчанию pub_date и id).
+
+    Общее число страниц неизвестно, поэтому ``number`` и ``num_pages``
+    у страницы описывают только окно «предыдущая — текущая — следующая»,
+    а ссылки строятся по ``previous_cursor`` и ``next_cursor``.
+    """
+    is_cursor = True
+
+    def __init__(self, object_list, per_page, keys=('pub_date', 'id')):
+        super().__init__(object_list, per_page)
+        self.keys = keys
+        self.next_cursor = None
+        self.previous_cursor = None
+        self._has_previous = False
+        self._has_next = False
+        self._exact_count = None
+
+    def encode_cursor(self, direction, item):
+        values = [str(getattr(item, key)) for key in self.keys]
+        return encode_token([direction] + values)
+
+    def decode_cursor(self, cursor):
+        if not cursor:
+            return NEXT, None
+        try:
+            direction, *values = decode_token(cursor)
+            if direction not in (NEXT, PREVIOUS):
+                raise ValueError(direction)
+            opts = self.object_list.model._meta
+            values = [opts.get_field(key).to_python(value)
+                      for key, value in zip(self.keys, values)]
+        except (ValueError, TypeError, ValidationError):
+            return NEXT, None
+        if len(values) != len(self.keys) or None in values:
+            return NEXT, None
+        return direction, values
+
+    @staticmethod
+    def keyset(queryset, keys, direction, values):
+        """Выборка после курсора в порядке обхода по полям ``keys``."""
+        (field, tie) = keys
+        if values is not None:
+            lookup = 'lt' if direction == NEXT else 'gt'
+            value, tie_value = values
+            queryset = queryset.filter(
+                Q(**{f'{field}__{lookup}': value})
+                | Q(**{field: value, f'{tie}__{lookup}': tie_value}))
+        if direction == NEXT:
+            return queryset.order_by(f'-{field}', f'-{tie}')
+        return queryset.order_by(field, tie)
+
+    def rows(self, direction, values, limit):
+        return list(self.keyset(self.object_list, self.keys,
+                                direction, values)[:limit])
+
+    def page(self, cursor=None):
+        direction, values = self.decode_cursor(cursor)
+        rows = self.rows(direction, values, self.per_page + 1)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if direction == NEXT:
+            self._has_previous = values is not None
+            self._has_next = has_more
+        else:
+            rows.reverse()
+            self._has_previous = has_more
+            self._has_next = True
+        if not self._has_previous and not self._has_next:
+            self._exact_count = len(rows)
+        if rows and self._has_next:
+            self.next_cursor = self.encode_cursor(NEXT, rows[-1])
+        if rows and self._has_previous:
+            self.previous_cursor = self.encode_cursor(PREVIOUS, rows[0])
+        number = 2 if self._has_previous else 1
+        return Page(rows, number, self)
+
+    get_page = page
+
+    @cached_property
+    def count(self):
+        if self._exact_count is not None:
+            return self._exact_count
+        return approximate_count(self.object_list)
+
+    @property
+    def num_pages(self):
+        return (2 if self._has_previous else 1) + int(self._has_next)
@@ -0,0 +1,263 @@
+"""
+Подсказки «на кого подписаться», посчитанные заранее.
+
+Команда ``manage.py build_recommendations`` читает все подписки одним
+проходом и считает сходство авторов по общим подписчикам (косинусная
+мера: общих подписчиков / √(подписчиков одного · подписчиков другого)),
+оставляя каждому автору RECOMMENDATION_NEIGHBOURS самых похожих.
+Оценка кандидата для пользователя — сумма его сходств с авторами, на
+которых пользователь подписан. Лучшие RECOMMENDATIONS_PER_USER
+кандидатов записываются в Recommendation, и страницы читают их одним
+запросом по индексу (user, rank).
+
+Пользователь, подписанный больше чем на RECOMMENDATION_MAX_FOLLOWING
+авторов, участвует в подсчёте только их выборкой: иначе число пар
+растёт как квадрат его подписок. Если установлен NumPy, пары
+(строка, столбец) пачки строк суммируются и отбираются векторно, иначе
+строки считаются словарями. Порядок сложений в обоих вариантах один,
+поэтому результаты совпадают.
+"""
+import heapq
+import math
+import random
+from collections import Counter, defaultdict
+from itertools import chain
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+from .models import Follow, Recommendation
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+RECOMMENDATIONS_SCOPE = 'recommendations'
+
+
+class FollowMatrix:
+    """
+    Подписки по номерам пользователей (позициям в ``ids``).
+
+    ``following`` — все авторы каждого пользователя, ``sources`` — они
+    же с ограничением RECOMMENDATION_MAX_FOLLOWING, ``followers`` —
+    транспонированные ``sources``. Все строки отсортированы.
+    """
+
+    def __init__(self, pairs, max_following):
+        following = defaultdict(list)
+        for user_id, author_id in pairs:
+            following[user_id].append(author_id)
+        ids = set(following)
+        for authors in following.values():
+            ids.update(authors)
+        self.ids = sorted(ids)
+        number = {pk: index for index, pk in enumerate(self.ids)}
+        self.following = [[] for _ in self.ids]
+        for user_id, authors in following.items():
+            self.following[number[user_id]] = sorted(
+                number[author_id] for author_id in authors)
+        self.sources = [self._sample(user, authors, max_following)
+                        for user, authors in enumerate(self.following)]
+        self.followers = [[] for _ in self.ids]
+        for user, authors in enumerate(self.sources):
+            for author in authors:
+                self.followers[author].append(user)
+
+    def _sample(self, user, authors, limit):
+        if len(authors) <= limit:
+            return authors
+        # Выборка зависит только от id, чтобы пересчёты были устойчивы.
+        return sorted(random.Random(self.ids[user]).sample(authors, limit))
+
+    def __len__(self):
+        return len(self.ids)
+
+
+def _top(scores, limit):
+    """Лучшие пары (номер, оценка): по убыванию оценки, затем номера."""
+    return heapq.nsmallest(limit, scores.items(),
+                           key=lambda item: (-item[1], item[0]))
+
+
+def _neighbours_python(matrix, limit):
+    sizes = [len(users) for users in matrix.followers]
+    neighbours = []
+    for author, users in enumerate(matrix.followers):
+        common = Counter()
+        for user in users:
+            common.update(matrix.sources[user])
+        common.pop(author, None)
+        neighbours.append(_top(
+            {other: count / math.sqrt(sizes[author] * sizes[other])
+             for other, count in common.items()}, limit))
+    return neighbours
+
+
+def _recommend_python(matrix, neighbours, limit):
+    for user, authors in enumerate(matrix.sources):
+        if not authors:
+            continue
+        scores = defaultdict(float)
+        for author in authors:
+            for other, weight in neighbours[author]:
+                scores[other] += weight
+        scores.pop(user, None)
+        for author in matrix.following[user]:
+            scores.pop(author, None)
+        yield user, _top(scores, limit)
+
+
+def _csr(rows):
+    """Строки списков как (indptr, indices) разреженной матрицы."""
+    indptr = numpy.zeros(len(rows) + 1, dtype=numpy.int64)
+    numpy.cumsum([len(row) for row in rows], out=indptr[1:])
+    indices = numpy.fromiter(chain.from_iterable(rows), dtype=numpy.int64,
+                             count=int(indptr[-1]))
+    return indptr, indices
+
+
+def _gather(indptr, rows):
+    """
+    Позиции элементов строк ``rows`` подряд и для каждого — номер его
+    строки в ``rows``.
+    """
+    starts = indptr[rows]
+    lengths = indptr[rows + 1] - starts
+    before = numpy.cumsum(lengths) - lengths
+    positions = (numpy.arange(int(lengths.sum()))
+                 + numpy.repeat(starts - before, lengths))
+    return positions, numpy.repeat(numpy.arange(len(rows)), lengths)
+
+
+def _batches(rows):
+    size = settings.RECOMMENDATION_BATCH_ROWS
+    for start in range(0, len(rows), size):
+        yield rows[start:start + size]
+
+
+def _sum_pairs(rows, columns, width, weights=None):
+    """
+    Суммы по парам (строка, столбец): ключи пар по возрастанию и суммы.
+    bincount складывает в порядке входа, как и словари в Python.
+    """
+    keys, inverse = numpy.unique(rows * width + columns,
+                                 return_inverse=True)
+    return keys, numpy.bincount(inverse.ravel(), weights=weights)
+
+
+def _rows_top(count, keys, values, width, limit):
+    """
+    Лучшие ``limit`` пар каждой из ``count`` строк, как у _top. Ключи
+    уже по возрастанию, а lexsort устойчив, так что равные оценки
+    остаются по возрастанию столбца.
+    """
+    rows, columns = numpy.divmod(keys, width)
+    order = numpy.lexsort((-values, rows))
+    rows, columns, values = rows[order], columns[order], values[order]
+    starts = numpy.searchsorted(rows, numpy.arange(count + 1))
+    return [
+        list(zip(columns[start:min(end, start + limit)].tolist(),
+                 values[start:min(end, start + limit)].tolist()))
+        for start, end in zip(starts[:-1].tolist(), starts[1:].tolist())]
+
+
+def _neighbours_numpy(matrix, limit):
+    width = len(matrix)
+    sources_indptr, sources = _csr(matrix.sources)
+    followers_indptr, followers = _csr(matrix.followers)
+    sizes = numpy.diff(followers_indptr)
+    neighbours = []
+    for authors in _batches(numpy.arange(width)):
+        # Подписчики авторов пачки, затем все их подписки.
+        positions, owners = _gather(followers_indptr, authors)
+        positions, pairs = _gather(sources_indptr, followers[positions])
+        keys, common = _sum_pairs(owners[pairs], sources[positions], width)
+        rows, others = numpy.divmod(keys, width)
+        itself = others == authors[rows]
+        keys, rows, others, common = (
+            keys[~itself], rows[~itself], others[~itself], common[~itself])
+        weights = common / numpy.sqrt(sizes[authors[rows]] * sizes[others])
+        neighbours += _rows_top(len(authors), keys, weights, width, limit)
+    return neighbours
+
+
+def _recommend_numpy(matrix, neighbours, limit):
+    width = len(matrix)
+    sources_indptr, sources = _csr(matrix.sources)
+    following_indptr, following = _csr(matrix.following)
+    similar_indptr, similar = _csr(
+        [[other for other, _ in row] for row in neighbours])
+    weights = numpy.fromiter(
+        (weight for row in neighbours for _, weight in row),
+        dtype=numpy.float64, count=len(similar))
+    users = numpy.flatnonzero(numpy.diff(sources_indptr))
+    for batch in _batches(users):
+        positions, owners = _gather(sources_indptr, batch)
+        positions, pairs = _gather(similar_indptr, sources[positions])
+        keys, scores = _sum_pairs(owners[pairs], similar[positions], width,
+                                  weights[positions])
+        positions, owners = _gather(following_indptr, batch)
+        excluded = numpy.concatenate((
+            numpy.arange(len(batch)) * width + batch,
+            owners * width + following[positions]))
+        kept = ~numpy.isin(keys, excluded)
+        yield from zip(batch.tolist(), _rows_top(
+            len(batch), keys[kept], scores[kept], width, limit))
+
+
+def build(use_numpy=None, batch_size=1000):
+    """
+    Пересчитывает таблицу Recommendation целиком в одной транзакции.
+
+    Подсказки считаются до неё: транзакция держит блокировку записи
+    SQLite, и новые записи и комментарии ждали бы весь подсчёт. По
+    умолчанию считает через NumPy, если он установлен.
+    """
+    if use_numpy is None:
+        use_numpy = numpy is not None
+    matrix = FollowMatrix(
+        Follow.objects.order_by().values_list('user_id', 'author_id')
+        .iterator(),
+        settings.RECOMMENDATION_MAX_FOLLOWING)
+    if use_numpy:
+        neighbours, recommend = _neighbours_numpy, _recommend_numpy
+    else:
+        neighbours, recommend = _neighbours_python, _recommend_python
+    rows = list(recommend(
+        matrix, neighbours(matrix, settings.RECOMMENDATION_NEIGHBOURS),
+        settings.RECOMMENDATIONS_PER_USER))
+    report = {'numpy': use_numpy, 'users': len(rows), 'recommendations': 0}
+    with transaction.atomic():
+        Recommendation.objects.all().delete()
+        batch = []
+        for user, top in rows:
+            batch += [
+                Recommendation(user_id=matrix.ids[user],
+                               author_id=matrix.ids[author],
+                               rank=rank, score=score)
+                for rank, (author, score) in enumerate(top)]
+            if len(batch) >= batch_size:
+                Recommendation.objects.bulk_create(batch)
+                report['recommendations'] += len(batch)
+                batch = []
+        Recommendation.objects.bulk_create(batch)
+        report['recommendations'] += len(batch)
+    caching.bump(RECOMMENDATIONS_SCOPE)
+    return report
+
+
+def for_user(user_id, limit=None):
+    """Лучшие подсказки пользователя одним запросом по (user, rank)."""
+    return list(
+        Recommendation.objects.filter(user_id=user_id)
+        .select_related('author').only('score', 'author__username')
+        .order_by('rank')[:limit or settings.RECOMMENDATIONS_SHOWN])
+
+
+def forget(user_id, author_id):
+    """Убирает подсказку автора, на которого пользователь подписался."""
+    Recommendation.objects.filter(user_id=user_id,
+                                  author_id=author_id).delete()
@@ -0,0 +1,281 @@
+"""
+Полнотекстовый поиск по записям и комментариям.
+
+В SQLite тексты хранятся в виртуальных таблицах FTS5 уже в виде основ
+слов (стеммер Snowball для русского языка), поэтому «котами» находит
+«кот». Таблицы обновляются сигналами сохранения и удаления Post и
+Comment. Запись находится по своему тексту и по текстам комментариев;
+результаты упорядочены по BM25 с поправкой на давность и листаются
+курсором по паре (оценка, id). На других СУБД поиск сводится к
+``icontains``.
+"""
+import re
+import time
+
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .paginators import decode_token, encode_token
+
+POST_TABLE = 'posts_post_fts'
+COMMENT_TABLE = 'posts_comment_fts'
+
+# Через сколько дней оценка записи уменьшается вдвое.
+RECENCY_HALF_LIFE_DAYS = 30
+# Совпадение в комментарии весит меньше совпадения в самой записи.
+COMMENT_WEIGHT = 0.5
+
+VOWELS = 'аеиоуыэюя'
+WORD_RE = re.compile(r'\w+')
+
+PERFECTIVE_GERUND = (('в', 'вши', 'вшись'),
+                     ('ив', 'ивши', 'ившись', 'ыв', 'ывши', 'ывшись'))
+ADJECTIVE = ((), ('ее', 'ие', 'ые', 'ое', 'ими', 'ыми', 'ей', 'ий', 'ый',
+                  'ой', 'ем', 'им', 'ым', 'ом', 'его', 'ого', 'ему', 'ому',
+                  'их', 'ых', 'ую', 'юю', 'ая', 'яя', 'ою', 'ею'))
+PARTICIPLE = (('ем', 'нн', 'вш', 'ющ', 'щ'), ('ивш', 'ывш', 'ующ'))
+REFLEXIVE = ((), ('ся', 'сь'))
+VERB = (('ла', 'на', 'ете', 'йте', 'ли', 'й', 'л', 'ем', 'н', 'ло', 'но',
+         'ет', 'ют', 'ны', 'ть', 'ешь', 'нно'),
+        ('ила', 'ыла', 'ена', 'ейте', 'уйте', 'ите', 'или', 'ыли', 'ей',
+         'уй', 'ил', 'ыл', 'им', 'ым', 'ен', 'ило', 'ыло', 'ено', 'ят',
+         'ует', 'уют', 'ит', 'ыт', 'ены', 'ить', 'ыть', 'ишь', 'ую', 'ю'))
+NOUN = ((), ('а', 'ев', 'ов', 'ие', 'ье', 'е', 'иями', 'ями', 'ами', 'еи',
+             'ии', 'и', 'ией', 'ей', 'ой', 'ий', 'й', 'иям', 'ям', 'ием',
+             'ем', 'ам', 'ом', 'о', 'у', 'ах', 'иях', 'ях', 'ы', 'ь', 'ию',
+             'ью', 'ю', 'ия', 'ья', 'я'))
+DERIVATIONAL = ((), ('ост', 'ость'))
+SUPERLATIVE = ((), ('ейш', 'ейше'))
+
+
+def _region(word, start):
+    for index in range(start + 1, len(word)):
+        if word[index] not in VOWELS and word[index - 1] in VOWELS:
+            return index + 1
+    return len(word)
+
+
+def _remove(word, start, groups):
+    """
+    Отрезает самое длинное окончание из ``groups`` в области ``start``.
+
+    Окончания первой группы отрезаются, только если перед ними стоит
+    «а» или «я». Если подходящего окончания нет, возвращает None.
+    """
+    endings = sorted(((ending, number) for number, group in enumerate(groups)
+                      for ending in group),
+                     key=lambda item: len(item[0]), reverse=True)
+    for ending, number in endings:
+        if word.endswith(ending) and len(word) - len(ending) >= start:
+            stem = word[:-len(ending)]
+            if number == 0 and not (stem[-1:] in ('а', 'я')
+                                    and len(stem) - 1 >= start):
+                return None
+            return stem
+    return None
+
+
+def stem(word):
+    """Основа русского слова по алгоритму Snowball."""
+    rv = next((index + 1 for index, letter in enumerate(word)
+               if letter in VOWELS), len(word))
+    r2 = _region(word, _region(word, 0))
+
+    result = _remove(word, rv, PERFECTIVE_GERUND)
+    if result is None:
+        word = _remove(word, rv, REFLEXIVE) or word
+        result = _remove(word, rv, ADJECTIVE)
+        if result is not None:
+            result = _remove(result, rv, PARTICIPLE) or result
+        else:
+            result = (_remove(word, rv, VERB)
+                      or _remove(word, rv, NOUN))
+    word = result if result is not None else word
+
+    if word.endswith('и') and len(word) - 1 >= rv:
+        word = word[:-1]
+    word = _remove(word, r2, DERIVATIONAL) or word
+    if word.endswith('нн') and len(word) - 1 >= rv:
+        word = word[:-1]
+    else:
+        superlative = _remove(word, rv, SUPERLATIVE)
+        if superlative is not None:
+            word = superlative
+            if word.endswith('нн'):
+                word = word[:-1]
+        elif word.endswith('ь') and len(word) - 1 >= rv:
+            word = word[:-1]
+    return word
+
+
+def terms(text):
+    """Основы слов текста в порядке появления."""
+    for word in WORD_RE.findall(text.lower().replace('ё', 'е')):
+        if any('а' <= letter <= 'я' for letter in word):
+            yield stem(word)
+        else:
+            yield word
+
+
+def match_expression(query):
+    """Запрос FTS5: все основы слов запроса, каждая в кавычках."""
+    return ' '.join(f'"{term}"' for term in dict.fromkeys(terms(query)))
+
+
+def enabled():
+    return connection.vendor == 'sqlite'
+
+
+def _timestamp(moment):
+    return time.mktime(moment.timetuple())
+
+
+def index_post(post):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_TABLE} WHERE rowid = %s',
+                       [post.pk])
+        cursor.execute(
+            f'INSERT INTO {POST_TABLE} (rowid, body, pub_date) '
+            'VALUES (%s, %s, %s)',
+            [post.pk, ' '.join(terms(post.text)),
+             _timestamp(post.pub_date)])
+
+
+def index_comment(comment):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {COMMENT_TABLE} WHERE rowid = %s',
+                       [comment.pk])
+        cursor.execute(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, body, post_id, created) '
+            'VALUES (%s, %s, %s, %s)',
+            [comment.pk, ' '.join(terms(comment.text)), comment.post_id,
+             _timestamp(comment.created)])
+
+
+def unindex(table, *pks):
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        # Пачками, чтобы не упереться в предел параметров SQLite.
+        for start in range(0, len(pks), 500):
+            batch = pks[start:start + 500]
+            placeholders = ', '.join(['%s'] * len(batch))
+            cursor.execute(
+                f'DELETE FROM {table} WHERE rowid IN ({placeholders})',
+                batch)
+
+
+def rebuild(batch_size=1000):
+    """Заново заполняет поисковые таблицы из Post и Comment."""
+    from .models import Comment
+
+    if not enabled():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {POST_TABLE}')
+        cursor.execute(f'DELETE FROM {COMMENT_TABLE}')
+        rows = (Post.objects.order_by().values_list('pk', 'text', 'pub_date')
+                .iterator(chunk_size=batch_size))
+        cursor.executemany(
+            f'INSERT INTO {POST_TABLE} (rowid, body, pub_date) '
+            'VALUES (%s, %s, %s)',
+            ((pk, ' '.join(terms(text)), _timestamp(pub_date))
+             for pk, text, pub_date in rows))
+        rows = (Comment.objects.order_by()
+                .values_list('pk', 'text', 'post_id', 'created')
+                .iterator(chunk_size=batch_size))
+        cursor.executemany(
+            f'INSERT INTO {COMMENT_TABLE} (rowid, body, post_id, created) '
+            'VALUES (%s, %s, %s, %s)',
+            ((pk, ' '.join(terms(text)), post_id, _timestamp(created))
+             for pk, text, post_id, created in rows))
+
+
+def matching_post_ids(query):
+    """Подзапрос id записей, в тексте которых есть все слова запроса."""
+    return RawSQL(
+        f'SELECT rowid FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s',
+        [match_expression(query)])
+
+
+def matching_comment_ids(query):
+    return RawSQL(
+        f'SELECT rowid FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s',
+        [match_expression(query)])
+
+
+RANKED_SQL = f'''
+    SELECT post_id, MIN(score) AS score FROM (
+        SELECT rowid AS post_id,
+               bm25({POST_TABLE}) / (1.0 + (%s - pub_date) / %s) AS score
+        FROM {POST_TABLE} WHERE {POST_TABLE} MATCH %s
+        UNION ALL
+        SELECT post_id,
+               bm25({COMMENT_TABLE}) * %s
+               / (1.0 + (%s - created) / %s) AS score
+        FROM {COMMENT_TABLE} WHERE {COMMENT_TABLE} MATCH %s
+    )
+    GROUP BY post_id
+    HAVING %s OR score > %s OR (score = %s AND post_id > %s)
+    ORDER BY score, post_id
+    LIMIT %s
+'''
+
+
+def _ranked(match, now, after, limit):
+    half_life = RECENCY_HALF_LIFE_DAYS * 24 * 60 * 60
+    first = after is None
+    score, post_id = after or (0.0, 0)
+    with connection.cursor() as cursor:
+        cursor.execute(RANKED_SQL, [
+            now, half_life, match,
+            COMMENT_WEIGHT, now, half_life, match,
+            first, score, score, post_id, limit,
+        ])
+        return cursor.fetchall()
+
+
+def search_posts(query, cursor=None, per_page=10):
+    """
+    Страница результатов поиска и курсор следующей страницы.
+
+    Курсор хранит момент первого запроса, чтобы поправка на давность
+    не сдвигала оценки между страницами.
+    """
+    match = match_expression(query)
+    if not match:
+        return [], None
+    if not enabled():
+        return _search_fallback(query, cursor, per_page)
+    try:
+        now, score, post_id = decode_token(cursor)
+        after = (float(score), int(post_id))
+        now = float(now)
+    except (TypeError, ValueError):
+        now, after = time.time(), None
+    rows = _ranked(match, now, after, per_page + 1)
+    next_cursor = None
+    if len(rows) > per_page:
+        rows = rows[:per_page]
+        last_id, last_score = rows[-1]
+        next_cursor = encode_token([now, last_score, last_id])
+    posts = Post.objects.select_related('author', 'group').in_bulk(
+        [post_id for post_id, _ in rows])
+    return [posts[post_id] for post_id, _ in rows
+            if post_id in posts], next_cursor
+
+
+def _search_fallback(query, cursor, per_page):
+    from .paginators import CursorPaginator
+
+    post_list = Post.objects.filter(
+        Q(text__icontains=query) | Q(comments__text__icontains=query)
+    ).select_related('author', 'group').distinct()
+    page = CursorPaginator(post_list, per_page).page(cursor)
+    return list(page), page.paginator.next_cursor
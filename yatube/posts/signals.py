@@ -0,0 +1,139 @@
+import threading
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (post_delete, post_save, pre_delete,
+                                      pre_save)
+from django.dispatch import receiver
+
+from . import (caching, counters, feed, graph, live, media, recommendations,
+               search)
+from .models import Comment, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+# Записи, которые удаляются в этом потоке, и id их комментариев.
+# Каскадно удалённые комментарии не меняют счётчик и кэш по одному:
+# это делается один раз при удалении записи.
+_deleting = threading.local()
+
+
+def _deleting_posts():
+    if not hasattr(_deleting, 'posts'):
+        _deleting.posts = {}
+    return _deleting.posts
+
+
+@receiver(post_save, sender=User)
+def user_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        UserStats.objects.get_or_create(user=instance)
+    if not raw:
+        caching.remember_author(instance)
+    if not created and kwargs['update_fields'] != frozenset(['last_login']):
+        # Имя и прочие поля видны на страницах автора.
+        caching.bump(caching.author_scope(instance.pk))
+
+
+@receiver(pre_save, sender=Post)
+def post_changing(sender, instance, raw, **kwargs):
+    if instance.pk and not raw:
+        instance._previous_group_slug, instance._previous_image = (
+            Post.objects.filter(pk=instance.pk)
+            .values_list('group__slug', 'image').first() or (None, None))
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    if created:
+        counters.change_user_stats(instance.author_id, 'posts_count', 1)
+        feed.fan_out_post(instance)
+        transaction.on_commit(lambda: live.publish_post(instance))
+    image = instance.image.name or ''
+    previous_image = getattr(instance, '_previous_image', None) or ''
+    if image != previous_image:
+        media.retain(image)
+        media.release(previous_image)
+    search.index_post(instance)
+    caching.bump(*caching.post_scopes(
+        instance, getattr(instance, '_previous_group_slug', None)))
+
+
+@receiver(pre_delete, sender=Post)
+def post_deleting(sender, instance, **kwargs):
+    _deleting_posts()[instance.pk] = []
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    comment_ids = _deleting_posts().pop(instance.pk, [])
+    counters.change_user_stats(instance.author_id, 'posts_count', -1)
+    media.release(instance.image.name)
+    search.unindex(search.POST_TABLE, instance.pk)
+    search.unindex(search.COMMENT_TABLE, *comment_ids)
+    caching.bump(*caching.post_scopes(instance))
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, raw, **kwargs):
+    if raw:
+        return
+    search.index_comment(instance)
+    if created:
+        counters.change_comment_count(instance.post_id, 1)
+        caching.bump(*caching.post_scopes(instance.post))
+        transaction.on_commit(
+            lambda: live.publish_comments(instance.post_id))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    deleted_with_post = _deleting_posts().get(instance.post_id)
+    if deleted_with_post is not None:
+        deleted_with_post.append(instance.pk)
+        return
+    counters.change_comment_count(instance.post_id, -1)
+    search.unindex(search.COMMENT_TABLE, instance.pk)
+    transaction.on_commit(lambda: live.publish_comments(instance.post_id))
+    post = Post.objects.filter(pk=instance.post_id).first()
+    if post is not None:
+        caching.bump(*caching.post_scopes(post))
+
+
+@receiver(post_save, sender=Follow)
+def follow_created(sender, instance, created, raw, **kwargs):
+    if created and not raw:
+        counters.change_user_stats(instance.author_id, 'followers_count', 1)
+        feed.followers_changed(instance.author_id, 1)
+        counters.change_user_stats(instance.user_id, 'following_count', 1)
+        # Сброшенный до фиксации массив перечитался бы без подписки.
+        transaction.on_commit(
+            lambda: graph.forget(instance.user_id, instance.author_id))
+        recommendations.forget(instance.user_id, instance.author_id)
+        feed.backfill(instance.user_id, instance.author_id)
+        caching.bump(caching.author_scope(instance.author_id),
+                     caching.author_scope(instance.user_id))
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.change_user_stats(instance.author_id, 'followers_count', -1)
+    feed.followers_changed(instance.author_id, -1)
+    counters.change_user_stats(instance.user_id, 'following_count', -1)
+    transaction.on_commit(
+        lambda: graph.forget(instance.user_id, instance.author_id))
+    feed.trim(instance.user_id, instance.author_id)
+    caching.bump(caching.author_scope(instance.author_id),
+                 caching.author_scope(instance.user_id))
+
+
+@receiver(post_save, sender=Group)
+def group_changed(sender, instance, raw, **kwargs):
+    if not raw:
+        # Название группы есть и на страницах автора и записи.
+        authors = (Post.objects.filter(group=instance).order_by()
+                   .values_list('author_id', flat=True).distinct())
+        caching.bump(caching.GLOBAL, caching.group_scope(instance.slug),
+                     *(caching.author_scope(pk) for pk in authors))
@@ -0,0 +1,15 @@
+from uuid import uuid4
+
+from django import template
+from django.utils.html import format_html
+
+from posts.limits import KEY_FIELD
+
+register = template.Library()
+
+
+@register.simple_tag
+def idempotency_field():
+    """Скрытое поле с ключом, новым при каждой отрисовке формы."""
+    return format_html('<input type="hidden" name="{}" value="{}">',
+                       KEY_FIELD, uuid4().hex)
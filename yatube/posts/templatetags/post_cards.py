@@ -0,0 +1,15 @@
+from django import template
+
+from posts.fragments import render_post_cards
+from posts.models import Post
+
+register = template.Library()
+
+
+@register.simple_tag(takes_context=True)
+def post_cards(context, posts):
+    """Карточки записей из кэша фрагментов (см. posts/fragments.py)."""
+    if isinstance(posts, Post):
+        posts = [posts]
+    return render_post_cards(posts, user=context.get('user'),
+                             show_comment_link=not context.get('form'))
@@ -0,0 +1,46 @@
+"""
+Проверка бюджета SQL-запросов на страницу.
+
+``query_budget`` — контекстный менеджер, ``max_queries`` — декоратор
+тестового метода, ``assert_url_budget`` — запрос страницы с проверкой.
+При превышении бюджета тест падает со списком выполненных запросов.
+"""
+from contextlib import contextmanager
+from functools import wraps
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+@contextmanager
+def query_budget(max_queries, label='блок'):
+    with CaptureQueriesContext(connection) as context:
+        yield context
+    executed = len(context.captured_queries)
+    if executed > max_queries:
+        queries = '\n'.join(
+            f'{number}. {query["sql"]}'
+            for number, query in enumerate(context.captured_queries, 1))
+        raise AssertionError(
+            f'{label}: выполнено {executed} SQL-запросов '
+            f'при бюджете {max_queries}:\n{queries}')
+
+
+def max_queries(limit):
+    """Декоратор теста: весь тест укладывается в ``limit`` запросов."""
+    def decorator(test):
+        @wraps(test)
+        def wrapper(*args, **kwargs):
+            with query_budget(limit, label=test.__name__):
+                return test(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def assert_url_budget(client, url, limit):
+    """Запрашивает ``url`` и проверяет число запросов к базе."""
+    with query_budget(limit, label=url):
+        response = client.get(url)
+    assert response.status_code == 200, (
+        f'{url}: ожидался ответ 200, получен {response.status_code}')
+    return response
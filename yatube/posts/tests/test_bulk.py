@@ -0,0 +1,115 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts import bulk
+from posts.models import Comment, FeedEntry, Follow, Group, Post, UserStats
+
+User = get_user_model()
+
+
+class BulkTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def path(self, name):
+        return os.path.join(self.directory, name)
+
+    def write_lines(self, name, records):
+        with open(self.path(name), 'w', encoding='utf-8') as file:
+            for record in records:
+                file.write(json.dumps(record, ensure_ascii=False) + '\n')
+        return self.path(name)
+
+    def test_import_ndjson(self):
+        """Импорт создаёт объекты и пересчитывает производные данные."""
+        source = self.write_lines('dump.ndjson', [
+            {'model': 'post', 'id': 10, 'author': 'Author', 'group': 'cats',
+             'text': 'Кот на крыше', 'pub_date': '2020-01-02T03:04:05'},
+            {'model': 'post', 'id': 11, 'author': 'Author', 'group': None,
+             'text': 'Вторая запись', 'pub_date': '2020-01-03T00:00:00'},
+            {'model': 'comment', 'id': 5, 'post': 10, 'author': 'Reader',
+             'text': 'Отличный кот', 'created': '2020-01-04T00:00:00'},
+            {'model': 'follow', 'user': 'Reader', 'author': 'Author'},
+        ])
+        call_command('yatube_import', source, '--batch-size', '2',
+                     '--defer-indexes', stdout=StringIO())
+
+        post = Post.objects.get(pk=10)
+        self.assertEqual(post.pub_date.isoformat(), '2020-01-02T03:04:05')
+        self.assertEqual(post.group, Group.objects.get(slug='cats'))
+        self.assertEqual(post.comment_count, 1)
+        reader = User.objects.get(username='Reader')
+        self.assertFalse(reader.has_usable_password())
+        self.assertEqual(
+            UserStats.objects.get(user=post.author).followers_count, 1)
+        self.assertEqual(FeedEntry.objects.filter(user=reader).count(), 2)
+        self.assertEqual(self.client.get('/search/', {'q': 'коты'})
+                         .context['posts'], [post])
+
+    def test_import_resumes_from_checkpoint(self):
+        """Импорт продолжается с контрольной точки."""
+        source = self.write_lines('dump.ndjson', [
+            {'model': 'post', 'id': number, 'author': 'Author',
+             'text': f'Запись {number}'}
+            for number in range(1, 6)
+        ])
+        checkpoint = self.path('checkpoint.json')
+        bulk.Checkpoint(checkpoint).save(3)
+        call_command('yatube_import', source, '--checkpoint', checkpoint,
+                     stdout=StringIO())
+        self.assertEqual(sorted(Post.objects.values_list('pk', flat=True)),
+                         [4, 5])
+        self.assertFalse(os.path.exists(checkpoint))
+
+    def test_import_fails_on_taken_ids(self):
+        """Занятый id записи останавливает импорт, а не теряет запись."""
+        author = User.objects.create_user(username='Author')
+        existing = Post.objects.create(author=author, text='Своя запись')
+        source = self.write_lines('dump.ndjson', [
+            {'model': 'post', 'id': existing.pk, 'author': 'Other',
+             'text': 'Чужая запись'},
+            {'model': 'comment', 'id': 7, 'post': existing.pk,
+             'author': 'Other', 'text': 'Чужой комментарий'},
+        ])
+        with self.assertRaisesMessage(CommandError, str(existing.pk)):
+            call_command('yatube_import', source, stdout=StringIO())
+        self.assertEqual(Post.objects.get().text, 'Своя запись')
+        self.assertFalse(Comment.objects.exists())
+
+    def test_export_round_trip(self):
+        """Выгрузка NDJSON и CSV загружается обратно."""
+        author = User.objects.create_user(username='Author')
+        reader = User.objects.create_user(username='Reader')
+        post = Post.objects.create(author=author, text='Запись')
+        Comment.objects.create(post=post, author=reader, text='Ответ')
+        Follow.objects.create(user=reader, author=author)
+
+        call_command('yatube_export', self.path('dump.ndjson'),
+                     stderr=StringIO())
+        call_command('yatube_export', self.path('follows.csv'),
+                     '--model', 'follow', stderr=StringIO())
+        with open(self.path('dump.ndjson'), encoding='utf-8') as file:
+            models = [json.loads(line)['model'] for line in file]
+        self.assertEqual(models, ['post', 'comment', 'follow'])
+
+        Follow.objects.all().delete()
+        Post.objects.all().delete()
+        call_command('yatube_import', self.path('dump.ndjson'),
+                     stdout=StringIO())
+        self.assertEqual(Comment.objects.get().post_id, post.pk)
+        Follow.objects.all().delete()
+        call_command('yatube_import', self.path('follows.csv'),
+                     '--model', 'follow', stdout=StringIO())
+        self.assertTrue(
+            Follow.objects.filter(user=reader, author=author).exists())
@@ -0,0 +1,106 @@
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from posts import views
+from posts.forms import PostForm
+from posts.models import Comment, Follow, Post, UserStats
+
+User = get_user_model()
+
+
+class CountersTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+        cls.reader = User.objects.create_user(username='Reader')
+
+    def test_counters_follow_changes(self):
+        """Счётчики меняются при создании и удалении объектов."""
+        post = Post.objects.create(author=self.author, text='Запись')
+        comment = Comment.objects.create(
+            post=post, author=self.reader, text='Комментарий')
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        author_stats = UserStats.objects.get(user=self.author)
+        self.assertEqual(author_stats.posts_count, 1)
+        self.assertEqual(author_stats.followers_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.reader).following_count, 1)
+
+        comment.delete()
+        follow.delete()
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 0)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).followers_count, 0)
+
+    def test_rebuild_counters_fixes_drift(self):
+        """Команда rebuild_counters исправляет разошедшиеся счётчики."""
+        post = Post.objects.create(author=self.author, text='Запись')
+        Comment.objects.create(post=post, author=self.reader, text='Текст')
+        UserStats.objects.filter(user=self.author).update(posts_count=7)
+        Post.objects.filter(pk=post.pk).update(comment_count=0)
+        UserStats.objects.filter(user=self.reader).delete()
+
+        out = StringIO()
+        call_command('rebuild_counters', '--dry-run', stdout=out)
+        self.assertIn('user_stats: 1', out.getvalue())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 7)
+
+        call_command('rebuild_counters', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual(post.comment_count, 1)
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 1)
+        self.assertTrue(UserStats.objects.filter(user=self.reader).exists())
+
+    def test_post_edit_keeps_concurrent_changes(self):
+        """Правка записи не затирает счётчик и миниатюры из других мест."""
+        post = Post.objects.create(author=self.author, text='Запись')
+        url = reverse('posts:post_edit', args=[self.author.username,
+                                               post.pk])
+        self.client.force_login(self.author)
+        self.client.get(url)
+        Comment.objects.create(post=post, author=self.reader, text='Первый')
+
+        class RacingForm(PostForm):
+            def is_valid(self):
+                # Комментарий и миниатюры появились, пока шла правка.
+                Comment.objects.create(post=post, author=self.instance.author,
+                                       text='Второй')
+                Post.objects.filter(pk=post.pk).update(
+                    thumbnails='{"card": "/media/card.jpg"}')
+                return super().is_valid()
+
+        with mock.patch.object(views, 'PostForm', RacingForm):
+            self.client.post(url, {'text': 'Исправленная запись'})
+        post.refresh_from_db()
+        self.assertEqual(post.text, 'Исправленная запись')
+        self.assertEqual(post.comment_count, 2)
+        self.assertEqual(post.thumbnail_urls, {'card': '/media/card.jpg'})
+
+    def test_post_delete_does_not_touch_comments_one_by_one(self):
+        """Число запросов при удалении записи не растёт с комментариями."""
+        def delete_queries(comments):
+            post = Post.objects.create(author=self.author, text='Запись')
+            Comment.objects.bulk_create(
+                [Comment(post=post, author=self.reader, text=f'Текст {n}')
+                 for n in range(comments)])
+            with CaptureQueriesContext(connection) as context:
+                post.delete()
+            return len(context.captured_queries)
+
+        self.assertEqual(delete_queries(100), delete_queries(1))
+        self.assertFalse(Comment.objects.exists())
+        self.assertEqual(
+            UserStats.objects.get(user=self.author).posts_count, 0)
@@ -0,0 +1,72 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posts import feed
+from posts.models import FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='Reader')
+        cls.author = User.objects.create_user(username='Author')
+        cls.other = User.objects.create_user(username='Other')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_new_post_fanned_out_to_followers(self):
+        """Новая запись попадает в ленты подписчиков автора."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        post = Post.objects.create(author=self.author, text='fan-out')
+        Post.objects.create(author=self.other, text='чужая запись')
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(feed.follow_feed(self.reader)), [post])
+
+    def test_follow_backfills_and_unfollow_trims(self):
+        """Подписка дозаполняет ленту, отписка очищает её."""
+        posts = [Post.objects.create(author=self.author, text=str(i))
+                 for i in range(3)]
+        follow = Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(
+            set(feed.follow_feed(self.reader)), set(posts))
+        follow.delete()
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertFalse(feed.follow_feed(self.reader).exists())
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_celebrity_posts_are_pulled_on_read(self):
+        """Записи популярного автора подмешиваются при чтении."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        cache.clear()
+        post = Post.objects.create(author=self.author, text='celebrity')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(feed.follow_feed(self.reader)), [post])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_becomes_celebrity(self):
+        """Запись сразу видна, когда автор только что стал знаменитостью."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertEqual(feed.celebrity_ids(), frozenset())
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text='celebrity')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        self.assertEqual(list(feed.follow_feed(self.reader)), [post])
+
+    @override_settings(FEED_FANOUT_MAX_FOLLOWERS=1)
+    def test_author_stops_being_celebrity(self):
+        """Записи бывшей знаменитости раскладываются по лентам."""
+        Follow.objects.create(user=self.reader, author=self.author)
+        Follow.objects.create(user=self.other, author=self.author)
+        post = Post.objects.create(author=self.author, text='celebrity')
+        self.assertFalse(FeedEntry.objects.filter(post=post).exists())
+        Follow.objects.filter(user=self.other).delete()
+        self.assertTrue(FeedEntry.objects.filter(
+            user=self.reader, post=post).exists())
+        self.assertEqual(list(feed.follow_feed(self.reader)), [post])
@@ -0,0 +1,106 @@
+from array import array
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase, TransactionTestCase
+from django.urls import reverse
+
+from posts import caching, graph
+from posts.models import Follow
+
+User = get_user_model()
+
+
+class GraphTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader, cls.author, cls.friend, cls.other = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'author', 'friend', 'other')]
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        Follow.objects.create(user=cls.reader, author=cls.friend)
+        Follow.objects.create(user=cls.friend, author=cls.reader)
+        Follow.objects.create(user=cls.author, author=cls.other)
+        Follow.objects.create(user=cls.friend, author=cls.other)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_follow_checks_and_counts(self):
+        self.assertEqual(list(graph.following(self.reader.pk)),
+                         sorted([self.author.pk, self.friend.pk]))
+        self.assertTrue(graph.is_following(self.reader.pk, self.author.pk))
+        self.assertFalse(graph.is_following(self.author.pk, self.reader.pk))
+        self.assertFalse(graph.is_following(None, self.author.pk))
+        self.assertEqual(graph.counts(self.other.pk), (2, 0))
+        with self.assertNumQueries(0):
+            graph.is_following(self.reader.pk, self.other.pk)
+            graph.counts(self.other.pk)
+
+    def test_mutuals_and_suggestions(self):
+        self.assertEqual(graph.mutuals(self.reader.pk), [self.friend.pk])
+        self.assertEqual(graph.suggestions(self.reader.pk),
+                         [(self.other.pk, 2)])
+        self.assertEqual(graph.suggestions(self.other.pk), [])
+
+    def test_reset(self):
+        graph.following(self.reader.pk)
+        Follow.objects.filter(user=self.reader).delete()
+        graph.reset()
+        self.assertEqual(list(graph.following(self.reader.pk)), [])
+
+
+class GraphSignalTests(TransactionTestCase):
+    """Сигналы сбрасывают массивы после фиксации, поэтому нужны транзакции."""
+
+    def setUp(self):
+        cache.clear()
+        self.reader, self.other = [
+            User.objects.create_user(username=name)
+            for name in ('reader', 'other')]
+
+    def test_signals_drop_cached_arrays(self):
+        graph.following(self.reader.pk)
+        graph.counts(self.other.pk)
+        follow = Follow.objects.create(user=self.reader, author=self.other)
+        # Перечитываются только массивы подписчика и автора.
+        with self.assertNumQueries(2):
+            self.assertTrue(graph.is_following(self.reader.pk,
+                                               self.other.pk))
+            self.assertEqual(graph.counts(self.other.pk), (1, 0))
+        follow.delete()
+        with self.assertNumQueries(2):
+            self.assertFalse(graph.is_following(self.reader.pk,
+                                                self.other.pk))
+            self.assertEqual(graph.counts(self.other.pk), (0, 0))
+
+    def test_follow_repairs_lost_update(self):
+        """Массив, испорченный гонкой, не правится, а перечитывается."""
+        third = User.objects.create_user(username='third')
+        Follow.objects.create(user=self.reader, author=third)
+        generation, = caching.generations([graph.GRAPH_SCOPE])
+        # Другой процесс записал массив без этой подписки.
+        cache.set(graph._key(generation, graph.FOLLOWING, self.reader.pk),
+                  array('i').tobytes())
+        Follow.objects.create(user=self.reader, author=self.other)
+        self.assertEqual(list(graph.following(self.reader.pk)),
+                         sorted([third.pk, self.other.pk]))
+
+    def test_rollback_keeps_cached_arrays(self):
+        graph.following(self.reader.pk)
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            Follow.objects.create(user=self.reader, author=self.other)
+            raise RuntimeError
+        self.assertFalse(graph.is_following(self.reader.pk, self.other.pk))
+
+    def test_profile_follow_state(self):
+        self.client.force_login(self.reader)
+        url = reverse('posts:profile', args=[self.other.username])
+        self.assertFalse(self.client.get(url).context['following'])
+        self.client.get(reverse('posts:profile_follow',
+                                args=[self.other.username]))
+        self.assertTrue(self.client.get(url).context['following'])
+        self.client.get(reverse('posts:profile_unfollow',
+                                args=[self.other.username]))
+        self.assertFalse(self.client.get(url).context['following'])
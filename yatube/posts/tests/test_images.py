@@ -0,0 +1,87 @@
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from PIL import Image
+
+from posts.models import Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+def image_upload(name, size=(50, 50), color=(255, 0, 0)):
+    buffer = BytesIO()
+    Image.new('RGB', size, color).save(buffer, 'PNG')
+    return SimpleUploadedFile(name, buffer.getvalue(),
+                              content_type='image/png')
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT,
+                   IMAGE_MASTER_MAX_SIDE=100,
+                   IMAGE_MASTER_FORMATS=['WEBP', 'JPEG'])
+class ImageIngestionTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.client.force_login(self.author)
+
+    def publish(self, text, image):
+        return self.client.post(reverse('posts:new_post'),
+                                {'text': text, 'image': image})
+
+    def test_master_is_bounded(self):
+        """В хранилище попадает уменьшенный мастер."""
+        self.publish('Большая картинка', image_upload('big.png', (400, 200)))
+        post = Post.objects.get(text='Большая картинка')
+        self.assertRegex(post.image.name, r'\.(webp|jpg)$')
+        self.assertRegex(post.image_hash, r'^[0-9a-f]{16}$')
+        with Image.open(post.image.path) as master:
+            self.assertEqual(master.size, (100, 50))
+
+    def test_same_image_is_stored_once(self):
+        """Одинаковые картинки разных записей хранятся одним файлом."""
+        self.publish('Первая', image_upload('first.png'))
+        self.publish('Вторая', image_upload('second.png'))
+        first = Post.objects.get(text='Первая')
+        second = Post.objects.get(text='Вторая')
+        self.assertEqual(first.image.name, second.image.name)
+
+    def test_similar_images_are_not_merged(self):
+        """Картинки с одинаковым dHash, но разным содержимым не смешиваются."""
+        self.publish('Красная', image_upload('red.png'))
+        self.publish('Синяя', image_upload('blue.png', color=(0, 0, 255)))
+        red = Post.objects.get(text='Красная')
+        blue = Post.objects.get(text='Синяя')
+        self.assertEqual(red.image_hash, blue.image_hash)
+        self.assertNotEqual(red.image.name, blue.image.name)
+
+    @override_settings(IMAGE_UPLOAD_MAX_SIZE=100)
+    def test_too_large_upload_is_rejected(self):
+        """Файл больше IMAGE_UPLOAD_MAX_SIZE не принимается."""
+        response = self.publish('Огромная', image_upload('huge.png',
+                                                         (300, 300)))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['form'].errors['image'])
+        self.assertFalse(Post.objects.filter(text='Огромная').exists())
+
+    @override_settings(IMAGE_MAX_PIXELS=100)
+    def test_too_many_pixels_is_rejected(self):
+        """Размеры проверяются по заголовку картинки."""
+        response = self.publish('Широкая', image_upload('wide.png',
+                                                        (20, 20)))
+        self.assertTrue(response.context['form'].errors['image'])
@@ -0,0 +1,124 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.core.cache import cache
+from django.http import HttpResponse, HttpResponseRedirect
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts import limits
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class IdempotencyTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.calls = 0
+
+    def request(self, data, **extra):
+        request = self.factory.post('/new/', data, **extra)
+        request.user = AnonymousUser()
+        return request
+
+    def view(self, request):
+        self.calls += 1
+        if not request.POST.get('text'):
+            return HttpResponse('Форма с ошибками')
+        return HttpResponseRedirect(f'/post/{self.calls}/')
+
+    def test_duplicate_is_replayed(self):
+        view = limits.idempotent(self.view)
+        first = view(self.request({'text': 'Запись'}))
+        second = view(self.request({'text': 'Запись'}))
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(second['Location'], first['Location'])
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+
+    def test_different_key_or_content(self):
+        view = limits.idempotent(self.view)
+        view(self.request({'text': 'Запись', 'idempotency_key': 'a'}))
+        view(self.request({'text': 'Запись', 'idempotency_key': 'b'}))
+        view(self.request({'text': 'Другая', 'idempotency_key': 'b'}))
+        view(self.request({'text': 'Другая'}, HTTP_IDEMPOTENCY_KEY='b'))
+        self.assertEqual(self.calls, 3)
+
+    def test_in_flight_duplicate(self):
+        request = self.request({'text': 'Запись'})
+        cache.add(limits.fingerprint(request, ''), 'pending')
+        response = limits.idempotent(self.view)(request)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertEqual(self.calls, 0)
+
+    def test_failures_are_not_remembered(self):
+        view = limits.idempotent(self.view)
+        view(self.request({'text': ''}))
+        view(self.request({'text': ''}))
+        self.assertEqual(self.calls, 2)
+
+        def broken(request):
+            raise RuntimeError
+        with self.assertRaises(RuntimeError):
+            limits.idempotent(broken)(self.request({'text': 'Запись'}))
+        view(self.request({'text': 'Запись'}))
+        self.assertEqual(self.calls, 3)
+
+
+@override_settings(RATE_LIMITS={'test': (2, 60)})
+class RateLimitTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+
+    def request(self, method='post'):
+        request = getattr(self.factory, method)('/new/')
+        request.user = AnonymousUser()
+        return request
+
+    def test_bucket(self):
+        key = 'throttle:test:bucket'
+        self.assertEqual(limits.take_token(key, 2, 60, now=1000), 0)
+        self.assertEqual(limits.take_token(key, 2, 60, now=1000), 0)
+        self.assertEqual(limits.take_token(key, 2, 60, now=1000), 30)
+        self.assertEqual(limits.take_token(key, 2, 60, now=1010), 20)
+        self.assertEqual(limits.take_token(key, 2, 60, now=1030), 0)
+
+    def test_decorator(self):
+        view = limits.rate_limit('test')(lambda request: HttpResponse())
+        statuses = [view(self.request()).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        response = view(self.request())
+        self.assertIn(response['Retry-After'], ('29', '30'))
+        self.assertEqual(view(self.request('get')).status_code, 200)
+
+    def test_unknown_scope_is_unlimited(self):
+        view = limits.rate_limit('other')(lambda request: HttpResponse())
+        for _ in range(5):
+            self.assertEqual(view(self.request()).status_code, 200)
+
+
+class WriteViewsTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='writer')
+        cls.post = Post.objects.create(author=cls.user, text='Запись')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.user)
+
+    def test_double_submit(self):
+        url = self.post.get_comment_url()
+        for _ in range(2):
+            response = self.client.post(url, {'text': 'Комментарий'})
+            self.assertEqual(response.status_code, 302)
+        self.assertEqual(Comment.objects.count(), 1)
+
+    @override_settings(RATE_LIMITS={'new_post': (1, 60)})
+    def test_new_post_limit(self):
+        self.client.post('/new/', {'text': 'Первая'})
+        response = self.client.post('/new/', {'text': 'Вторая'})
+        self.assertEqual(response.status_code, 429)
+        self.assertTrue(response.has_header('Retry-After'))
+        self.assertEqual(Post.objects.filter(author=self.user).count(), 2)
@@ -0,0 +1,60 @@
+from django.contrib.auth import get_user_model
+from django.test import SimpleTestCase, override_settings
+from django.urls import reverse, set_script_prefix
+
+from posts import links
+from posts.models import Group, Post
+
+User = get_user_model()
+
+USERNAMES = ('TestUser', 'user.name+tag@mail', 'Юзер', "o'brien")
+
+
+class LinksTests(SimpleTestCase):
+    def tearDown(self):
+        set_script_prefix('/')
+
+    def test_build_matches_reverse(self):
+        cases = []
+        for username in USERNAMES:
+            cases += [
+                ('posts:profile', {'username': username}),
+                ('posts:post', {'username': username, 'post_id': 42}),
+                ('posts:post_edit', {'username': username, 'post_id': 7}),
+                ('posts:add_comment', {'username': username, 'post_id': 1}),
+            ]
+        cases.append(('posts:group_posts', {'slug': 'test-slug'}))
+        for name, kwargs in cases:
+            with self.subTest(name=name, kwargs=kwargs):
+                self.assertEqual(links.build(name, **kwargs),
+                                 reverse(name, kwargs=kwargs))
+
+    def test_script_prefix(self):
+        links.profile_url('TestUser')
+        set_script_prefix('/yatube/')
+        self.assertEqual(links.profile_url('TestUser'), '/yatube/TestUser/')
+
+    def test_templates_reset_with_urlconf(self):
+        links.group_url('slug')
+        with override_settings(ROOT_URLCONF='yatube.urls'):
+            self.assertEqual(links._templates, {})
+
+    def test_model_urls(self):
+        author = User(username='TestUser')
+        group = Group(title='Группа', slug='test-slug')
+        post = Post(pk=3, author=author, group=group)
+        expected = {
+            author.get_absolute_url(): reverse('posts:profile',
+                                               args=['TestUser']),
+            group.get_absolute_url(): reverse('posts:group_posts',
+                                              args=['test-slug']),
+            post.get_absolute_url(): reverse('posts:post',
+                                             args=['TestUser', 3]),
+            post.get_edit_url(): reverse('posts:post_edit',
+                                         args=['TestUser', 3]),
+            post.get_comment_url(): reverse('posts:add_comment',
+                                            args=['TestUser', 3]),
+        }
+        for url, reversed_url in expected.items():
+            with self.subTest(url=url):
+                self.assertEqual(url, reversed_url)
@@ -0,0 +1,155 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import (RequestFactory, SimpleTestCase, TransactionTestCase,
+                         override_settings)
+from django.test.utils import CaptureQueriesContext
+
+from posts import media
+from posts.models import MediaFile, Post
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaReferenceTests(TransactionTestCase):
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        self.author = User.objects.create_user(username='Author')
+
+    def create_post(self, content):
+        post = Post(author=self.author, text='Запись')
+        post.image.save('photo.gif', ContentFile(content), save=False)
+        post.save()
+        return post
+
+    def test_same_content_is_stored_once(self):
+        """Файл называется по хэшу содержимого и хранится один раз."""
+        first = self.create_post(b'GIF89a-first')
+        second = self.create_post(b'GIF89a-first')
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertRegex(first.image.name,
+                         r'^posts/[0-9a-f]{2}/[0-9a-f]{2}/[0-9a-f]{64}\.gif$')
+        self.assertEqual(MediaFile.objects.get(
+            name=first.image.name).refcount, 2)
+
+    def test_unreferenced_files_are_removed(self):
+        """Файл удаляется, когда на него не ссылается ни одна запись."""
+        first = self.create_post(b'GIF89a-shared')
+        second = self.create_post(b'GIF89a-shared')
+        path = first.image.path
+        first.delete()
+        self.assertTrue(os.path.exists(path))
+
+        second.image.save('new.gif', ContentFile(b'GIF89a-new'))
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse(MediaFile.objects.filter(name=first.image.name))
+        self.assertTrue(os.path.exists(second.image.path))
+
+    def test_file_checks_hold_the_writer_transaction(self):
+        """Сохранение записи и удаление файла не пересекаются."""
+        storage = Post._meta.get_field('image').storage
+        delete, save = storage.delete, storage.save
+        seen = []
+
+        def check(method):
+            def wrapper(*args, **kwargs):
+                seen.append(connection.in_atomic_block)
+                return method(*args, **kwargs)
+            return wrapper
+
+        with mock.patch.object(storage, 'save', check(save)), \
+                mock.patch.object(storage, 'delete', check(delete)):
+            # Как в форме: файл сохраняет хранилищу сам Post.save.
+            post = Post.objects.create(
+                author=self.author, text='Запись',
+                image=SimpleUploadedFile('a.gif', b'GIF89a-locked'))
+            post.image = SimpleUploadedFile('b.gif', b'GIF89a-other')
+            post.save()
+        self.assertEqual(seen, [True, True, True])
+
+    def test_release_does_not_scan_posts(self):
+        """Удаление записи не ищет другие записи по имени файла."""
+        post = self.create_post(b'GIF89a-single')
+        path = post.image.path
+        with CaptureQueriesContext(connection) as queries:
+            post.delete()
+        self.assertFalse(os.path.exists(path))
+        self.assertFalse([query['sql'] for query in queries
+                          if query['sql'].startswith('SELECT')
+                          and '"posts_post"."image" =' in query['sql']])
+
+    def test_collect_orphans_keeps_referenced_files(self):
+        """Файл записи без учёта в MediaFile не удаляется."""
+        post = self.create_post(b'GIF89a-loaded')
+        MediaFile.objects.all().delete()
+        self.assertEqual(media.collect_orphans(grace=0), 0)
+        self.assertTrue(os.path.exists(post.image.path))
+
+    def test_collect_orphans(self):
+        """Команда подбирает файлы, не попавшие в учёт."""
+        storage = Post._meta.get_field('image').storage
+        name = storage.save('posts/lost.gif', ContentFile(b'GIF89a-lost'))
+        self.assertEqual(media.collect_orphans(grace=0), 1)
+        self.assertFalse(storage.exists(name))
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class MediaServeTests(SimpleTestCase):
+    databases = '__all__'
+    name = 'posts/ab/cd/' + 'abcd' * 16 + '.gif'
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        os.makedirs(os.path.join(TEMP_MEDIA_ROOT, 'posts/ab/cd'),
+                    exist_ok=True)
+        with open(os.path.join(TEMP_MEDIA_ROOT, cls.name), 'wb') as file:
+            file.write(b'0123456789')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def serve(self, **headers):
+        request = RequestFactory().get('/media/' + self.name, **headers)
+        return media.serve(request, self.name)
+
+    def test_immutable_headers(self):
+        """Файл отдаётся с вечным кэшем и ETag из хэша."""
+        response = self.serve()
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertEqual(response['ETag'], '"' + 'abcd' * 16 + '"')
+        response.close()
+
+        response = self.serve(HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_range(self):
+        """Заголовок Range отдаёт часть файла."""
+        response = self.serve(HTTP_RANGE='bytes=2-4')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'234')
+        self.assertEqual(response['Content-Range'], 'bytes 2-4/10')
+
+        response = self.serve(HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+        response = self.serve(HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
@@ -0,0 +1,140 @@
+"""
+Планы запросов страниц posts.
+
+Каждый SQL-запрос, выполненный страницей, прогоняется через
+EXPLAIN QUERY PLAN. Тест падает, если SQLite читает таблицу целиком
+(SCAN без индекса) или сортирует во временном B-дереве.
+"""
+import re
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Проверяются запросы, которые что-то ищут в таблицах.
+EXPLAINED = ('SELECT', 'UPDATE', 'DELETE')
+
+# Обход индекса по порядку, поиск в FTS по rowid или MATCH и
+# подзапрос-константа допустимы.
+ALLOWED_SCAN = re.compile(
+    r'SCAN (\S+ USING (COVERING )?INDEX|\S+ VIRTUAL TABLE INDEX \d+:\S'
+    r'|CONSTANT ROW)')
+
+
+def plan_problems(sql):
+    with connection.cursor() as cursor:
+        cursor.execute('EXPLAIN QUERY PLAN ' + sql)
+        details = [row[-1] for row in cursor.fetchall()]
+    problems = [detail for detail in details
+                if 'TEMP B-TREE' in detail
+                or detail.startswith('SCAN')
+                and not ALLOWED_SCAN.match(detail)]
+    return problems, details
+
+
+class QueryPlanTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.reader = User.objects.create_user(username='reader')
+        cls.author = User.objects.create_user(username='author')
+        cls.other = User.objects.create_user(username='other')
+        cls.group = Group.objects.create(title='Группа', slug='group',
+                                         description='Описание')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+        for number in range(25):
+            post = Post.objects.create(
+                text=f'Запись про котов {number}',
+                author=cls.author if number % 2 else cls.other,
+                group=cls.group if number % 3 else None)
+            Comment.objects.create(post=post, author=cls.reader,
+                                   text='Комментарий')
+        cls.post = Post.objects.filter(author=cls.author).first()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def assert_indexed(self, url, data=None, method='get'):
+        """Запрашивает страницу и проверяет планы всех её запросов."""
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = getattr(self.client, method)(url, data)
+        self.assertLess(response.status_code, 400, url)
+        failures = []
+        for query in context.captured_queries:
+            if not query['sql'].startswith(EXPLAINED):
+                continue
+            problems, details = plan_problems(query['sql'])
+            if problems:
+                failures.append(f'{query["sql"]}\n    {details}')
+        if failures:
+            self.fail(f'{method.upper()} {url}: запросы без индекса:\n'
+                      + '\n'.join(failures))
+        return response
+
+    def assert_pages_indexed(self, url):
+        """Первая и следующая страница курсором и номерная страница."""
+        response = self.assert_indexed(url)
+        cursor = response.context['page'].paginator.next_cursor
+        self.assertIsNotNone(cursor, url)
+        self.assert_indexed(url, {'cursor': cursor})
+        self.assert_indexed(url, {'page': 2})
+
+    def test_feeds(self):
+        for url in ('/', '/group/group/', '/author/', '/follow/'):
+            with self.subTest(url=url):
+                self.assert_pages_indexed(url)
+
+    def test_celebrity_feed(self):
+        """Записи знаменитостей подмешиваются в ленту по индексу."""
+        with override_settings(FEED_FANOUT_MAX_FOLLOWERS=0):
+            response = self.assert_indexed('/follow/')
+            self.assertEqual(len(response.context['page']), 10)
+            self.assert_indexed('/follow/', {
+                'cursor': response.context['page'].paginator.next_cursor})
+
+    def test_post_and_search(self):
+        self.assert_indexed(f'/author/{self.post.id}/')
+        self.assert_indexed('/search/', {'q': 'коты'})
+
+    def test_comments(self):
+        """Порции комментариев и ветка читаются диапазоном по индексу."""
+        root = self.post.comments.first()
+        Comment.objects.create(post=self.post, author=self.author,
+                               parent=root, text='Ответ')
+        url = f'/author/{self.post.id}/comments/'
+        with override_settings(COMMENTS_PER_PAGE=1):
+            response = self.assert_indexed(url)
+            self.assert_indexed(url, {'cursor': response.json()['next']})
+            self.assert_indexed(url, {'thread': root.id})
+        self.assert_indexed(f'/author/{self.post.id}/comment/',
+                            {'text': 'Ответ', 'parent': root.id}, 'post')
+
+    def test_recommendations(self):
+        call_command('build_recommendations', stdout=StringIO())
+        self.assert_indexed('/follow/recommendations/')
+
+    def test_api(self):
+        for url in ('/api/v1/posts/', '/api/v1/groups/group/posts/',
+                    '/api/v1/users/author/posts/', '/api/v1/follow/',
+                    f'/api/v1/users/author/posts/{self.post.id}/'):
+            with self.subTest(url=url):
+                self.assert_indexed(url)
+
+    def test_writes(self):
+        url = f'/author/{self.post.id}/'
+        self.assert_indexed(url + 'comment/', {'text': 'Ещё'}, 'post')
+        self.assert_indexed(
+            '/new/', {'text': 'Новая', 'group': self.group.id}, 'post')
+        self.assert_indexed('/author/unfollow/')
+        self.assert_indexed('/author/follow/')
+        self.client.force_login(self.author)
+        self.assert_indexed(url + 'edit/', {'text': 'Правка'}, 'post')
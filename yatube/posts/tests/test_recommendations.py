@@ -0,0 +1,102 @@
+from io import StringIO
+from unittest import mock, skipIf
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import recommendations
+from posts.models import Follow, Recommendation
+
+User = get_user_model()
+
+
+def suggested(user):
+    return list(Recommendation.objects.filter(user=user).order_by('rank')
+                .values_list('author__username', flat=True))
+
+
+class RecommendationTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = {name: User.objects.create_user(username=name)
+                     for name in ('reader', 'cats', 'dogs', 'birds',
+                                  'fans1', 'fans2', 'fans3')}
+        # Поклонники котов чаще читают собак, чем птиц.
+        for fan in ('fans1', 'fans2', 'fans3'):
+            Follow.objects.create(user=cls.users[fan],
+                                  author=cls.users['cats'])
+        for fan in ('fans1', 'fans2'):
+            Follow.objects.create(user=cls.users[fan],
+                                  author=cls.users['dogs'])
+        Follow.objects.create(user=cls.users['fans3'],
+                              author=cls.users['birds'])
+        Follow.objects.create(user=cls.users['reader'],
+                              author=cls.users['cats'])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_co_follow_ranking(self):
+        report = recommendations.build(use_numpy=False)
+        self.assertEqual(suggested(self.users['reader']), ['dogs', 'birds'])
+        self.assertEqual(report['users'], 4)
+        self.assertEqual(report['recommendations'],
+                         Recommendation.objects.count())
+
+    @skipIf(recommendations.numpy is None, 'NumPy не установлен')
+    def test_numpy_matches_python(self):
+        with override_settings(RECOMMENDATION_MAX_FOLLOWING=1,
+                               RECOMMENDATION_BATCH_ROWS=2):
+            recommendations.build(use_numpy=False)
+            expected = list(Recommendation.objects.order_by(
+                'user', 'rank').values_list('user', 'author', 'score'))
+            recommendations.build(use_numpy=True)
+        self.assertEqual(list(Recommendation.objects.order_by(
+            'user', 'rank').values_list('user', 'author', 'score')),
+            expected)
+
+    def test_scoring_runs_before_transaction(self):
+        """Подсказки считаются до того, как таблица блокируется записью."""
+        events = []
+        recommend = recommendations._recommend_python
+        atomic = recommendations.transaction.atomic
+
+        def scoring(*args):
+            for row in recommend(*args):
+                events.append('row')
+                yield row
+
+        def opening(*args, **kwargs):
+            events.append('atomic')
+            return atomic(*args, **kwargs)
+
+        with mock.patch.object(recommendations, '_recommend_python',
+                               scoring), \
+                mock.patch.object(recommendations.transaction, 'atomic',
+                                  opening):
+            recommendations.build(use_numpy=False)
+        self.assertEqual(events[:5], ['row'] * 4 + ['atomic'])
+
+    def test_follow_removes_recommendation(self):
+        recommendations.build(use_numpy=False)
+        Follow.objects.create(user=self.users['reader'],
+                              author=self.users['dogs'])
+        self.assertEqual(suggested(self.users['reader']), ['birds'])
+
+    def test_fragment(self):
+        call_command('build_recommendations', '--no-numpy',
+                     stdout=StringIO())
+        self.client.force_login(self.users['reader'])
+        with self.assertNumQueries(3):
+            # Сессия, пользователь и сами подсказки.
+            response = self.client.get(reverse('posts:recommendations'))
+        self.assertEqual(
+            [item.author.username
+             for item in response.context['recommendations']],
+            ['dogs', 'birds'])
+        self.assertContains(response, '/dogs/')
+        response = self.client.get(reverse('posts:follow_index'))
+        self.assertContains(response, reverse('posts:recommendations'))
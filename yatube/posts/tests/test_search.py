@@ -0,0 +1,84 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.urls import reverse
+
+from posts import search
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_superuser(
+            username='Author', email='author@yatube.ru', password='12345')
+        cls.cats = Post.objects.create(
+            author=cls.author, text='Фотографии красивых котов')
+        cls.dogs = Post.objects.create(
+            author=cls.author, text='Прогулка с собакой')
+        Comment.objects.create(
+            post=cls.dogs, author=cls.author, text='А у меня живут коты')
+
+    def setUp(self):
+        cache.clear()
+
+    def test_stem(self):
+        """Разные формы слова сводятся к одной основе."""
+        self.assertEqual(search.stem('котами'), search.stem('кот'))
+        self.assertEqual(search.stem('публикации'),
+                         search.stem('публикация'))
+
+    def test_search_finds_posts_and_comments(self):
+        """Поиск находит словоформы в записях и в комментариях."""
+        response = self.client.get(reverse('posts:search'), {'q': 'котами'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['posts'], [self.cats, self.dogs])
+        self.assertContains(response, 'Фотографии красивых котов')
+
+        response = self.client.get(reverse('posts:search'),
+                                   {'q': 'жираф'})
+        self.assertEqual(response.context['posts'], [])
+
+    def test_search_index_follows_changes(self):
+        """Правка и удаление записи сразу видны в поиске."""
+        self.cats.text = 'Фотографии попугаев'
+        self.cats.save()
+        posts, _ = search.search_posts('попугай')
+        self.assertEqual(posts, [self.cats])
+        self.cats.delete()
+        posts, _ = search.search_posts('попугай')
+        self.assertEqual(posts, [])
+
+    def test_post_delete_unindexes_comments(self):
+        """Комментарии удалённой записи уходят из поискового индекса."""
+        Post.objects.get(pk=self.dogs.pk).delete()
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {search.COMMENT_TABLE}')
+            self.assertEqual(cursor.fetchone(), (0,))
+
+    def test_search_pagination(self):
+        """Результаты листаются курсором без повторов."""
+        Post.objects.bulk_create(
+            Post(author=self.author, text=f'Кот номер {number}')
+            for number in range(5))
+        search.rebuild()
+        seen = []
+        posts, cursor = search.search_posts('кот', per_page=3)
+        seen.extend(posts)
+        while cursor:
+            posts, cursor = search.search_posts('кот', cursor, per_page=3)
+            seen.extend(posts)
+        self.assertEqual(len(seen), 7)
+        self.assertEqual(len(set(seen)), 7)
+
+    def test_admin_uses_index(self):
+        """Поиск в админке находит запись по словоформе."""
+        self.client.force_login(self.author)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'красивые коты'})
+        self.assertEqual(list(response.context['cl'].result_list),
+                         [self.cats])
@@ -0,0 +1,128 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+
+from posts import threads
+from posts.models import Comment, Post
+
+User = get_user_model()
+
+
+class CommentThreadTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(username='author')
+        cls.reader = User.objects.create_user(username='reader')
+        cls.post = Post.objects.create(author=cls.author, text='Запись')
+        cls.other_post = Post.objects.create(author=cls.author,
+                                             text='Другая запись')
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.reader)
+
+    def comment(self, parent=None, text='Комментарий'):
+        return Comment.objects.create(post=self.post, author=self.reader,
+                                      parent=parent, text=text)
+
+    def test_paths(self):
+        root = self.comment()
+        reply = self.comment(parent=root)
+        self.assertEqual(root.path, threads.segment(root.pk))
+        self.assertEqual(reply.path, root.path + threads.segment(reply.pk))
+        self.assertEqual((root.depth, reply.depth), (0, 1))
+
+    def test_depth_limit(self):
+        comment = self.comment()
+        for _ in range(threads.MAX_DEPTH + 2):
+            comment = self.comment(parent=comment)
+        self.assertEqual(comment.depth, threads.MAX_DEPTH - 1)
+
+    def test_subtree(self):
+        first = self.comment()
+        reply = self.comment(parent=first)
+        nested = self.comment(parent=reply)
+        second = self.comment()
+        self.comment(parent=second)
+        subtree = threads.subtree(self.post.comments.all(), first.path)
+        self.assertEqual(list(subtree.order_by('path')),
+                         [first, reply, nested])
+
+    def test_stream_order_and_cursor(self):
+        first = self.comment()
+        second = self.comment()
+        reply = self.comment(parent=first)
+        comments = self.post.comments.all()
+        page = threads.CommentPage(comments, per_page=2)
+        self.assertEqual(list(page), [first, reply])
+        page = threads.CommentPage(comments, page.next_cursor, per_page=2)
+        self.assertEqual(list(page), [second])
+        self.assertIsNone(page.next_cursor)
+
+    def test_broken_cursor_starts_over(self):
+        first = self.comment()
+        for cursor in ('garbage', threads.encode_cursor('abc'),
+                       threads.encode_cursor(['x'])):
+            with self.subTest(cursor=cursor):
+                page = threads.CommentPage(self.post.comments.all(), cursor)
+                self.assertEqual(list(page), [first])
+
+    def test_fill_paths(self):
+        root = Comment.objects.create(post=self.post, author=self.reader,
+                                      text='Корень')
+        Comment.objects.bulk_create([
+            Comment(id=root.pk + 1, post=self.post, author=self.reader,
+                    parent=root, text='Ответ'),
+            Comment(id=root.pk + 2, post=self.post, author=self.reader,
+                    parent_id=root.pk + 1, text='Ответ на ответ'),
+            Comment(id=root.pk + 3, post=self.post, author=self.reader,
+                    text='Ещё корень'),
+        ])
+        self.assertEqual(threads.fill_paths(Comment.objects.all()), 3)
+        paths = dict(Comment.objects.values_list('id', 'path'))
+        self.assertEqual(paths[root.pk + 2],
+                         root.path + threads.segment(root.pk + 1)
+                         + threads.segment(root.pk + 2))
+        self.assertEqual(paths[root.pk + 3], threads.segment(root.pk + 3))
+
+    def test_reply_view(self):
+        root = self.comment()
+        foreign = Comment.objects.create(post=self.other_post,
+                                         author=self.reader, text='Чужой')
+        url = self.post.get_comment_url()
+        self.client.post(url, {'text': 'Ответ', 'parent': root.pk})
+        self.client.post(url, {'text': 'Мимо', 'parent': foreign.pk})
+        self.assertEqual(Comment.objects.get(text='Ответ').parent, root)
+        self.assertIsNone(Comment.objects.get(text='Мимо').parent)
+
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_load_more(self):
+        comments = [self.comment(text=f'Комментарий {number}')
+                    for number in range(3)]
+        response = self.client.get(self.post.get_absolute_url())
+        self.assertEqual(list(response.context['comments']), comments[:2])
+        cursor = response.context['comments'].next_cursor
+        self.assertContains(response, f'data-cursor="{cursor}"')
+
+        data = self.client.get(self.post.get_comments_url(),
+                               {'cursor': cursor}).json()
+        self.assertEqual([item['id'] for item in data['comments']],
+                         [comments[2].pk])
+        self.assertIsNone(data['next'])
+        self.assertIn('Комментарий 2', data['html'])
+
+    def test_thread(self):
+        root = self.comment()
+        reply = self.comment(parent=root)
+        self.comment()
+        data = self.client.get(self.post.get_comments_url(),
+                               {'thread': root.pk}).json()
+        self.assertEqual(
+            [(item['id'], item['parent'], item['depth'])
+             for item in data['comments']],
+            [(root.pk, None, 0), (reply.pk, root.pk, 1)])
+        for thread in ('abc', '999999'):
+            with self.subTest(thread=thread):
+                response = self.client.get(self.post.get_comments_url(),
+                                           {'thread': thread})
+                self.assertEqual(response.status_code, 404)
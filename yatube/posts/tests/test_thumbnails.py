@@ -0,0 +1,88 @@
+import shutil
+import tempfile
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from posts import thumbnails
+from posts.models import Post, ThumbnailJob
+
+User = get_user_model()
+
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
+
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
+class ThumbnailTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='Author')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        cache.clear()
+        self.client.force_login(self.author)
+
+    def test_new_post_queues_and_worker_renders(self):
+        """Новая картинка попадает в очередь, обработчик готовит миниатюры."""
+        self.client.post(reverse('posts:new_post'), {
+            'text': 'Запись с картинкой',
+            'image': SimpleUploadedFile('small.gif', SMALL_GIF,
+                                        content_type='image/gif'),
+        })
+        post = Post.objects.get(text='Запись с картинкой')
+        self.assertTrue(ThumbnailJob.objects.filter(post=post).exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, post.image.url)
+
+        url = '/media/cache/ab/cd/small.gif'
+        with mock.patch('posts.thumbnails.render',
+                        return_value={'card': url}) as render:
+            self.assertEqual(thumbnails.run_pending(), 1)
+        render.assert_called_once_with(post)
+        post.refresh_from_db()
+        self.assertEqual(post.thumbnail_urls, {'card': url})
+        self.assertFalse(ThumbnailJob.objects.exists())
+        response = self.client.get(reverse('posts:index'))
+        self.assertContains(response, url)
+
+    def test_broken_image_is_retried_later(self):
+        """Ошибка не теряет задание, а откладывает его."""
+        post = Post.objects.create(author=self.author, text='Запись',
+                                   image='posts/missing.gif')
+        thumbnails.enqueue(post)
+        self.assertEqual(thumbnails.run_pending(), 1)
+        job = ThumbnailJob.objects.get(post=post)
+        self.assertEqual(job.attempts, 1)
+        self.assertTrue(job.last_error)
+        self.assertEqual(thumbnails.run_pending(), 0)
+
+    @override_settings(THUMBNAIL_WORKERS=1)
+    def test_start_workers_once(self):
+        """Обработчик запускается один раз и сразу разбирает очередь."""
+        with mock.patch.object(thumbnails, '_workers', []), \
+                mock.patch.object(thumbnails, '_wakeup') as wakeup, \
+                mock.patch('threading.Thread') as thread:
+            thumbnails.start_workers()
+            thumbnails.start_workers()
+        thread.return_value.start.assert_called_once_with()
+        wakeup.set.assert_called_once_with()
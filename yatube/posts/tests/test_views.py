@@ -1,25 +1,31 @@
 import shutil
 import tempfile
+import warnings
 
 from django import forms
 from django.conf import settings
 from django.contrib.auth import get_user_model
 from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.test import Client, TestCase
+from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 from http import HTTPStatus
 
+from posts import caching
 from posts.models import Group, Post, Follow
+from posts.tests.query_budget import max_queries
 
 User = get_user_model()
 
+TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
+
+@override_settings(MEDIA_ROOT=TEMP_MEDIA_ROOT)
 class PostPagesTests(TestCase):
     @classmethod
     def setUpClass(cls):
         super().setUpClass()
-        settings.MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
 
         cls.user = User.objects.create_user(username='TestUser')
         cls.group = Group.objects.create(title='Тестовое название',
@@ -52,7 +58,7 @@ class PostPagesTests(TestCase):
 
     @classmethod
     def tearDownClass(cls):
-        shutil.rmtree(settings.MEDIA_ROOT, ignore_errors=True)
+        shutil.rmtree(TEMP_MEDIA_ROOT, ignore_errors=True)
         super().tearDownClass()
 
     def setUp(self):
@@ -78,6 +84,20 @@ class PostPagesTests(TestCase):
         last_post = response.context['page'][0]
         self.assertEqual(last_post, self.post)
 
+    def test_feed_pages_subscribe_to_events(self):
+        """Ленты подписываются на новые записи по SSE."""
+        cache.clear()
+        pages = {
+            reverse('posts:index'): 'data-events="/events/"',
+            reverse('posts:follow_index'): 'data-events="/events/follow/"',
+            reverse('posts:group_posts', args=['test-slug']):
+                'data-events=""',
+        }
+        for url, attribute in pages.items():
+            with self.subTest(url=url):
+                self.assertContains(self.authorized_client.get(url),
+                                    attribute)
+
     def test_context_in_template_group(self):
         """
         Шаблон group сформирован с правильным контекстом.
@@ -157,6 +177,26 @@ class PostPagesTests(TestCase):
                 context = response.context[value]
                 self.assertEqual(context, expected)
 
+    def test_cached_post_card_edit_link(self):
+        """
+        Карточка записи берётся из кэша, а ссылка на редактирование
+        показывается только автору.
+        """
+        cache.clear()
+        edit_url = reverse('posts:post_edit',
+                           kwargs={'username': self.user.username,
+                                   'post_id': self.post.id})
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertContains(response, edit_url)
+        self.assertContains(response, self.post.text)
+
+        reader = Client()
+        reader.force_login(User.objects.create_user(username='Reader'))
+        with self.assertTemplateNotUsed('includes/post_item.html'):
+            response = reader.get(reverse('posts:index'))
+        self.assertContains(response, self.post.text)
+        self.assertNotContains(response, edit_url)
+
     def test_post_not_add_another_group(self):
         """
         При создании поста с указанием группы,
@@ -174,12 +214,16 @@ class PaginatorViewsTest(TestCase):
     def setUpClass(cls):
         super().setUpClass()
         cls.user = User.objects.create_user(username='Test User')
+        cls.group = Group.objects.create(title='Пагинация',
+                                         slug='paginator',
+                                         description='Тестовое описание')
         cls.authorized_client = Client()
         cls.authorized_client.force_login(cls.user)
         for count in range(13):
             cls.post = Post.objects.create(
                 text=f'Тестовый пост номер {count}',
-                author=cls.user)
+                author=cls.user,
+                group=cls.group)
 
     def test_first_page_contains_ten_records(self):
         cache.clear()
@@ -192,6 +236,37 @@ class PaginatorViewsTest(TestCase):
         )
         self.assertEqual(len(response.context.get('page').object_list), 3)
 
+    def test_cursor_pages(self):
+        """Курсоры ведут на следующую и обратно на первую страницу."""
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        first = self.authorized_client.get(url).context['page']
+        cursor = first.paginator.next_cursor
+        self.assertIsNotNone(cursor)
+        second = self.authorized_client.get(
+            url, {'cursor': cursor}).context['page']
+        self.assertEqual(len(second.object_list), 3)
+        self.assertIsNone(second.paginator.next_cursor)
+        self.assertTrue(second.has_previous())
+        self.assertFalse(
+            set(first.object_list) & set(second.object_list))
+        back = self.authorized_client.get(
+            url, {'cursor': second.paginator.previous_cursor}
+        ).context['page']
+        self.assertEqual(list(back.object_list), list(first.object_list))
+        self.assertFalse(back.has_previous())
+
+    @max_queries(3)
+    def test_index_does_not_query_per_post(self):
+        """Главная страница не делает запросов на каждую запись."""
+        cache.clear()
+        response = self.authorized_client.get(reverse('posts:index'))
+        self.assertEqual(len(response.context['page'].object_list), 10)
+
+    def test_broken_cursor_returns_first_page(self):
+        url = reverse('posts:group_posts', kwargs={'slug': self.group.slug})
+        response = self.authorized_client.get(url, {'cursor': '%%%'})
+        self.assertEqual(len(response.context['page'].object_list), 10)
+
 
 class TestFollow(TestCase):
     @classmethod
@@ -314,3 +389,39 @@ class TestComments(TestCase):
                                                {'text': 'new post'},
                                                follow=True)
         self.assertContains(response, 'new post')
+
+
+class AuthorPageCacheTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = User.objects.create_user(
+            username='Тестовый пользователь')
+        cls.group = Group.objects.create(title='Старое название',
+                                         slug='renamed')
+        cls.post = Post.objects.create(text='Текст', author=cls.author,
+                                       group=cls.group)
+
+    def setUp(self):
+        cache.clear()
+
+    def test_scope_keys_use_pk(self):
+        url = reverse('posts:profile', args=[self.author.username])
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            self.client.get(url)
+            self.client.get(url)
+        self.assertEqual(caching.author_scope_by_name(self.author.username),
+                         f'author:{self.author.pk}')
+
+    def test_group_rename_refreshes_author_pages(self):
+        urls = [reverse('posts:profile', args=[self.author.username]),
+                reverse('posts:post', args=[self.author.username,
+                                            self.post.pk])]
+        for url in urls:
+            self.client.get(url)
+            self.client.get(url)
+        self.group.title = 'Новое название'
+        self.group.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(self.client.get(url), 'Новое название')
@@ -1,7 +1,7 @@
 from django.core.cache import cache
 from django.urls import reverse
 from django.test import Client, TestCase
-from posts.models import User
+from posts.models import Post, User
 
 
 class CacheTest(TestCase):
@@ -12,8 +12,31 @@ class CacheTest(TestCase):
         self.first_client.force_login(self.user)
 
     def test_cache(self):
+        """Неизменившаяся главная страница отдаётся из кэша."""
+        cache.clear()
+        self.second_client.get(reverse('posts:index'))
+        with self.assertNumQueries(0):
+            response = self.second_client.get(reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+
+    def test_cache_invalidated_by_new_post(self):
+        """Новая запись сразу появляется на закэшированной странице."""
         cache.clear()
         self.second_client.get(reverse('posts:index'))
         self.first_client.post(reverse('posts:new_post'), {'text': 'New post'})
         response = self.second_client.get(reverse('posts:index'))
-        self.assertNotContains(response, 'New post')
+        self.assertContains(response, 'New post')
+
+    def test_cache_invalidated_by_comment(self):
+        """Комментарий сразу обновляет закэшированную страницу записи."""
+        cache.clear()
+        post = Post.objects.create(author=self.user, text='Запись')
+        url = reverse('posts:post', kwargs={'username': self.user.username,
+                                            'post_id': post.id})
+        self.second_client.get(url)
+        self.first_client.post(
+            reverse('posts:add_comment',
+                    kwargs={'username': self.user.username,
+                            'post_id': post.id}),
+            {'text': 'Свежий комментарий'})
+        self.assertContains(self.second_client.get(url), 'Свежий комментарий')
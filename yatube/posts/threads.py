@@ -0,0 +1,124 @@
+"""
+Ветки комментариев и постраничная выдача комментариев записи.
+
+У каждого комментария есть ``path`` — id всех его предков и его
+собственный id, каждый дополнен нулями до SEGMENT цифр. Сортировка
+по ``path`` даёт обход дерева в глубину: ответы идут сразу под своим
+комментарием, соседние — в порядке создания (id растёт вместе с
+``created``). Поэтому:
+
+* страница комментариев — это ``path > курсора`` по индексу
+  (post, path), без OFFSET и без отдельного запроса за ответами;
+* поддерево целиком — один диапазон ``path <= x < path + ':'``
+  (``:`` в ASCII следует сразу за ``9``).
+
+Уровней не больше MAX_DEPTH: ответ на комментарий последнего уровня
+прикрепляется к его родителю и встаёт с ним рядом.
+"""
+from django.conf import settings
+from django.db.models import CharField, OuterRef, Subquery, Value
+from django.db.models.functions import Cast, Concat, LPad
+
+from .paginators import decode_token, encode_token
+
+SEGMENT = 10
+
+MAX_DEPTH = 8
+
+# Поля, которые нужны includes/comments.html и ответу JSON.
+FIELDS = ('id', 'text', 'created', 'path', 'parent_id', 'post_id',
+          'author__username')
+
+
+def segment(pk):
+    return str(pk).zfill(SEGMENT)
+
+
+def depth(path):
+    """0 у комментария к записи, 1 у ответа на него и т. д."""
+    return len(path) // SEGMENT - 1
+
+
+def reply_parent_id(parent_path):
+    """Id комментария, к которому прикрепится ответ на ``parent_path``."""
+    ancestors = parent_path[:(MAX_DEPTH - 1) * SEGMENT]
+    return int(ancestors[-SEGMENT:])
+
+
+def fill_paths(queryset):
+    """
+    Пути комментариям без них, например после bulk_create.
+
+    Ответы получают путь, когда он уже есть у родителя, поэтому
+    уровни дерева заполняются по очереди, сверху вниз.
+    """
+    own = LPad(Cast('id', CharField()), SEGMENT, Value('0'))
+    filled = queryset.filter(path='', parent=None).update(path=own)
+    parent_path = queryset.model.objects.filter(
+        pk=OuterRef('parent_id')).values('path')
+    for _ in range(MAX_DEPTH - 1):
+        updated = queryset.filter(path='', parent__path__gt='').update(
+            path=Concat(Subquery(parent_path), own))
+        if not updated:
+            break
+        filled += updated
+    return filled
+
+
+def subtree(queryset, path):
+    """Комментарий с путём ``path`` и все ответы на него."""
+    return queryset.filter(path__gte=path, path__lt=path + ':')
+
+
+def encode_cursor(path):
+    return encode_token([path])
+
+
+def decode_cursor(cursor):
+    """Путь из курсора или None, если курсора нет или он испорчен."""
+    try:
+        (path,) = decode_token(cursor)
+    except (ValueError, TypeError):
+        return None
+    if not isinstance(path, str) or not path.isdigit() \
+            or len(path) % SEGMENT:
+        return None
+    return path
+
+
+class CommentPage:
+    """
+    Очередная порция комментариев после курсора.
+
+    ``comments`` — комментарии в порядке обхода дерева,
+    ``next_cursor`` — курсор следующей порции или None.
+    """
+
+    def __init__(self, queryset, cursor=None, per_page=None):
+        per_page = per_page or settings.COMMENTS_PER_PAGE
+        queryset = queryset.select_related('author').only(*FIELDS)
+        after = decode_cursor(cursor)
+        if after is not None:
+            queryset = queryset.filter(path__gt=after)
+        rows = list(queryset.order_by('path')[:per_page + 1])
+        self.comments = rows[:per_page]
+        self.next_cursor = None
+        if len(rows) > per_page:
+            self.next_cursor = encode_cursor(self.comments[-1].path)
+
+    def __iter__(self):
+        return iter(self.comments)
+
+    def __len__(self):
+        return len(self.comments)
+
+
+def serialize(comment):
+    return {
+        'id': comment.pk,
+        'parent': comment.parent_id,
+        'depth': comment.depth,
+        'author': comment.author.username,
+        'text': comment.text,
+        'created': comment.created.isoformat(),
+    }
@@ -0,0 +1,139 @@
+"""
+Подготовка миниатюр картинок записей вне запроса.
+
+Когда запись с картинкой сохраняется из new_post или post_edit, в
+таблицу ThumbnailJob ставится задание. Очередь хранится в базе, поэтому
+задания переживают перезапуск процесса. Её разбирают потоки внутри
+веб-процесса (THUMBNAIL_WORKERS, запускаются вместе с WSGI- и
+ASGI-приложением) или команда process_thumbnails. Обработчик
+строит все размеры из THUMBNAIL_GEOMETRIES и записывает их адреса в
+Post.thumbnails, так что шаблону не нужно обращаться к хранилищу: пока
+миниатюр нет, показывается исходная картинка.
+"""
+import json
+import logging
+import threading
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from sorl.thumbnail import get_thumbnail
+
+from . import caching
+from .models import Post, ThumbnailJob
+
+logger = logging.getLogger(__name__)
+
+_wakeup = threading.Event()
+_workers = []
+_workers_lock = threading.Lock()
+
+
+def enqueue(post):
+    """Ставит в очередь подготовку миниатюр картинки записи."""
+    if not post.image:
+        return
+    ThumbnailJob.objects.update_or_create(
+        post=post, defaults={'image': post.image.name, 'attempts': 0,
+                             'available_at': timezone.now(),
+                             'last_error': ''})
+    transaction.on_commit(_wake)
+
+
+def _wake():
+    start_workers()
+    _wakeup.set()
+
+
+def render(post):
+    """Миниатюры всех размеров: имя размера -> адрес."""
+    urls = {}
+    for name, (geometry, options) in settings.THUMBNAIL_GEOMETRIES.items():
+        thumbnail = get_thumbnail(post.image, geometry, **options)
+        if not thumbnail.exists():
+            # sorl-thumbnail не бросает исключений на нечитаемый исходник.
+            raise IOError(f'Миниатюра {geometry} не создана')
+        urls[name] = thumbnail.url
+    return urls
+
+
+def _claim():
+    """Следующее готовое задание, занятое на THUMBNAIL_LEASE секунд."""
+    now = timezone.now()
+    lease = now + timedelta(seconds=settings.THUMBNAIL_LEASE)
+    while True:
+        job = (ThumbnailJob.objects.filter(available_at__lte=now)
+               .order_by('available_at').first())
+        if job is None:
+            return None
+        claimed = ThumbnailJob.objects.filter(
+            pk=job.pk, available_at=job.available_at,
+        ).update(available_at=lease, attempts=F('attempts') + 1)
+        if claimed:
+            job.attempts += 1
+            return job
+
+
+def process(job):
+    post = (Post.objects.select_related('author', 'group')
+            .filter(pk=job.pk).first())
+    if post is None or post.image.name != job.image:
+        # Запись удалена или картинку успели заменить: задание на новую
+        # картинку поставит следующее сохранение.
+        ThumbnailJob.objects.filter(pk=job.pk, image=job.image).delete()
+        return
+    try:
+        urls = render(post)
+    except Exception as error:
+        logger.exception('Не удалось подготовить миниатюры %s', job.image)
+        if job.attempts >= settings.THUMBNAIL_MAX_ATTEMPTS:
+            ThumbnailJob.objects.filter(pk=job.pk, image=job.image).delete()
+        else:
+            delay = timedelta(seconds=2 ** job.attempts)
+            ThumbnailJob.objects.filter(pk=job.pk, image=job.image).update(
+                available_at=timezone.now() + delay, last_error=str(error))
+        return
+    Post.objects.filter(pk=post.pk, image=job.image).update(
+        thumbnails=json.dumps(urls))
+    ThumbnailJob.objects.filter(pk=job.pk, image=job.image).delete()
+    caching.bump(*caching.post_scopes(post))
+
+
+def run_pending(limit=None):
+    """Обрабатывает готовые задания; возвращает их число."""
+    done = 0
+    while limit is None or done < limit:
+        job = _claim()
+        if job is None:
+            break
+        process(job)
+        done += 1
+    return done
+
+
+def _work(poll_interval):
+    while True:
+        _wakeup.wait(poll_interval)
+        _wakeup.clear()
+        close_old_connections()
+        try:
+            run_pending()
+        except Exception:
+            logger.exception('Ошибка обработчика миниатюр')
+
+
+def start_workers(poll_interval=5):
+    """
+    Запускает THUMBNAIL_WORKERS потоков, если их ещё нет. Первый проход
+    они делают сразу, чтобы разобрать накопившиеся задания.
+    """
+    with _workers_lock:
+        while len(_workers) < settings.THUMBNAIL_WORKERS:
+            worker = threading.Thread(
+                target=_work, args=(poll_interval,),
+                name=f'thumbnails-{len(_workers)}', daemon=True)
+            worker.start()
+            _workers.append(worker)
+            _wakeup.set()
@@ -9,12 +9,17 @@ urlpatterns = [
     path('group/<slug:slug>/', views.group_posts, name='group_posts'),
     path('new/', views.new_post, name='new_post'),
     path('follow/', views.follow_index, name='follow_index', ),
+    path('follow/recommendations/', views.follow_recommendations,
+         name='recommendations'),
+    path('search/', views.search_posts, name='search'),
     path('<str:username>/', views.profile, name='profile'),
     path('<str:username>/<int:post_id>/', views.post_view, name='post'),
     path('<str:username>/<int:post_id>/edit/',
          views.post_edit, name='post_edit'),
     path('<str:username>/<int:post_id>/comment/',
          views.add_comment, name="add_comment"),
+    path('<str:username>/<int:post_id>/comments/',
+         views.post_comments, name='comments'),
     path('<str:username>/follow/',
          views.profile_follow, name='profile_follow'),
     path('<str:username>/unfollow/',
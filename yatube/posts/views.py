@@ -1,79 +1,194 @@
 from django.contrib.auth import get_user_model
 from django.contrib.auth.decorators import login_required
-from django.core.paginator import Paginator
+from django.conf import settings
+from django.http import Http404, JsonResponse
 from django.shortcuts import get_object_or_404, redirect, render
-from django.views.decorators.cache import cache_page
+from django.template.loader import render_to_string
 
+from . import (caching, counters, feed, graph, recommendations, search,
+               threads, thumbnails)
+from .limits import idempotent, rate_limit
 from .forms import PostForm, CommentForm
 from .models import Group, Post, Follow
+from .paginators import CachedCountPaginator, CursorPaginator
 
 User = get_user_model()
 
+# Поля, которые нужны карточке записи в includes/post_item.html.
+POST_CARD_FIELDS = (
+    'id', 'text', 'pub_date', 'image', 'thumbnails', 'comment_count',
+    'author__username', 'group__slug', 'group__title',
+)
+
+
+def post_cards(post_list):
+    """Выборка записей для ленты без дополнительных запросов на карточку."""
+    return post_list.select_related('author', 'group').only(
+        *POST_CARD_FIELDS)
+
+
+def numbered_pages(request):
+    return ('page' in request.GET
+            or settings.POSTS_PAGINATION == 'numbered')
+
 
 def page_paginator(request, post_list):
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    return page
+    if numbered_pages(request):
+        paginator = CachedCountPaginator(post_list, settings.POSTS_PER_PAGE)
+        return paginator.get_page(request.GET.get('page'))
+    paginator = CursorPaginator(post_list, settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+# Части страниц для чтения. Их собирают и эти представления, и
+# асинхронные версии страниц (posts/async_views.py), которые получают
+# независимые части одновременно.
+
+def index_page(request):
+    return page_paginator(request, post_cards(Post.objects.all()))
+
+
+def group_page(request, group):
+    return page_paginator(request, post_cards(group.posts.all()))
+
+
+def profile_author(username):
+    author = get_object_or_404(User.objects.select_related('stats'),
+                               username=username)
+    caching.remember_author(author)
+    return author
+
+
+def author_page(request, author):
+    return page_paginator(request, post_cards(author.posts.all()))
+
+
+def profile_context(author, page, following, stats):
+    return {'author': author, 'page': page, 'stats': stats,
+            'post_count': stats.posts_count,
+            'paginator': page.paginator, 'following': following}
+
+
+def page_post(username, post_id):
+    post = get_object_or_404(
+        Post.objects.select_related('author__stats', 'group'),
+        author__username=username, id=post_id)
+    caching.remember_author(post.author)
+    return post
+
+
+def post_comment_page(request, post):
+    return threads.CommentPage(post.comments.all(),
+                               request.GET.get('comments'))
+
+
+def post_context(request, post, stats, comments):
+    reply = request.GET.get('reply', '')
+    return {'post_count': stats.posts_count,
+            'stats': stats,
+            'post': post,
+            'comments': comments,
+            'author': post.author,
+            'edit': post.author == request.user,
+            'form': CommentForm(),
+            'reply': int(reply) if reply.isdigit() else None}
+
+
+def follow_page(request):
+    if numbered_pages(request):
+        return page_paginator(
+            request, post_cards(feed.follow_feed(request.user)))
+    paginator = feed.FeedPaginator(
+        request.user, post_cards(Post.objects.all()),
+        settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
+
+
+def group_scopes(request, slug):
+    return [caching.group_scope(slug)]
 
 
-@cache_page(20, key_prefix='index_page')
+def profile_scopes(request, username):
+    return [caching.author_scope_by_name(username)]
+
+
+def post_page_scopes(request, username, post_id):
+    return [caching.author_scope_by_name(username),
+            caching.post_scope(post_id)]
+
+
+@caching.cache_page_by_generation(lambda request: [caching.GLOBAL])
 def index(request):
-    post_list = Post.objects.select_related('group').all()
-    return render(request,
-                  'index.html',
-                  {'page': page_paginator(request, post_list)}
-                  )
+    return render(request, 'index.html', {'page': index_page(request)})
 
 
+@caching.cache_page_by_generation(group_scopes)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    post_list = group.posts.all()
-    return render(request,
-                  'group.html',
-                  {'group': group,
-                   'page': page_paginator(request, post_list)}
-                  )
+    return render(request, 'group.html',
+                  {'group': group, 'page': group_page(request, group)})
+
+
+def search_posts(request):
+    query = request.GET.get('q', '').strip()
+    posts, next_cursor = search.search_posts(
+        query, request.GET.get('cursor'), settings.POSTS_PER_PAGE)
+    return render(request, 'search.html',
+                  {'query': query, 'posts': posts,
+                   'next_cursor': next_cursor})
 
 
 @login_required
+@idempotent
+@rate_limit('new_post')
 def new_post(request):
-    form = PostForm(request.POST or None)
+    form = PostForm(request.POST or None, files=request.FILES or None)
     if form.is_valid():
         post = form.save(commit=False)
         post.author = request.user
         post.save()
+        thumbnails.enqueue(post)
         return redirect('posts:index')
     return render(request, 'new.html', {'form': form})
 
 
-def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    edit = author == request.user
-    post_list = author.posts.all()
-    post_count = post_list.count()
-    context = {'post_count': post_count,
-               'author': author,
-               'page': page_paginator(request, post_list),
-               'edit': edit}
-    return render(request, 'profile.html', context)
-
-
+@caching.cache_page_by_generation(post_page_scopes)
 def post_view(request, username, post_id):
-    post = get_object_or_404(Post, author__username=username, id=post_id)
-    author = post.author
-    edit = author == request.user
-    post_count = author.posts.count()
-    form = CommentForm(request.POST or None)
-
-    context = {'post_count': post_count,
-               'post': post,
-               'author': author,
-               'edit': edit,
-               'form': form}
+    post = page_post(username, post_id)
+    context = post_context(request, post, counters.stats_for(post.author),
+                           post_comment_page(request, post))
     return render(request, 'post.html', context)
 
 
+@caching.cache_page_by_generation(post_page_scopes)
+def post_comments(request, username, post_id):
+    """
+    Следующая порция комментариев для кнопки «Ещё» в JSON.
+
+    ``?cursor=`` продолжает ленту комментариев, ``?thread=<id>``
+    ограничивает её веткой одного комментария.
+    """
+    post = get_object_or_404(
+        Post.objects.select_related('author').only('id', 'author__username'),
+        author__username=username, id=post_id)
+    caching.remember_author(post.author)
+    comments = post.comments.all()
+    thread = request.GET.get('thread')
+    if thread is not None:
+        if not thread.isdigit():
+            raise Http404
+        root = get_object_or_404(comments.only('path'), pk=thread)
+        comments = threads.subtree(comments, root.path)
+    page = threads.CommentPage(comments, request.GET.get('cursor'))
+    html = render_to_string('includes/comment_list.html',
+                            {'post': post, 'comments': page}, request)
+    return JsonResponse({
+        'comments': [threads.serialize(comment) for comment in page],
+        'next': page.next_cursor,
+        'html': html,
+    })
+
+
 @login_required
 def post_edit(request, username, post_id):
     post = get_object_or_404(Post, author__username=username, id=post_id)
@@ -87,7 +202,16 @@ def post_edit(request, username, post_id):
                     instance=post)
 
     if form.is_valid():
-        form.save()
+        post = form.save(commit=False)
+        # Счётчик комментариев и миниатюры могли измениться после
+        # загрузки записи: сохраняем только поля формы.
+        fields = ['text', 'group', 'image', 'image_hash']
+        if 'image' in form.changed_data:
+            post.thumbnails = ''
+            fields.append('thumbnails')
+        post.save(update_fields=fields)
+        if 'image' in form.changed_data:
+            thumbnails.enqueue(post)
         return redirect('posts:post',
                         username=request.user.username,
                         post_id=post_id)
@@ -112,13 +236,20 @@ def server_error(request):
 
 
 @login_required
+@idempotent
+@rate_limit('add_comment')
 def add_comment(request, username, post_id):
     post = get_object_or_404(Post, id=post_id)
     form = CommentForm(request.POST or None)
+    parent = request.POST.get('parent', '')
 
     if form.is_valid():
         form.instance.author = request.user
         form.instance.post = post
+        if parent.isdigit():
+            # Отвечать можно только на комментарии той же записи.
+            form.instance.parent = post.comments.only(
+                'id', 'path', 'post_id').filter(pk=parent).first()
         form.save()
     return redirect('posts:post',
                     username=username,
@@ -127,12 +258,20 @@ def add_comment(request, username, post_id):
 
 @login_required
 def follow_index(request):
-    post_list = Post.objects.filter(author__following__user=request.user)
-    paginator = Paginator(post_list, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
+    page = follow_page(request)
     return render(request, 'follow.html',
-                  {'page': page, 'paginator': paginator})
+                  {'page': page, 'paginator': page.paginator})
+
+
+@login_required
+@caching.cache_page_by_generation(lambda request: [
+    recommendations.RECOMMENDATIONS_SCOPE,
+    caching.author_scope(request.user.pk)])
+def follow_recommendations(request):
+    """Фрагмент «На кого подписаться» для follow.html и profile.html."""
+    return render(request, 'includes/recommendation_list.html',
+                  {'recommendations':
+                   recommendations.for_user(request.user.pk)})
 
 
 @login_required
@@ -152,17 +291,11 @@ def profile_unfollow(request, username):
     return redirect('posts:profile', username)
 
 
+@caching.cache_page_by_generation(profile_scopes)
 def profile(request, username):
-    user = request.user
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.all()
-    paginator = Paginator(posts, 10)
-    page_number = request.GET.get('page')
-    page = paginator.get_page(page_number)
-    following = Follow.objects.filter(user__username=user,
-                                      author=author).exists()
-    return render(
-        request, 'profile.html',
-        {'author': author, 'page': page,
-         'paginator': paginator, 'following': following}
-    )
+    author = profile_author(username)
+    context = profile_context(
+        author, author_page(request, author),
+        graph.is_following(request.user.pk, author.pk),
+        counters.stats_for(author))
+    return render(request, 'profile.html', context)
@@ -0,0 +1,37 @@
+"""
+ASGI config for yatube project.
+
+Живые ленты (SSE, posts/live.py) обслуживаются прямо в цикле событий,
+страницы для чтения — асинхронными представлениями
+(posts/async_views.py), остальные адреса — обычным WSGI-приложением в
+пуле потоков. Все они работают в одном процессе, поэтому события
+сохранения записей доходят до подписчиков. Запуск любым
+ASGI-сервером, например::
+
+    uvicorn yatube.asgi:application
+"""
+
+import os
+
+from django.core.wsgi import get_wsgi_application
+
+from yatube import streaming, template_cache
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
+
+wsgi_application = get_wsgi_application()
+
+template_cache.warm_up()
+
+from posts import async_views, live, thumbnails  # noqa: E402
+
+application = streaming.Router(
+    {
+        '/events/': live.index_stream,
+        '/events/follow/': live.follow_stream,
+    },
+    default=streaming.AsyncViews(
+        async_views.VIEWS,
+        fallback=streaming.WSGIAdapter(wsgi_application)),
+    on_startup=[thumbnails.start_workers],
+)
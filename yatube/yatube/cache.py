@@ -0,0 +1,417 @@
+"""
+Общий кэш для нескольких процессов.
+
+SQLiteCache — локальная замена общего кэш-сервера: все процессы на
+машине работают с одним файлом SQLite через пул соединений, а
+``get_many`` и ``set_many`` выполняются одним запросом. Как и
+DatabaseCache, он раз в CULL_INTERVAL записей удаляет истёкшие ключи,
+а если их всё равно больше MAX_ENTRIES — ещё 1/CULL_FREQUENCY ключей,
+истекающих раньше всех.
+
+TwoTierCache ставит перед общим хранилищем (SQLiteCache, memcached
+или любым другим кэшем Django) небольшой LRU-кэш внутри процесса.
+Ключи с «изменяемыми» префиксами (счётчики поколений, лимиты) всегда
+читаются из общего хранилища, чтобы инвалидация доходила до всех
+процессов сразу.
+"""
+import itertools
+import pickle
+import queue
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+from . import metrics
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+_local_stores = {}
+_local_stores_lock = threading.Lock()
+
+_MISSING = object()
+
+
+class ConnectionPool:
+    """Пул соединений SQLite, общий для всех потоков процесса."""
+
+    def __init__(self, location, size):
+        self.location = location
+        self.connections = queue.LifoQueue(maxsize=size)
+        self.schema_ready = False
+        self.lock = threading.Lock()
+        self.writes = itertools.count(1)
+
+    def _connect(self):
+        connection = sqlite3.connect(
+            self.location, timeout=30, isolation_level=None,
+            check_same_thread=False)
+        connection.execute('PRAGMA journal_mode=WAL')
+        connection.execute('PRAGMA synchronous=NORMAL')
+        with self.lock:
+            if not self.schema_ready:
+                connection.execute(
+                    'CREATE TABLE IF NOT EXISTS cache ('
+                    'key TEXT PRIMARY KEY, value BLOB NOT NULL, '
+                    'expires REAL)')
+                connection.execute(
+                    'CREATE INDEX IF NOT EXISTS cache_expires '
+                    'ON cache (expires)')
+                self.schema_ready = True
+        return connection
+
+    @contextmanager
+    def connection(self):
+        try:
+            connection = self.connections.get_nowait()
+        except queue.Empty:
+            connection = self._connect()
+        try:
+            yield connection
+        finally:
+            try:
+                self.connections.put_nowait(connection)
+            except queue.Full:
+                connection.close()
+
+
+def _pool(location, size):
+    with _pools_lock:
+        if location not in _pools:
+            _pools[location] = ConnectionPool(location, size)
+        return _pools[location]
+
+
+class SQLiteCache(BaseCache):
+    """Кэш в файле SQLite, разделяемый процессами одной машины."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.pool = _pool(location, options.get('POOL_SIZE', 8))
+        self.cull_interval = options.get('CULL_INTERVAL', 100)
+
+    def _expiry(self, timeout):
+        # Для базового класса это уже абсолютное время истечения.
+        return self.get_backend_timeout(timeout)
+
+    @staticmethod
+    def _dump(value):
+        return pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+    def _keys(self, keys, version):
+        made = {}
+        for key in keys:
+            made_key = self.make_key(key, version=version)
+            self.validate_key(made_key)
+            made[made_key] = key
+        return made
+
+    def get(self, key, default=None, version=None):
+        return self.get_many([key], version=version).get(key, default)
+
+    def get_many(self, keys, version=None):
+        made = self._keys(keys, version)
+        if not made:
+            return {}
+        placeholders = ','.join('?' * len(made))
+        with self.pool.connection() as connection:
+            rows = connection.execute(
+                f'SELECT key, value FROM cache WHERE key IN ({placeholders}) '
+                'AND (expires IS NULL OR expires > ?)',
+                [*made, time.time()]).fetchall()
+        return {made[key]: pickle.loads(value) for key, value in rows}
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.set_many({key: value}, timeout, version)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        expires = self._expiry(timeout)
+        rows = [(made_key, self._dump(data[key]), expires)
+                for made_key, key in self._keys(data, version).items()]
+        with self.pool.connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.executemany(
+                    'INSERT OR REPLACE INTO cache (key, value, expires) '
+                    'VALUES (?, ?, ?)', rows)
+                self._maybe_cull(connection)
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        return []
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        with self.pool.connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                connection.execute(
+                    'DELETE FROM cache WHERE key = ? AND expires <= ?',
+                    (key, now))
+                cursor = connection.execute(
+                    'INSERT OR IGNORE INTO cache (key, value, expires) '
+                    'VALUES (?, ?, ?)',
+                    (key, self._dump(value), self._expiry(timeout)))
+                self._maybe_cull(connection)
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        return cursor.rowcount == 1
+
+    def incr(self, key, delta=1, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        with self.pool.connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                row = connection.execute(
+                    'SELECT value FROM cache WHERE key = ? '
+                    'AND (expires IS NULL OR expires > ?)',
+                    (key, time.time())).fetchone()
+                if row is None:
+                    raise ValueError(f"Key '{key}' not found")
+                value = pickle.loads(row[0]) + delta
+                connection.execute(
+                    'UPDATE cache SET value = ? WHERE key = ?',
+                    (self._dump(value), key))
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+        return value
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        with self.pool.connection() as connection:
+            cursor = connection.execute(
+                'UPDATE cache SET expires = ? WHERE key = ?',
+                (self._expiry(timeout), key))
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        self.delete_many([key], version=version)
+
+    def delete_many(self, keys, version=None):
+        made = list(self._keys(keys, version))
+        if not made:
+            return
+        placeholders = ','.join('?' * len(made))
+        with self.pool.connection() as connection:
+            connection.execute(
+                f'DELETE FROM cache WHERE key IN ({placeholders})', made)
+
+    def has_key(self, key, version=None):
+        return key in self.get_many([key], version=version)
+
+    def clear(self):
+        with self.pool.connection() as connection:
+            connection.execute('DELETE FROM cache')
+
+    def _maybe_cull(self, connection):
+        if next(self.pool.writes) % self.cull_interval == 0:
+            self._cull(connection)
+
+    def _cull(self, connection):
+        connection.execute(
+            'DELETE FROM cache WHERE expires <= ?', (time.time(),))
+        count, = connection.execute('SELECT COUNT(*) FROM cache').fetchone()
+        if count <= self._max_entries:
+            return
+        if self._cull_frequency == 0:
+            connection.execute('DELETE FROM cache')
+            return
+        # Ключи без срока (счётчики поколений) удаляются последними.
+        connection.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+            'ORDER BY expires IS NULL, expires LIMIT ?)',
+            (count // self._cull_frequency,))
+
+    def cull(self):
+        """Удаляет истёкшие и лишние ключи сейчас, не дожидаясь записи."""
+        with self.pool.connection() as connection:
+            connection.execute('BEGIN IMMEDIATE')
+            try:
+                self._cull(connection)
+            except Exception:
+                connection.execute('ROLLBACK')
+                raise
+            connection.execute('COMMIT')
+
+
+class LocalStore:
+    """
+    LRU-словарь процесса с ограничением числа записей и срока.
+
+    Значения хранятся сериализованными, как в LocMemCache: иначе
+    middleware, меняющее закэшированный ответ, испортило бы его для
+    следующих запросов.
+    """
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.data = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                return _MISSING
+            expires, value = item
+            if expires <= time.monotonic():
+                del self.data[key]
+                return _MISSING
+            self.data.move_to_end(key)
+        return pickle.loads(value)
+
+    def set(self, key, value, timeout):
+        value = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self.data[key] = (time.monotonic() + timeout, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.max_entries:
+                self.data.popitem(last=False)
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+
+
+def _local_store(name, max_entries):
+    with _local_stores_lock:
+        if name not in _local_stores:
+            _local_stores[name] = LocalStore(max_entries)
+        return _local_stores[name]
+
+
+class TwoTierCache(BaseCache):
+    """LRU-кэш процесса перед общим хранилищем."""
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.shared_alias = options.get('SHARED', 'shared')
+        self.local_timeout = options.get('LOCAL_TIMEOUT', 60)
+        self.volatile_prefixes = tuple(options.get('VOLATILE_PREFIXES', ()))
+        self.local = _local_store(location or self.shared_alias,
+                                  options.get('LOCAL_MAX_ENTRIES', 1000))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def _local_key(self, key, version):
+        if key.startswith(self.volatile_prefixes):
+            return None
+        return self.make_key(key, version=version)
+
+    def _remember(self, local_key, value, timeout=DEFAULT_TIMEOUT):
+        if local_key is None:
+            return
+        expires = self.get_backend_timeout(timeout)
+        timeout = None if expires is None else expires - time.time()
+        if timeout is None or timeout > self.local_timeout:
+            timeout = self.local_timeout
+        if timeout > 0:
+            self.local.set(local_key, value, timeout)
+
+    def get(self, key, default=None, version=None):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            value = self.local.get(local_key)
+            if value is not _MISSING:
+                metrics.record_cache(1, 0)
+                return value
+        value = self.shared.get(key, _MISSING, version=version)
+        if value is _MISSING:
+            metrics.record_cache(0, 1)
+            return default
+        metrics.record_cache(1, 0)
+        self._remember(local_key, value)
+        return value
+
+    def get_many(self, keys, version=None):
+        found = {}
+        remote = []
+        for key in keys:
+            local_key = self._local_key(key, version)
+            value = (_MISSING if local_key is None
+                     else self.local.get(local_key))
+            if value is _MISSING:
+                remote.append(key)
+            else:
+                found[key] = value
+        if remote:
+            fetched = self.shared.get_many(remote, version=version)
+            for key, value in fetched.items():
+                self._remember(self._local_key(key, version), value)
+            found.update(fetched)
+        metrics.record_cache(len(found), len(keys) - len(found))
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.shared.set(key, value, timeout, version=version)
+        self._remember(self._local_key(key, version), value, timeout)
+
+    def set_many(self, data, timeout=DEFAULT_TIMEOUT, version=None):
+        failed = self.shared.set_many(data, timeout, version=version) or []
+        for key, value in data.items():
+            if key not in failed:
+                self._remember(self._local_key(key, version), value, timeout)
+        return failed
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        added = self.shared.add(key, value, timeout, version=version)
+        if added:
+            self._remember(self._local_key(key, version), value, timeout)
+        return added
+
+    def _forget(self, key, version):
+        local_key = self._local_key(key, version)
+        if local_key is not None:
+            self.local.delete(local_key)
+
+    def incr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        return self.shared.incr(key, delta, version=version)
+
+    def decr(self, key, delta=1, version=None):
+        self._forget(key, version)
+        return self.shared.decr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        return self.shared.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._forget(key, version)
+        self.shared.delete(key, version=version)
+
+    def delete_many(self, keys, version=None):
+        for key in keys:
+            self._forget(key, version)
+        self.shared.delete_many(keys, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self._local_key(key, version)
+        if (local_key is not None
+                and self.local.get(local_key) is not _MISSING):
+            return True
+        return self.shared.has_key(key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        self.shared.clear()
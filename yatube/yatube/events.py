@@ -0,0 +1,125 @@
+"""
+Издатель-подписчик внутри процесса для живых лент.
+
+Публиковать можно из любого потока (сигналы моделей выполняются в
+потоках сервера), подписчики живут в цикле событий asyncio. Событие
+передаётся в каждый цикл одним call_soon_threadsafe, а по очередям
+подписчиков раскладывается уже внутри цикла, так что публикация не
+дорожает с числом подписчиков.
+
+Очередь подписчика ограничена SSE_QUEUE_SIZE: клиент, который не
+успевает читать, отключается и переподключается с Last-Event-ID.
+Последние SSE_REPLAY событий хранятся для такого переподключения.
+
+События видят только подписчики того же процесса.
+"""
+import asyncio
+import itertools
+import json
+import threading
+from collections import deque
+
+from django.conf import settings
+
+# Подписчик отстал и должен быть отключён.
+OVERFLOW = object()
+
+
+class Event:
+    __slots__ = ('id', 'name', 'data', 'payload')
+
+    def __init__(self, id, name, data):
+        self.id = id
+        self.name = name
+        self.data = data
+        self.payload = (f'id: {id}\nevent: {name}\n'
+                        f'data: {json.dumps(data)}\n\n').encode()
+
+
+class Subscription:
+    def __init__(self, broker, loop, accept):
+        self.broker = broker
+        self.loop = loop
+        self.accept = accept
+        self.queue = asyncio.Queue(settings.SSE_QUEUE_SIZE)
+
+    def deliver(self, event):
+        if not self.accept(event):
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(OVERFLOW)
+
+    def close(self):
+        self.broker.unsubscribe(self)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class Broker:
+    def __init__(self, replay=None):
+        self.lock = threading.Lock()
+        self.loops = {}
+        self.ids = itertools.count(1)
+        self.recent = deque(maxlen=replay or settings.SSE_REPLAY)
+
+    def subscribe(self, accept=lambda event: True, last_id=None):
+        """
+        Подписка для текущего цикла событий; ``accept`` отбирает события.
+
+        С ``last_id`` в очередь сразу попадают пропущенные события, если
+        они ещё хранятся.
+        """
+        loop = asyncio.get_running_loop()
+        subscription = Subscription(self, loop, accept)
+        with self.lock:
+            self.loops.setdefault(loop, set()).add(subscription)
+            missed = [event for event in self.recent
+                      if last_id is not None and event.id > last_id]
+        for event in missed:
+            subscription.deliver(event)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self.lock:
+            subscriptions = self.loops.get(subscription.loop)
+            if subscriptions is None:
+                return
+            subscriptions.discard(subscription)
+            if not subscriptions:
+                del self.loops[subscription.loop]
+
+    @property
+    def subscribers(self):
+        with self.lock:
+            return sum(len(items) for items in self.loops.values())
+
+    def publish(self, name, data):
+        with self.lock:
+            event = Event(next(self.ids), name, data)
+            self.recent.append(event)
+            loops = list(self.loops)
+        for loop in loops:
+            try:
+                loop.call_soon_threadsafe(self._fan_out, loop, event)
+            except RuntimeError:
+                # Цикл уже закрыт.
+                with self.lock:
+                    self.loops.pop(loop, None)
+        return event
+
+    def _fan_out(self, loop, event):
+        with self.lock:
+            subscriptions = list(self.loops.get(loop, ()))
+        for subscription in subscriptions:
+            subscription.deliver(event)
+
+
+broker = Broker()
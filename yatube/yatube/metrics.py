@@ -0,0 +1,270 @@
+"""
+Метрики запросов для работающего сервера.
+
+MetricsMiddleware для каждого запроса считает время ответа, число и
+время запросов к базе, попадания и промахи кэша, время отрисовки
+шаблонов и размер ответа, а затем добавляет их к счётчикам того
+маршрута, который обработал запрос (``posts:index``, ``posts:post``).
+Счётчики живут в памяти процесса и отдаются в текстовом формате
+Prometheus по адресу ``/-/metrics/`` только адресам из
+METRICS_ALLOWED_IPS; каждый процесс сервера отдаёт свои.
+
+Подробный профиль (cProfile) снимается для доли запросов
+PROFILE_SAMPLE_RATE или по заголовку ``X-Profile`` со значением
+PROFILE_TOKEN и сохраняется в PROFILE_DIR.
+"""
+import cProfile
+import os
+import random
+import threading
+import time
+from bisect import bisect_left
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+from django.db import connections
+from django.http import Http404, HttpResponse
+from django.template.backends import django as django_backend
+
+# Верхние границы корзин гистограммы времени ответа, секунды.
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+UNRESOLVED = 'unresolved'
+
+_local = threading.local()
+
+# Замеры запроса, который обрабатывается асинхронно (yatube/streaming.py):
+# его код с базой выполняется в разных потоках пула.
+async_sample = ContextVar('async_sample', default=None)
+
+
+class Sample:
+    """Замеры одного запроса."""
+
+    __slots__ = ('db_queries', 'db_seconds', 'cache_hits', 'cache_misses',
+                 'template_seconds', 'rendering')
+
+    def __init__(self):
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_seconds = 0.0
+        self.rendering = False
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_queries += 1
+            self.db_seconds += time.perf_counter() - started
+
+    def add(self, other):
+        self.db_queries += other.db_queries
+        self.db_seconds += other.db_seconds
+        self.cache_hits += other.cache_hits
+        self.cache_misses += other.cache_misses
+        self.template_seconds += other.template_seconds
+
+
+class ViewStats:
+    __slots__ = ('statuses', 'buckets', 'seconds', 'db_queries',
+                 'db_seconds', 'cache_hits', 'cache_misses',
+                 'template_seconds', 'response_bytes')
+
+    def __init__(self):
+        self.statuses = {}
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.seconds = 0.0
+        self.db_queries = 0
+        self.db_seconds = 0.0
+        self.cache_hits = 0
+        self.cache_misses = 0
+        self.template_seconds = 0.0
+        self.response_bytes = 0
+
+
+class Registry:
+    """Счётчики по маршрутам, накопленные процессом."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.views = {}
+
+    def reset(self):
+        with self.lock:
+            self.views = {}
+
+    def record(self, view, status, seconds, sample, size):
+        with self.lock:
+            stats = self.views.get(view)
+            if stats is None:
+                stats = self.views[view] = ViewStats()
+            stats.statuses[status] = stats.statuses.get(status, 0) + 1
+            stats.buckets[bisect_left(BUCKETS, seconds)] += 1
+            stats.seconds += seconds
+            stats.db_queries += sample.db_queries
+            stats.db_seconds += sample.db_seconds
+            stats.cache_hits += sample.cache_hits
+            stats.cache_misses += sample.cache_misses
+            stats.template_seconds += sample.template_seconds
+            stats.response_bytes += size
+
+    def render(self):
+        """Текстовый формат Prometheus."""
+        with self.lock:
+            views = sorted(self.views.items())
+            lines = [
+                '# HELP yatube_requests_total Обработанные запросы.',
+                '# TYPE yatube_requests_total counter',
+            ]
+            for view, stats in views:
+                for status, number in sorted(stats.statuses.items()):
+                    lines.append(
+                        f'yatube_requests_total{{view="{view}",'
+                        f'status="{status}"}} {number}')
+            lines += [
+                '# HELP yatube_request_duration_seconds Время ответа.',
+                '# TYPE yatube_request_duration_seconds histogram',
+            ]
+            for view, stats in views:
+                total = 0
+                bounds = [*map(str, BUCKETS), '+Inf']
+                for bound, number in zip(bounds, stats.buckets):
+                    total += number
+                    lines.append(
+                        f'yatube_request_duration_seconds_bucket'
+                        f'{{view="{view}",le="{bound}"}} {total}')
+                lines.append(f'yatube_request_duration_seconds_sum'
+                             f'{{view="{view}"}} {stats.seconds:.6f}')
+                lines.append(f'yatube_request_duration_seconds_count'
+                             f'{{view="{view}"}} {total}')
+            for name, kind, description in COUNTERS:
+                lines.append(f'# HELP yatube_{name} {description}')
+                lines.append(f'# TYPE yatube_{name} counter')
+                for view, stats in views:
+                    value = getattr(stats, kind)
+                    if isinstance(value, float):
+                        value = f'{value:.6f}'
+                    lines.append(f'yatube_{name}{{view="{view}"}} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+# Имя метрики, поле ViewStats, описание.
+COUNTERS = (
+    ('db_queries_total', 'db_queries', 'Запросы к базе.'),
+    ('db_query_seconds_total', 'db_seconds', 'Время запросов к базе.'),
+    ('cache_hits_total', 'cache_hits', 'Попадания в кэш.'),
+    ('cache_misses_total', 'cache_misses', 'Промахи кэша.'),
+    ('template_render_seconds_total', 'template_seconds',
+     'Время отрисовки шаблонов.'),
+    ('response_bytes_total', 'response_bytes', 'Размер ответов.'),
+)
+
+registry = Registry()
+
+
+def record_cache(hits, misses):
+    """Вызывается кэшем при чтении; вне запроса ничего не делает."""
+    sample = getattr(_local, 'sample', None)
+    if sample is not None:
+        sample.cache_hits += hits
+        sample.cache_misses += misses
+
+
+def _timed_render(render):
+    @wraps(render)
+    def wrapper(self, *args, **kwargs):
+        sample = getattr(_local, 'sample', None)
+        # Вложенные шаблоны уже учтены во времени внешнего.
+        if sample is None or sample.rendering:
+            return render(self, *args, **kwargs)
+        sample.rendering = True
+        started = time.perf_counter()
+        try:
+            return render(self, *args, **kwargs)
+        finally:
+            sample.template_seconds += time.perf_counter() - started
+            sample.rendering = False
+
+    wrapper.timed = True
+    return wrapper
+
+
+def _install_template_timer():
+    template = django_backend.Template
+    if not getattr(template.render, 'timed', False):
+        template.render = _timed_render(template.render)
+
+
+@contextmanager
+def sampling(sample):
+    """Учитывает в ``sample`` всё, что текущий поток делает внутри."""
+    _local.sample = sample
+    try:
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(sample))
+            yield sample
+    finally:
+        _local.sample = None
+
+
+def _profile_requested(request):
+    token = settings.PROFILE_TOKEN
+    if token and request.META.get('HTTP_X_PROFILE') == token:
+        return True
+    rate = settings.PROFILE_SAMPLE_RATE
+    return rate > 0 and random.random() < rate
+
+
+def _save_profile(profiler, view):
+    os.makedirs(settings.PROFILE_DIR, exist_ok=True)
+    name = '{}-{:.6f}.prof'.format(view.replace(':', '.'), time.time())
+    path = os.path.join(settings.PROFILE_DIR, name)
+    profiler.dump_stats(path)
+    return name
+
+
+class MetricsMiddleware:
+    """Должно стоять первым в MIDDLEWARE, чтобы мерить весь запрос."""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        _install_template_timer()
+
+    def __call__(self, request):
+        sample = Sample()
+        profiler = cProfile.Profile() if _profile_requested(request) else None
+        started = time.perf_counter()
+        with sampling(sample):
+            if profiler is None:
+                response = self.get_response(request)
+            else:
+                response = profiler.runcall(self.get_response, request)
+        seconds = time.perf_counter() - started
+
+        match = getattr(request, 'resolver_match', None)
+        view = match.view_name if match else UNRESOLVED
+        record(view, response, seconds, sample)
+        if profiler is not None:
+            response['X-Profile'] = _save_profile(profiler, view)
+        return response
+
+
+def record(view, response, seconds, sample):
+    if response.streaming:
+        size = int(response.get('Content-Length') or 0)
+    else:
+        size = len(response.content)
+    registry.record(view, response.status_code, seconds, sample, size)
+
+
+def metrics_view(request):
+    if request.META.get('REMOTE_ADDR') not in settings.METRICS_ALLOWED_IPS:
+        raise Http404
+    return HttpResponse(registry.render(),
+                        content_type='text/plain; version=0.0.4')
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/2.2/ref/settings/
 """
 
 import os
+from importlib import import_module
+from importlib.util import find_spec
 
 # Build paths inside the project like this: os.path.join(BASE_DIR, ...)
 BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -23,7 +25,7 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 SECRET_KEY = 'wl538)m%76xp$kf6hiiaalf96$m+grzsmmuptwi-^v!a$a$b)k'
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+DEBUG = os.environ.get('YATUBE_DEBUG', '1') == '1'
 
 ALLOWED_HOSTS = [
     'localhost',
@@ -39,6 +41,7 @@ INSTALLED_APPS = [
     'users',
     'posts',
     'about',
+    'api',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -46,20 +49,29 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'sorl.thumbnail',
-    'debug_toolbar',
+    'benchmarks',
 ]
 
 MIDDLEWARE = [
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
+    'yatube.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'yatube.sqlite.replica.ReadOnlyViewsMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
+# debug_toolbar замедляет каждый запрос, поэтому подключается только
+# при отладке и если установлен.
+DEBUG_TOOLBAR = DEBUG and find_spec('debug_toolbar') is not None
+
+if DEBUG_TOOLBAR:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.insert(1, 'debug_toolbar.middleware.DebugToolbarMiddleware')
+
 ROOT_URLCONF = 'yatube.urls'
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, "templates")
@@ -80,19 +92,80 @@ TEMPLATES = [
     },
 ]
 
+# Рабочий режим шаблонов: каждый шаблон разбирается один раз за жизнь
+# процесса, а при запуске сервера все шаблоны проекта компилируются
+# заранее (см. yatube/template_cache.py). В разработке выключен, чтобы
+# правки шаблонов подхватывались без перезапуска.
+TEMPLATE_CACHE = os.environ.get(
+    'YATUBE_TEMPLATE_CACHE', '0' if DEBUG else '1') == '1'
+
+if TEMPLATE_CACHE:
+    TEMPLATES[0]['APP_DIRS'] = False
+    TEMPLATES[0]['OPTIONS']['loaders'] = [
+        ('django.template.loaders.cached.Loader', [
+            'django.template.loaders.filesystem.Loader',
+            'django.template.loaders.app_directories.Loader',
+        ]),
+    ]
+
 WSGI_APPLICATION = 'yatube.wsgi.application'
 
 
 # Database
 # https://docs.djangoproject.com/en/2.2/ref/settings/#databases
 
+# См. yatube/sqlite: WAL, настройки соединений, очередь писателей и
+# реплика только для чтения (тот же файл) для страниц READ_ONLY_VIEWS.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # В режиме WAL NORMAL не теряет согласованность, лишь последние
+    # транзакции при отключении питания.
+    'synchronous': 'NORMAL',
+    'mmap_size': 256 * 1024 * 1024,
+    # Отрицательное значение — в килобайтах.
+    'cache_size': -64 * 1024,
+    'busy_timeout': 5000,
+    'temp_store': 'MEMORY',
+}
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
+        'ENGINE': 'yatube.sqlite',
+        'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': SQLITE_PRAGMAS,
+            'transaction_mode': 'IMMEDIATE',
+        },
+    },
+    'replica': {
+        'ENGINE': 'yatube.sqlite',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        'CONN_MAX_AGE': 600,
+        'OPTIONS': {
+            'pragmas': {**SQLITE_PRAGMAS, 'query_only': 'ON'},
+        },
+        'TEST': {'MIRROR': 'default'},
+    },
 }
 
+DATABASE_ROUTERS = ['yatube.sqlite.replica.ReplicaRouter']
+
+READ_ONLY_VIEWS = [
+    'posts:index',
+    'posts:group_posts',
+    'posts:profile',
+    'posts:post',
+    'posts:comments',
+    'posts:recommendations',
+    'api:index',
+    'api:group_posts',
+    'api:profile',
+    'api:post',
+    'api:user',
+    'api:follow_suggestions',
+]
+
 
 # Password validation
 # https://docs.djangoproject.com/en/2.2/ref/settings/#auth-password-validators
@@ -146,11 +219,168 @@ EMAIL_BACKEND = 'django.core.mail.backends.filebased.EmailBackend'
 
 EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
+# Кэш из двух уровней: LRU в памяти процесса перед общим хранилищем.
+# По умолчанию общее хранилище — файл SQLite, один на все воркеры
+# машины: иначе поколения страниц и граф подписок расходились бы между
+# процессами. Переменные окружения задают другое хранилище, например
+# YATUBE_CACHE_BACKEND=django.core.cache.backends.memcached.MemcachedCache
+# для нескольких машин или
+# YATUBE_CACHE_BACKEND=django.core.cache.backends.locmem.LocMemCache
+# для разработки в одном процессе.
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-    }
+        'BACKEND': 'yatube.cache.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'LOCAL_MAX_ENTRIES': 1000,
+            'LOCAL_TIMEOUT': 60,
+            # Изменяемые ключи всегда читаются из общего хранилища.
+            'VOLATILE_PREFIXES': ['gen:', 'idem:', 'throttle:', 'graph:',
+                                  'feed:'],
+        },
+    },
+    'shared': {
+        'BACKEND': os.environ.get(
+            'YATUBE_CACHE_BACKEND', 'yatube.cache.SQLiteCache'),
+        'LOCATION': os.environ.get(
+            'YATUBE_CACHE_LOCATION', os.path.join(BASE_DIR, 'cache.sqlite3')),
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('YATUBE_CACHE_MAX_ENTRIES',
+                                              100000)),
+        },
+    },
 }
 INTERNAL_IPS = [
     '127.0.0.1',
 ]
+
+# Лента подписок: авторы с большим числом подписчиков
+# не раскладываются по лентам, их записи подмешиваются при чтении.
+FEED_FANOUT_MAX_FOLLOWERS = 10000
+
+FEED_BACKFILL_SIZE = 1000
+
+FEED_BATCH_SIZE = 500
+
+FEED_CELEBRITIES_CACHE_TIMEOUT = 300
+
+# Постраничная навигация: 'cursor' (по ключу pub_date, id)
+# или 'numbered' (номера страниц с приблизительным числом записей).
+POSTS_PAGINATION = 'cursor'
+
+POSTS_PER_PAGE = 10
+
+PAGINATOR_COUNT_CACHE_TIMEOUT = 60
+
+# Комментарии на странице записи и в одной подгрузке «Ещё».
+COMMENTS_PER_PAGE = 50
+
+# Страницы кэшируются до изменения их данных (см. posts/caching.py),
+# срок хранения лишь ограничивает объём кэша.
+PAGE_CACHE_TIMEOUT = 60 * 60 * 6
+
+# Отрисованные карточки записей (см. posts/fragments.py).
+POST_CARD_CACHE_TIMEOUT = 60 * 60 * 24
+
+# Размеры миниатюр, которые готовятся заранее (см. posts/thumbnails.py):
+# имя -> (геометрия sorl-thumbnail, параметры).
+THUMBNAIL_GEOMETRIES = {
+    'card': ('960x339', {'crop': 'center', 'upscale': True}),
+}
+
+# Число потоков, готовящих миниатюры внутри веб-процесса. При нуле
+# очередь разбирает только команда process_thumbnails.
+THUMBNAIL_WORKERS = int(os.environ.get('YATUBE_THUMBNAIL_WORKERS', 1))
+
+THUMBNAIL_MAX_ATTEMPTS = 5
+
+# Сколько секунд задание считается занятым обработчиком.
+THUMBNAIL_LEASE = 60
+
+# Приём картинок (см. posts/images.py): загрузки сразу пишутся на диск,
+# в хранилище попадает уменьшенный мастер.
+FILE_UPLOAD_HANDLERS = ['posts.images.BoundedUploadHandler']
+
+IMAGE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+
+IMAGE_MAX_PIXELS = 50 * 1000 * 1000
+
+IMAGE_MASTER_MAX_SIDE = 2048
+
+# Первый формат, который поддерживает установленный Pillow.
+IMAGE_MASTER_FORMATS = ['WEBP', 'JPEG']
+
+IMAGE_MASTER_QUALITY = 85
+
+# Метрики запросов и профилирование (см. yatube/metrics.py).
+METRICS_ALLOWED_IPS = INTERNAL_IPS
+
+# Запрос с заголовком X-Profile: <токен> профилируется cProfile.
+PROFILE_TOKEN = os.environ.get('YATUBE_PROFILE_TOKEN')
+
+# Доля запросов, которые профилируются без заголовка.
+PROFILE_SAMPLE_RATE = float(os.environ.get('YATUBE_PROFILE_SAMPLE_RATE', 0))
+
+PROFILE_DIR = os.path.join(BASE_DIR, 'profiles')
+
+# Адрес профиля без обхода резолвера (см. posts/links.py).
+ABSOLUTE_URL_OVERRIDES = {
+    'auth.user': lambda user: import_module('posts.links').user_url(user),
+}
+
+# Повторы и лимиты путей записи (см. posts/limits.py).
+# Повторная отправка той же формы без ключа гасится в этом окне, с.
+IDEMPOTENCY_WINDOW = 30
+
+# Сколько помнится запрос с ключом Idempotency-Key, с.
+IDEMPOTENCY_KEY_TTL = 60 * 60
+
+# Область: (маркеров, за сколько секунд ведро наполняется целиком).
+RATE_LIMITS = {
+    'new_post': (10, 10 * 60),
+    'add_comment': (20, 60),
+}
+
+# Живые ленты по SSE (см. yatube/asgi.py, yatube/events.py).
+# Пинг простаивающего соединения, с.
+SSE_HEARTBEAT = 15
+
+# Через сколько секунд клиенту переподключаться после обрыва.
+SSE_RETRY = 5
+
+# Непрочитанных событий на подписчика; отставший отключается.
+SSE_QUEUE_SIZE = 100
+
+# Последние события для переподключения с Last-Event-ID.
+SSE_REPLAY = 1000
+
+# Потоки для синхронного кода под ASGI.
+ASGI_THREADS = 32
+
+# Наибольшее тело запроса под ASGI: картинка и поля формы. На большее
+# отвечаем 413, не дочитывая.
+ASGI_MAX_BODY_SIZE = IMAGE_UPLOAD_MAX_SIZE + 3 * 1024 * 1024
+
+# Граф подписок в кэше (см. posts/graph.py).
+# Срок жизни массивов подписок, с: лечит правки, потерянные в гонках.
+FOLLOW_GRAPH_TIMEOUT = 6 * 60 * 60
+
+# Сколько авторов пользователя смотреть для подсказок «на кого
+# подписаться».
+FOLLOW_SUGGESTION_SOURCES = 100
+
+# Подсказки «на кого подписаться» (см. posts/recommendations.py).
+# Сколько подсказок на пользователя хранит build_recommendations.
+RECOMMENDATIONS_PER_USER = 20
+
+# Сколько подсказок показывать на странице.
+RECOMMENDATIONS_SHOWN = 5
+
+# Сколько похожих авторов помнить для каждого автора.
+RECOMMENDATION_NEIGHBOURS = 50
+
+# Подписок пользователя, которые учитываются в подсчёте сходства.
+RECOMMENDATION_MAX_FOLLOWING = 500
+
+# Строк в одной пачке при подсчёте через NumPy.
+RECOMMENDATION_BATCH_ROWS = 1000
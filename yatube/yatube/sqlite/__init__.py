@@ -0,0 +1,14 @@
+"""
+SQLite для работающего сервера.
+
+Движок (base.py) настраивает каждое соединение через PRAGMA из
+OPTIONS['pragmas'] — WAL, synchronous, mmap_size, cache_size,
+busy_timeout — и с OPTIONS['transaction_mode'] = 'IMMEDIATE' начинает
+пишущие транзакции с BEGIN IMMEDIATE по очереди: потоки процесса ждут
+писателя на блокировке, а не в цикле повторов SQLite, и транзакция
+не может упасть с «database is locked» при переходе от чтения к
+записи.
+
+Маршрутизатор (replica.py) отправляет чтения страниц из
+READ_ONLY_VIEWS на соединения только для чтения.
+"""
@@ -0,0 +1,67 @@
+import threading
+
+from django.db.backends.sqlite3 import base
+
+_writer_locks = {}
+_writer_locks_lock = threading.Lock()
+
+
+def writer_lock(name):
+    """Блокировка писателя, общая для всех соединений процесса с файлом."""
+    with _writer_locks_lock:
+        if name not in _writer_locks:
+            _writer_locks[name] = threading.Lock()
+        return _writer_locks[name]
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    holds_writer_lock = False
+
+    @property
+    def options(self):
+        return self.settings_dict['OPTIONS']
+
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        connection = super().get_new_connection(conn_params)
+        for name, value in self.options.get('pragmas', {}).items():
+            connection.execute(f'PRAGMA {name} = {value}')
+        return connection
+
+    def _serialized(self):
+        # В памяти писать некому, кроме этого процесса, а тесты держат
+        # транзакцию всё время теста.
+        return (self.options.get('transaction_mode') == 'IMMEDIATE'
+                and not self.is_in_memory_db())
+
+    def _set_autocommit(self, autocommit):
+        if autocommit or not self._serialized():
+            super()._set_autocommit(autocommit)
+            self._release_writer()
+            return
+        timeout = self.connection.execute(
+            'PRAGMA busy_timeout').fetchone()[0] / 1000
+        # Не дождавшись очереди, всё равно пробуем: дальше решает
+        # busy_timeout самой SQLite.
+        self.holds_writer_lock = writer_lock(
+            self.settings_dict['NAME']).acquire(timeout=timeout)
+        # sqlite3 начнёт транзакцию с BEGIN IMMEDIATE перед первой
+        # записью; чтения до неё идут вне транзакции.
+        with self.wrap_database_errors:
+            self.connection.isolation_level = 'IMMEDIATE'
+
+    def _release_writer(self):
+        if self.holds_writer_lock:
+            self.holds_writer_lock = False
+            writer_lock(self.settings_dict['NAME']).release()
+
+    def _close(self):
+        try:
+            super()._close()
+        finally:
+            self._release_writer()
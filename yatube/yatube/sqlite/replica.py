@@ -0,0 +1,69 @@
+"""
+Чтение страниц из READ_ONLY_VIEWS через соединения только для чтения.
+
+Реплика — тот же файл SQLite, открытый с PRAGMA query_only: в режиме
+WAL читатели не ждут писателя, а соединение основной базы остаётся
+свободным для записи. Запись всегда идёт в основную базу.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+REPLICA = 'replica'
+
+_state = threading.local()
+
+
+@contextmanager
+def read_only():
+    """Чтения внутри блока идут в реплику."""
+    previous = getattr(_state, 'read_only', False)
+    _state.read_only = True
+    try:
+        yield
+    finally:
+        _state.read_only = previous
+
+
+def replica_available():
+    # Базу в памяти нельзя открыть вторым соединением со своим
+    # содержимым, так что в тестах реплика совпадает с основной базой.
+    return (REPLICA in settings.DATABASES
+            and not connections[REPLICA].is_in_memory_db())
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if getattr(_state, 'read_only', False) and replica_available():
+            return REPLICA
+        return None
+
+    def db_for_write(self, model, **hints):
+        # Явно, иначе Django взял бы базу экземпляра, прочитанного
+        # из реплики.
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
+
+
+class ReadOnlyViewsMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        try:
+            return self.get_response(request)
+        finally:
+            _state.read_only = False
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if (request.method in ('GET', 'HEAD')
+                and request.resolver_match.view_name
+                in settings.READ_ONLY_VIEWS):
+            _state.read_only = True
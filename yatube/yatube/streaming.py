@@ -0,0 +1,384 @@
+"""
+Обвязка ASGI без сторонних библиотек.
+
+* ``Router`` выбирает обработчик по пути и отвечает на lifespan;
+* ``WSGIAdapter`` выполняет обычное WSGI-приложение Django в
+  ограниченном пуле потоков (ASGI_THREADS), не занимая цикл событий;
+* ``stream_events`` отдаёт подписку на события (yatube/events.py)
+  как text/event-stream.
+
+Простаивающее SSE-соединение — это две задачи asyncio и очередь, без
+потока, поэтому один процесс держит десятки тысяч соединений (при
+достаточном ``ulimit -n``).
+"""
+import asyncio
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from tempfile import SpooledTemporaryFile
+
+from django.conf import settings
+from django.core.handlers.exception import response_for_exception
+from django.core.handlers.wsgi import WSGIRequest
+from django.db import close_old_connections
+from django.urls import Resolver404, resolve
+from django.utils.deprecation import MiddlewareMixin
+from django.utils.module_loading import import_string
+
+from . import metrics
+from .events import OVERFLOW
+
+_executor = None
+
+
+def executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(settings.ASGI_THREADS,
+                                       thread_name_prefix='asgi')
+    return _executor
+
+
+def _call_with_connections(sample, func, *args, **kwargs):
+    close_old_connections()
+    try:
+        if sample is None:
+            return func(*args, **kwargs)
+        with metrics.sampling(sample):
+            return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_sync(func, *args, **kwargs):
+    """
+    Синхронный код с базой в пуле потоков.
+
+    Замеры каждого вызова ведутся отдельно и складываются в замеры
+    запроса уже в цикле событий, так что параллельные вызовы одного
+    запроса не гоняются за общие счётчики.
+    """
+    loop = asyncio.get_running_loop()
+    request_sample = metrics.async_sample.get()
+    sample = None if request_sample is None else metrics.Sample()
+    try:
+        return await loop.run_in_executor(executor(), partial(
+            _call_with_connections, sample, func, *args, **kwargs))
+    finally:
+        if sample is not None:
+            request_sample.add(sample)
+
+
+def header(scope, name):
+    for key, value in scope.get('headers', ()):
+        if key == name:
+            return value.decode('latin-1')
+    return None
+
+
+async def read_body(scope, receive, send):
+    """
+    Тело запроса во временном файле, который уходит на диск после
+    FILE_UPLOAD_MAX_MEMORY_SIZE байт, как и загрузки в Django.
+
+    None, если клиент отключился или тело больше ASGI_MAX_BODY_SIZE:
+    тогда ответ 413 уже отправлен.
+    """
+    limit = settings.ASGI_MAX_BODY_SIZE
+    length = header(scope, b'content-length')
+    if length and length.isdigit() and int(length) > limit:
+        await respond(send, 413, b'Request Entity Too Large')
+        return None
+    body = SpooledTemporaryFile(settings.FILE_UPLOAD_MAX_MEMORY_SIZE)
+    size = 0
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            body.close()
+            return None
+        chunk = message.get('body', b'')
+        size += len(chunk)
+        if size > limit:
+            body.close()
+            await respond(send, 413, b'Request Entity Too Large')
+            return None
+        body.write(chunk)
+        if not message.get('more_body'):
+            body.seek(0)
+            return body
+
+
+async def respond(send, status, body, content_type=b'text/plain'):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(b'content-type', content_type),
+                            (b'content-length', str(len(body)).encode())]})
+    await send({'type': 'http.response.body', 'body': body})
+
+
+def build_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    client = scope.get('client') or ('', 0)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin-1'),
+        'SERVER_NAME': str(server[0]),
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/{}'.format(scope.get('http_version', '1.1')),
+        'REMOTE_ADDR': client[0],
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': body,
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': False,
+        'wsgi.run_once': False,
+    }
+    for name, value in scope.get('headers', ()):
+        name = name.decode('latin-1').upper().replace('-', '_')
+        value = value.decode('latin-1')
+        if name in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            environ[name] = value
+            continue
+        key = f'HTTP_{name}'
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+
+class WSGIAdapter:
+    """WSGI-приложение под ASGI; каждый запрос — в потоке пула."""
+
+    def __init__(self, application):
+        self.application = application
+
+    def start(self, environ):
+        started = []
+
+        def start_response(status, headers, exc_info=None):
+            started[:] = [status, headers]
+
+        result = self.application(environ, start_response)
+        chunks = iter(result)
+        first = next(chunks, b'')
+        status, headers = started
+        return int(status.split()[0]), headers, result, chunks, first
+
+    async def __call__(self, scope, receive, send):
+        body = await read_body(scope, receive, send)
+        if body is None:
+            return
+        with body:
+            status, headers, result, chunks, chunk = await run_sync(
+                self.start, build_environ(scope, body))
+            try:
+                await send({
+                    'type': 'http.response.start', 'status': status,
+                    'headers': [(name.lower().encode('latin-1'),
+                                 value.encode('latin-1'))
+                                for name, value in headers]})
+                while True:
+                    following = await run_sync(next, chunks, None)
+                    await send({'type': 'http.response.body', 'body': chunk,
+                                'more_body': following is not None})
+                    if following is None:
+                        break
+                    chunk = following
+            finally:
+                if hasattr(result, 'close'):
+                    await run_sync(result.close)
+
+
+async def send_response(send, request, response):
+    headers = [*response.items(), *(
+        ('Set-Cookie', cookie.output(header=''))
+        for cookie in response.cookies.values())]
+    await send({'type': 'http.response.start',
+                'status': response.status_code,
+                'headers': [(name.lower().encode('latin-1'),
+                             value.encode('latin-1'))
+                            for name, value in headers]})
+    if request.method == 'HEAD':
+        body = b''
+    elif response.streaming:
+        body = await run_sync(b''.join, response)
+    else:
+        body = response.content
+    await send({'type': 'http.response.body', 'body': body})
+
+
+class AsyncViews:
+    """
+    Асинхронные представления для части адресов.
+
+    ``views`` сопоставляет имени маршрута (``posts:index``) корутину с
+    теми же аргументами, что у обычного представления; она получает
+    только GET и HEAD, остальные запросы и адреса уходят в
+    ``fallback``. Django 2.2 не умеет асинхронных представлений,
+    поэтому middleware из MIDDLEWARE, написанные через
+    MiddlewareMixin (сессии, CSRF, вход, сообщения), выполняются
+    здесь своими process_request/process_view/process_response в
+    потоке пула. Остальные middleware принадлежат синхронному стеку:
+    метрики пишет сам обработчик, а реплику для чтения асинхронные
+    представления выбирают сами.
+    """
+
+    def __init__(self, views, fallback):
+        self.views = views
+        self.fallback = fallback
+        self._middleware = None
+
+    @property
+    def middleware(self):
+        if self._middleware is None:
+            classes = [import_string(path) for path in settings.MIDDLEWARE]
+            self._middleware = [
+                middleware_class(None) for middleware_class in classes
+                if issubclass(middleware_class, MiddlewareMixin)]
+        return self._middleware
+
+    def prepare(self, environ, match):
+        """
+        Запрос после process_request и process_view. Исключение
+        превращается в ответ, как convert_exception_to_response делает
+        в синхронном стеке (например, DisallowedHost — в 400).
+        """
+        request = WSGIRequest(environ)
+        request.resolver_match = match
+        try:
+            return request, self._prepare(request, match)
+        except Exception as exc:
+            return request, response_for_exception(request, exc)
+
+    def _prepare(self, request, match):
+        for middleware in self.middleware:
+            hook = getattr(middleware, 'process_request', None)
+            response = hook and hook(request)
+            if response is not None:
+                return response
+        for middleware in self.middleware:
+            hook = getattr(middleware, 'process_view', None)
+            response = hook and hook(request, match.func, match.args,
+                                     match.kwargs)
+            if response is not None:
+                return response
+        # Пользователь загружается здесь, а не в цикле событий.
+        if hasattr(request, 'user'):
+            request.user.is_authenticated
+        return None
+
+    def finish(self, request, response):
+        for middleware in reversed(self.middleware):
+            hook = getattr(middleware, 'process_response', None)
+            if hook is None:
+                continue
+            try:
+                response = hook(request, response)
+            except Exception as exc:
+                response = response_for_exception(request, exc)
+        return response
+
+    async def __call__(self, scope, receive, send):
+        try:
+            match = resolve(scope['path'])
+        except Resolver404:
+            match = None
+        view = match and self.views.get(match.view_name)
+        if view is None or scope['method'] not in ('GET', 'HEAD'):
+            await self.fallback(scope, receive, send)
+            return
+        body = await read_body(scope, receive, send)
+        if body is None:
+            return
+        sample = metrics.Sample()
+        token = metrics.async_sample.set(sample)
+        started = time.perf_counter()
+        try:
+            request, response = await run_sync(
+                self.prepare, build_environ(scope, body), match)
+            if response is None:
+                try:
+                    response = await view(request, *match.args,
+                                          **match.kwargs)
+                except Exception as exc:
+                    response = await run_sync(
+                        response_for_exception, request, exc)
+            response = await run_sync(self.finish, request, response)
+        finally:
+            metrics.async_sample.reset(token)
+            body.close()
+        metrics.record(match.view_name, response,
+                       time.perf_counter() - started, sample)
+        await send_response(send, request, response)
+
+
+async def stream_events(receive, send, subscription):
+    """Отдаёт события подписки, пока клиент не отключится."""
+    await send({'type': 'http.response.start', 'status': 200, 'headers': [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        (b'x-accel-buffering', b'no'),
+    ]})
+    await send({'type': 'http.response.body', 'more_body': True,
+                'body': b'retry: %d\n\n' % (settings.SSE_RETRY * 1000)})
+
+    async def pump():
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(),
+                                               settings.SSE_HEARTBEAT)
+            except asyncio.TimeoutError:
+                payload = b': ping\n\n'
+            else:
+                if event is OVERFLOW:
+                    return
+                payload = event.payload
+            await send({'type': 'http.response.body', 'body': payload,
+                        'more_body': True})
+
+    async def watch():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    with subscription:
+        pumping = asyncio.ensure_future(pump())
+        watching = asyncio.ensure_future(watch())
+        try:
+            await asyncio.wait({pumping, watching},
+                               return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            pumping.cancel()
+            watching.cancel()
+    if pumping.done() and not pumping.cancelled():
+        pumping.result()
+        # Подписчик отстал: закрываем поток, клиент переподключится.
+        await send({'type': 'http.response.body', 'body': b''})
+
+
+class Router:
+    """
+    Точные пути ASGI-обработчиков, остальное — ``default``. Функции
+    ``on_startup`` вызываются при lifespan.startup.
+    """
+
+    def __init__(self, routes, default, on_startup=()):
+        self.routes = routes
+        self.default = default
+        self.on_startup = on_startup
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            while True:
+                message = await receive()
+                kind = message['type'].rsplit('.', 1)[-1]
+                if kind == 'startup':
+                    for function in self.on_startup:
+                        function()
+                await send({'type': f'lifespan.{kind}.complete'})
+                if kind == 'shutdown':
+                    return
+        if scope['type'] != 'http':
+            return
+        handler = self.routes.get(scope['path'], self.default)
+        await handler(scope, receive, send)
@@ -0,0 +1,66 @@
+"""
+Прогрев кэша скомпилированных шаблонов.
+
+С TEMPLATE_CACHE шаблоны загружаются через cached.Loader: каждый
+файл читается и разбирается один раз за жизнь процесса. warm_up()
+делает это заранее, при запуске процесса сервера, чтобы первые
+запросы не платили за разбор ``base.html``, страниц и всех
+``includes/*``, а ошибка в шаблоне ломала запуск, а не страницу.
+"""
+import os
+import time
+
+from django.conf import settings
+from django.template import engines
+from django.template.loaders.cached import Loader as CachedLoader
+
+
+def _loaders(engine):
+    for loader in engine.template_loaders:
+        if isinstance(loader, CachedLoader):
+            yield from loader.loaders
+        else:
+            yield loader
+
+
+def template_names(engine):
+    """
+    Шаблоны проекта: из DIRS и из templates/ приложений проекта.
+
+    Шаблоны сторонних приложений (админка и т. п.) не прогреваются —
+    они нужны редко, а их сотни.
+    """
+    root = os.path.join(settings.BASE_DIR, '')
+    names = set()
+    for loader in _loaders(engine):
+        for directory in loader.get_dirs():
+            directory = str(directory)
+            if not directory.startswith(root):
+                continue
+            for path, _, files in os.walk(directory):
+                for name in files:
+                    if name.endswith(('.html', '.txt')):
+                        names.add(os.path.relpath(os.path.join(path, name),
+                                                  directory))
+    return sorted(name.replace(os.sep, '/') for name in names)
+
+
+def is_cached(engine):
+    return any(isinstance(loader, CachedLoader)
+               for loader in engine.template_loaders)
+
+
+def warm_up(using='django'):
+    """
+    Компилирует все шаблоны проекта; возвращает их число и время.
+
+    Без кэширующего загрузчика прогревать нечего, и ничего не делается.
+    """
+    engine = engines[using].engine
+    if not is_cached(engine):
+        return 0, 0.0
+    started = time.perf_counter()
+    names = template_names(engine)
+    for name in names:
+        engine.get_template(name)
+    return len(names), time.perf_counter() - started
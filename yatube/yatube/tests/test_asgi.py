@@ -0,0 +1,264 @@
+import asyncio
+import threading
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, SimpleTestCase, TransactionTestCase, \
+    override_settings
+
+from posts import live
+from posts.models import Follow, Group, Post
+from yatube import asgi, metrics, streaming
+from yatube.events import Broker, broker
+
+User = get_user_model()
+
+
+class FakeConnection:
+    """Клиент ASGI: запрос целиком и затем ожидание отключения."""
+
+    def __init__(self, path, body=b'', headers=(), method='GET'):
+        self.scope = {'type': 'http', 'method': method, 'path': path,
+                      'query_string': b'', 'headers': list(headers),
+                      'client': ('127.0.0.1', 5000)}
+        self.incoming = asyncio.Queue()
+        self.incoming.put_nowait({'type': 'http.request', 'body': body})
+        self.sent = []
+        self.received = asyncio.Event()
+
+    async def receive(self):
+        return await self.incoming.get()
+
+    async def send(self, message):
+        self.sent.append(message)
+        self.received.set()
+
+    def disconnect(self):
+        self.incoming.put_nowait({'type': 'http.disconnect'})
+
+    @property
+    def status(self):
+        return self.sent[0]['status']
+
+    @property
+    def body(self):
+        return b''.join(message.get('body', b'')
+                        for message in self.sent[1:])
+
+    async def wait_for(self, text):
+        while text not in self.body:
+            self.received.clear()
+            await asyncio.wait_for(self.received.wait(), 5)
+
+
+class RouterTests(SimpleTestCase):
+    def test_lifespan_runs_startup_hooks(self):
+        started = []
+        router = streaming.Router({}, default=None,
+                                  on_startup=[lambda: started.append(1)])
+        messages = [{'type': 'lifespan.startup'},
+                    {'type': 'lifespan.shutdown'}]
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message['type'])
+
+        asyncio.run(router({'type': 'lifespan'}, receive, send))
+        self.assertEqual(started, [1])
+        self.assertEqual(sent, ['lifespan.startup.complete',
+                                'lifespan.shutdown.complete'])
+
+
+class ReadBodyTests(SimpleTestCase):
+    def read(self, chunks, headers=()):
+        messages = [{'type': 'http.request', 'body': chunk,
+                     'more_body': True} for chunk in chunks]
+        messages[-1]['more_body'] = False
+        sent = []
+
+        async def receive():
+            return messages.pop(0)
+
+        async def send(message):
+            sent.append(message)
+
+        scope = {'type': 'http', 'headers': list(headers)}
+        body = asyncio.run(streaming.read_body(scope, receive, send))
+        return body, sent
+
+    @override_settings(FILE_UPLOAD_MAX_MEMORY_SIZE=10)
+    def test_body_is_spooled(self):
+        body, sent = self.read([b'a' * 8, b'b' * 8, b'c'])
+        with body:
+            self.assertEqual(body.read(), b'a' * 8 + b'b' * 8 + b'c')
+        self.assertEqual(sent, [])
+
+    @override_settings(ASGI_MAX_BODY_SIZE=10)
+    def test_too_large_body_is_rejected(self):
+        body, sent = self.read([b'a' * 8, b'b' * 8])
+        self.assertIsNone(body)
+        self.assertEqual(sent[0]['status'], 413)
+        body, sent = self.read([b''], headers=[(b'content-length', b'11')])
+        self.assertIsNone(body)
+        self.assertEqual(sent[0]['status'], 413)
+
+
+class BrokerTests(SimpleTestCase):
+    def test_publish_from_thread(self):
+        local_broker = Broker(replay=10)
+
+        async def scenario():
+            subscription = local_broker.subscribe(
+                lambda event: event.data['author'] == 'author')
+            thread = threading.Thread(target=lambda: [
+                local_broker.publish('post', {'id': 1, 'author': 'other'}),
+                local_broker.publish('post', {'id': 2, 'author': 'author'}),
+            ])
+            thread.start()
+            thread.join()
+            event = await asyncio.wait_for(subscription.queue.get(), 5)
+            subscription.close()
+            return event
+
+        event = asyncio.run(scenario())
+        self.assertEqual(event.data['id'], 2)
+        self.assertIn(b'event: post\n', event.payload)
+        self.assertEqual(local_broker.subscribers, 0)
+
+    def test_replay(self):
+        local_broker = Broker(replay=10)
+        first = local_broker.publish('post', {'id': 1})
+        local_broker.publish('post', {'id': 2})
+
+        async def scenario():
+            with local_broker.subscribe(last_id=first.id) as subscription:
+                return subscription.queue.get_nowait()
+
+        self.assertEqual(asyncio.run(scenario()).data, {'id': 2})
+
+    @override_settings(SSE_QUEUE_SIZE=2)
+    def test_slow_subscriber_is_dropped(self):
+        local_broker = Broker(replay=10)
+
+        async def scenario():
+            with local_broker.subscribe() as subscription:
+                for number in range(3):
+                    local_broker.publish('post', {'id': number})
+                await asyncio.sleep(0)
+                connection = FakeConnection('/events/')
+                await streaming.stream_events(
+                    connection.receive, connection.send, subscription)
+                return connection
+
+        connection = asyncio.run(scenario())
+        self.assertFalse(connection.sent[-1].get('more_body'))
+
+
+class ASGITests(TransactionTestCase):
+    def setUp(self):
+        cache.clear()
+        self.author = User.objects.create_user(username='author')
+        self.reader = User.objects.create_user(username='reader')
+
+    def call(self, path, **kwargs):
+        async def scenario():
+            connection = FakeConnection(path, **kwargs)
+            await asgi.application(connection.scope, connection.receive,
+                                   connection.send)
+            return connection
+        return asyncio.run(scenario())
+
+    def test_async_pages(self):
+        group = Group.objects.create(title='Группа', slug='group',
+                                     description='Описание')
+        post = Post.objects.create(author=self.author, group=group,
+                                   text='Запись через ASGI')
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        cookie = client.cookies.output(header='', sep=';').strip()
+        headers = [(b'cookie', cookie.encode())]
+        metrics.registry.reset()
+        for path in ('/', '/group/group/', '/author/',
+                     f'/author/{post.pk}/', '/follow/'):
+            with self.subTest(path=path):
+                connection = self.call(path, headers=headers)
+                self.assertEqual(connection.status, 200)
+                self.assertIn('Запись через ASGI', connection.body.decode())
+        self.assertIn('posts:follow_index', metrics.registry.views)
+        self.assertGreater(
+            metrics.registry.views['posts:profile'].db_queries, 0)
+
+    def test_async_redirects_and_errors(self):
+        connection = self.call('/follow/')
+        self.assertEqual(connection.status, 302)
+        self.assertEqual(self.call('/nobody/').status, 404)
+
+    @override_settings(ALLOWED_HOSTS=['localhost'])
+    def test_middleware_errors_become_responses(self):
+        """Ошибка middleware — ответ, как и через WSGI."""
+        connection = self.call('/', headers=[(b'host', b'evil.com')])
+        self.assertEqual(connection.status, 400)
+        self.assertEqual(self.call('/about/author/', headers=[
+            (b'host', b'evil.com')]).status, 400)
+
+    def test_wsgi_fallback(self):
+        connection = self.call('/about/author/')
+        self.assertEqual(connection.status, 200)
+        # Запись уходит в обычный стек Django с проверкой CSRF.
+        connection = self.call('/new/', method='POST')
+        self.assertEqual(connection.status, 403)
+
+    def test_index_stream(self):
+        async def scenario():
+            connection = FakeConnection('/events/')
+            task = asyncio.ensure_future(asgi.application(
+                connection.scope, connection.receive, connection.send))
+            await connection.wait_for(b'retry:')
+            await streaming.run_sync(
+                Post.objects.create, author=self.author, text='Новая')
+            await connection.wait_for(b'event: post')
+            connection.disconnect()
+            await task
+            return connection
+
+        connection = asyncio.run(scenario())
+        self.assertEqual(connection.status, 200)
+        self.assertIn(b'"author": "author"', connection.body)
+        self.assertEqual(broker.subscribers, 0)
+
+    def test_follow_stream(self):
+        other = User.objects.create_user(username='other')
+        Follow.objects.create(user=self.reader, author=self.author)
+        client = Client()
+        client.force_login(self.reader)
+        cookie = client.cookies.output(header='', sep=';').strip()
+        post = Post.objects.create(author=self.author, text='Запись')
+
+        async def scenario():
+            connection = FakeConnection(
+                '/events/follow/', headers=[(b'cookie', cookie.encode())])
+            task = asyncio.ensure_future(asgi.application(
+                connection.scope, connection.receive, connection.send))
+            await connection.wait_for(b'retry:')
+            await streaming.run_sync(
+                Post.objects.create, author=other, text='Чужая')
+            await streaming.run_sync(live.publish_comments, post.pk)
+            await connection.wait_for(b'event: comments')
+            connection.disconnect()
+            await task
+            return connection
+
+        connection = asyncio.run(scenario())
+        self.assertNotIn(b'event: post', connection.body)
+
+        async def anonymous():
+            connection = FakeConnection('/events/follow/')
+            await asgi.application(connection.scope, connection.receive,
+                                   connection.send)
+            return connection
+
+        self.assertEqual(asyncio.run(anonymous()).status, 403)
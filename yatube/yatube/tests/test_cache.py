@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import caches
+from django.test import SimpleTestCase, override_settings
+
+from yatube.cache import SQLiteCache
+
+
+class CacheBackendsTests(SimpleTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.directory = tempfile.mkdtemp()
+        location = os.path.join(cls.directory, 'cache.sqlite3')
+        cls.settings_override = override_settings(CACHES={
+            'default': {
+                'BACKEND': 'yatube.cache.TwoTierCache',
+                'LOCATION': 'tests',
+                'OPTIONS': {'SHARED': 'shared',
+                            'VOLATILE_PREFIXES': ['gen:']},
+            },
+            'shared': {
+                'BACKEND': 'yatube.cache.SQLiteCache',
+                'LOCATION': location,
+            },
+        })
+        cls.settings_override.enable()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.settings_override.disable()
+        shutil.rmtree(cls.directory, ignore_errors=True)
+        super().tearDownClass()
+
+    def setUp(self):
+        caches['default'].clear()
+
+    def test_sqlite_cache_operations(self):
+        """SQLiteCache поддерживает основные операции кэша Django."""
+        shared = caches['shared']
+        shared.set_many({'a': 1, 'b': [2, 3]})
+        self.assertEqual(shared.get_many(['a', 'b', 'c']),
+                         {'a': 1, 'b': [2, 3]})
+        self.assertFalse(shared.add('a', 5))
+        self.assertTrue(shared.add('c', 5))
+        self.assertEqual(shared.incr('c'), 6)
+        with self.assertRaises(ValueError):
+            shared.incr('missing')
+        shared.set('expired', 1, timeout=-1)
+        self.assertIsNone(shared.get('expired'))
+        shared.delete('a')
+        self.assertFalse(shared.has_key('a'))
+
+    def test_two_tier_reads_local_copy(self):
+        """Второе чтение обслуживается кэшем процесса."""
+        cache = caches['default']
+        cache.set('page', 'html')
+        caches['shared'].delete('page')
+        self.assertEqual(cache.get('page'), 'html')
+        self.assertEqual(cache.get_many(['page']), {'page': 'html'})
+
+    def test_volatile_keys_bypass_local_tier(self):
+        """Счётчики поколений всегда читаются из общего хранилища."""
+        cache = caches['default']
+        cache.set('gen:global', 1)
+        caches['shared'].incr('gen:global')
+        self.assertEqual(cache.get('gen:global'), 2)
+
+    def test_local_copy_is_not_shared_object(self):
+        cache = caches['default']
+        cache.set('list', [1])
+        cache.get('list').append(2)
+        self.assertEqual(cache.get('list'), [1])
+
+    def test_sqlite_cache_culls_old_keys(self):
+        """Истёкшие и лишние ключи удаляются при записи."""
+        cache = SQLiteCache(
+            os.path.join(self.directory, 'culled.sqlite3'),
+            {'OPTIONS': {'MAX_ENTRIES': 10, 'CULL_FREQUENCY': 2,
+                         'CULL_INTERVAL': 1}})
+        cache.set('gen:global', 1, None)
+        cache.set_many({f'old{number}': number for number in range(5)},
+                       timeout=-1)
+        for number in range(20):
+            cache.add(f'page{number}', number)
+        with cache.pool.connection() as connection:
+            count, = connection.execute(
+                'SELECT COUNT(*) FROM cache').fetchone()
+        self.assertLessEqual(count, 10)
+        self.assertEqual(cache.get('gen:global'), 1)
+        self.assertEqual(cache.get('page19'), 19)
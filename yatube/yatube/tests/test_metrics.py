@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+from yatube import metrics
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        metrics.registry.reset()
+        cache.clear()
+
+    def scrape(self):
+        response = self.client.get('/-/metrics/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode()
+
+    def test_request_is_recorded_by_url_name(self):
+        """Счётчики копятся по имени маршрута."""
+        self.client.get(reverse('posts:index'))
+        self.client.get(reverse('posts:index'))
+        text = self.scrape()
+        self.assertIn(
+            'yatube_requests_total{view="posts:index",status="200"} 2', text)
+        self.assertIn('yatube_request_duration_seconds_count'
+                      '{view="posts:index"} 2', text)
+        stats = metrics.registry.views['posts:index']
+        self.assertGreater(stats.db_queries, 0)
+        self.assertGreater(stats.cache_hits + stats.cache_misses, 0)
+        self.assertGreater(stats.template_seconds, 0)
+        self.assertGreater(stats.response_bytes, 0)
+
+    def test_unresolved_requests(self):
+        self.client.get('/no/such/page/at/all/')
+        self.assertIn('view="unresolved",status="404"', self.scrape())
+
+    def test_endpoint_is_internal(self):
+        """Метрики видны только адресам из METRICS_ALLOWED_IPS."""
+        response = self.client.get('/-/metrics/', REMOTE_ADDR='192.0.2.1')
+        self.assertEqual(response.status_code, 404)
+
+    def test_profile_by_header(self):
+        """Заголовок с верным токеном сохраняет профиль запроса."""
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        with override_settings(PROFILE_TOKEN='secret',
+                               PROFILE_DIR=directory):
+            plain = self.client.get(reverse('posts:index'),
+                                    HTTP_X_PROFILE='wrong')
+            profiled = self.client.get(reverse('posts:index'),
+                                       HTTP_X_PROFILE='secret')
+        self.assertNotIn('X-Profile', plain)
+        self.assertEqual(os.listdir(directory), [profiled['X-Profile']])
@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from django.db.utils import ConnectionHandler
+from django.test import RequestFactory, SimpleTestCase
+from django.urls import resolve
+
+from yatube.sqlite import replica
+from yatube.sqlite.base import writer_lock
+
+
+class SQLiteBackendTests(SimpleTestCase):
+    # Соединения к временным файлам, но pytest-django без этого
+    # запрещает любые обращения к базе.
+    databases = '__all__'
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.name = os.path.join(directory, 'db.sqlite3')
+        self.connection = ConnectionHandler({'default': {
+            'ENGINE': 'yatube.sqlite',
+            'NAME': self.name,
+            'OPTIONS': {
+                'pragmas': {'journal_mode': 'WAL', 'busy_timeout': 1234},
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }})['default']
+        self.addCleanup(self.connection.close)
+
+    def test_pragmas(self):
+        """Настройки из OPTIONS['pragmas'] применяются к соединению."""
+        with self.connection.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0], 'wal')
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 1234)
+
+    def test_writer_lock(self):
+        """Транзакция держит блокировку писателя до своего конца."""
+        lock = writer_lock(self.name)
+        self.connection.ensure_connection()
+        self.connection.set_autocommit(False)
+        self.assertTrue(self.connection.holds_writer_lock)
+        self.assertTrue(lock.locked())
+        with self.connection.cursor() as cursor:
+            cursor.execute('CREATE TABLE t (id INTEGER)')
+            cursor.execute('INSERT INTO t VALUES (1)')
+        self.connection.commit()
+        self.connection.set_autocommit(True)
+        self.assertFalse(lock.locked())
+
+
+class ReplicaRouterTests(SimpleTestCase):
+    def test_reads_in_read_only_block(self):
+        router = replica.ReplicaRouter()
+        with mock.patch.object(replica, 'replica_available',
+                               return_value=True):
+            self.assertIsNone(router.db_for_read(None))
+            with replica.read_only():
+                self.assertEqual(router.db_for_read(None), replica.REPLICA)
+                self.assertEqual(router.db_for_write(None), 'default')
+        self.assertIsNone(router.db_for_read(None))
+
+    def test_in_memory_replica_is_not_used(self):
+        """Тестовая база в памяти: реплика недоступна."""
+        self.assertFalse(replica.replica_available())
+
+    def test_middleware_marks_read_only_views(self):
+        states = []
+
+        def view(request):
+            states.append(getattr(replica._state, 'read_only', False))
+
+        middleware = replica.ReadOnlyViewsMiddleware(view)
+        factory = RequestFactory()
+        for method, path in (('get', '/'), ('post', '/'), ('get', '/new/')):
+            request = getattr(factory, method)(path)
+            request.resolver_match = resolve(path)
+            middleware.process_view(request, view, (), {})
+            middleware(request)
+        self.assertEqual(states, [True, False, False])
+        self.assertFalse(replica._state.read_only)
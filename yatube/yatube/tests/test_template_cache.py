@@ -0,0 +1,43 @@
+import copy
+
+from django.conf import settings
+from django.template import engines
+from django.test import SimpleTestCase, override_settings
+
+from yatube import template_cache
+
+LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+
+def _templates(loaders):
+    templates = copy.deepcopy(settings.TEMPLATES)
+    templates[0]['APP_DIRS'] = False
+    templates[0]['OPTIONS']['loaders'] = loaders
+    return templates
+
+
+class TemplateCacheTests(SimpleTestCase):
+    def test_project_templates_only(self):
+        names = template_cache.template_names(engines['django'].engine)
+        for name in ('base.html', 'index.html', 'post.html',
+                     'includes/post_item.html', 'registration/login.html'):
+            self.assertIn(name, names)
+        self.assertNotIn('admin/base.html', names)
+
+    @override_settings(TEMPLATES=_templates(
+        [('django.template.loaders.cached.Loader', LOADERS)]))
+    def test_warm_up_fills_cache(self):
+        engine = engines['django'].engine
+        count, _ = template_cache.warm_up()
+        cached = engine.template_loaders[0].get_template_cache
+        self.assertEqual(count, len(template_cache.template_names(engine)))
+        for name in ('base.html', 'includes/post_item.html'):
+            with self.subTest(name=name):
+                self.assertIn(name, cached)
+
+    @override_settings(TEMPLATES=_templates(LOADERS))
+    def test_warm_up_without_cache(self):
+        self.assertEqual(template_cache.warm_up(), (0, 0.0))
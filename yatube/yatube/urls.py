@@ -13,13 +13,17 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
-import debug_toolbar
+import re
+
 from django.contrib import admin
-from django.urls import include, path
+from django.urls import include, path, re_path
 from django.conf.urls import handler404, handler500
 from django.conf import settings
 from django.conf.urls.static import static
 
+from posts import media
+from yatube import metrics
+
 
 handler404 = 'posts.views.page_not_found'  # noqa
 handler500 = 'posts.views.server_error'  # noqa
@@ -28,13 +32,21 @@ urlpatterns = [
     path('auth/', include('users.urls')),
     path('auth/', include('django.contrib.auth.urls')),
     path('admin/', admin.site.urls),
+    path('-/metrics/', metrics.metrics_view, name='metrics'),
+    path('api/v1/', include('api.urls')),
     path('', include('posts.urls')),
     path('about/', include('about.urls', namespace='about')),
-    path('__debug__/', include(debug_toolbar.urls)),
 ]
 
+if settings.DEBUG_TOOLBAR:
+    import debug_toolbar
+
+    urlpatterns += [path('__debug__/', include(debug_toolbar.urls))]
+
 if settings.DEBUG:
-    urlpatterns += static(
-        settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % re.escape(
+            settings.MEDIA_URL.lstrip('/')), media.serve),
+    ]
     urlpatterns += static(
         settings.STATIC_URL, document_root=settings.STATIC_ROOT)
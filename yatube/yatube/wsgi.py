@@ -11,6 +11,15 @@ import os
 
 from django.core.wsgi import get_wsgi_application
 
+from yatube import template_cache
+
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'yatube.settings')
 
 application = get_wsgi_application()
+
+# Шаблоны компилируются до первого запроса к процессу.
+template_cache.warm_up()
+
+from posts import thumbnails  # noqa: E402
+
+thumbnails.start_workers()